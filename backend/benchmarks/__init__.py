@@ -0,0 +1 @@
+# 보정 파이프라인 벤치마크 (python -m benchmarks.retouch_bench)
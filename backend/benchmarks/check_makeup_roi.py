@@ -0,0 +1,144 @@
+"""
+화장 마스크/합성 ROI 버전 ↔ 전체 프레임 버전 일치 확인
+
+    python -m benchmarks.check_makeup_roi                    # 기본 해상도 전체
+    python -m benchmarks.check_makeup_roi --resolutions 720p
+
+- 기준: ROI 도입 전 구현 (전체 프레임 버퍼에 도형 → GaussianBlur(ksize=(0,0)) → 전체 프레임 블렌딩)
+- 비교: make_soft_mask_roi / make_soft_ellipse_roi / *_mask_roi, alpha_blend_color_roi, apply_makeup(composite_layers)
+- 허용 오차
+  - 마스크: ROI 는 도형 bbox + 3σ 까지만 계산 → 그 밖의 꼬리(≤ 0.00135) 만큼 차이 허용
+  - 픽셀: 레이어마다 반올림 1 이내 (composite_layers 는 레이어 사이에 uint8 로 내리지 않음)
+- 얼굴이 가운데인 경우 + 이미지 모서리에 걸친 경우 (경계 reflect 처리 확인)
+- 하나라도 넘으면 exit 1
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import cv2
+import numpy as np
+
+from benchmarks import fixtures
+from benchmarks.retouch_bench import RESOLUTIONS
+
+rs = fixtures.rs
+
+MASK_ATOL = 2e-3
+PIXEL_ATOL_PER_LAYER = 1
+
+
+# ---- 전체 프레임 기준 구현 (ROI 도입 전) ----
+
+def _full_mask(h, w, pts, feather):
+    mask = np.zeros((h, w), dtype=np.float32)
+    cv2.fillConvexPoly(mask, pts.astype(np.int32), 1.0)
+    mask = cv2.GaussianBlur(mask, (0, 0), feather)
+    return np.clip(mask, 0, 1)
+
+
+def _full_ellipse(h, w, center, axes, sigma):
+    tmp = np.zeros((h, w), dtype=np.float32)
+    cv2.ellipse(tmp, (int(center[0]), int(center[1])), (int(axes[0]), int(axes[1])), 0, 0, 360, 1.0, -1)
+    return cv2.GaussianBlur(tmp, (0, 0), sigma)
+
+
+def _full_blend(img, mask, color, alpha):
+    m = (mask * alpha)[..., None]
+    out = img.astype(np.float32) * (1 - m) + np.array(color, dtype=np.float32) * m
+    return np.clip(out, 0, 255).astype(np.uint8)
+
+
+def full_lip_mask(h, w, lm):
+    return np.clip(_full_mask(h, w, lm[rs.OUTER_LIP], 25) - _full_mask(h, w, lm[rs.INNER_LIP], 15), 0, 1)
+
+
+def full_blush_mask(h, w, lm):
+    face_width = np.linalg.norm(lm[454] - lm[234])
+    rx, ry = face_width * 0.12, face_width * 0.10
+    oval_y = lm[rs.FACE_OVAL_IDX][:, 1]
+    offset_y = (oval_y.max() - oval_y.min()) * 0.08
+    mask = np.zeros((h, w), dtype=np.float32)
+    for pid in (116, 345):
+        c = lm[pid].copy()
+        c[1] += offset_y
+        mask = np.maximum(mask, _full_ellipse(h, w, c, (rx, ry), 35))
+    return np.clip(mask, 0, 1)
+
+
+def full_highlight_mask(h, w, lm):
+    mask = _full_mask(h, w, lm[[168, 6, 197, 195]], 20)
+    for pid in (49, 279):
+        mask = np.maximum(mask, _full_ellipse(h, w, lm[pid], (18, 10), 20))
+    for pid in (117, 346):
+        mask = np.maximum(mask, _full_ellipse(h, w, lm[pid], (22, 14), 25))
+    return np.clip(mask, 0, 1)
+
+
+# (이름, ROI 마스크 함수, 전체 프레임 마스크 함수, 색, alpha) - apply_makeup 과 같은 순서/값
+LAYERS = [
+    ("blush", rs.blush_mask_roi, full_blush_mask, rs.BLUSH_BGR, 0.35),
+    ("lip", rs.lip_mask_roi, full_lip_mask, rs.BLUSH_BGR, 0.45),
+    ("highlight", rs.highlight_mask_roi, full_highlight_mask, rs.HIGHLIGHT_BGR, 0.30),
+]
+
+
+def _pixel_diff(a, b) -> int:
+    return int(np.abs(a.astype(np.int16) - b.astype(np.int16)).max())
+
+
+def check(img: np.ndarray, lm: np.ndarray, label: str) -> list:
+    """실패 목록 [(label, 항목, 값, 허용치)]"""
+    h, w = img.shape[:2]
+    failures = []
+
+    def report(item, value, limit):
+        ok = value <= limit
+        print(f"  {item:28s} {value:10.6f}  (<= {limit}) {'ok' if ok else 'FAIL'}")
+        if not ok:
+            failures.append((label, item, value, limit))
+
+    # 기본 도형 1개 (make_soft_mask 는 ROI 결과를 전체 프레임으로 펼친 것)
+    oval = lm[rs.FACE_OVAL_IDX]
+    report("make_soft_mask", float(np.abs(rs.make_soft_mask(h, w, oval, 35) - _full_mask(h, w, oval, 35)).max()), MASK_ATOL)
+
+    sequential = img.copy()
+    for name, roi_fn, full_fn, color, alpha in LAYERS:
+        mask_roi, rect = roi_fn(h, w, lm)
+        full = full_fn(h, w, lm)
+        expanded = rs._expand_mask(mask_roi, rect, (0, 0, w, h))
+        report(f"{name} mask", float(np.abs(expanded - full).max()), MASK_ATOL)
+
+        blended = rs.alpha_blend_color_roi(img, mask_roi, rect, color, alpha)
+        report(f"{name} blend (px)", _pixel_diff(blended, _full_blend(img, full, color, alpha)), PIXEL_ATOL_PER_LAYER)
+        sequential = _full_blend(sequential, full, color, alpha)
+
+    fused = rs.apply_makeup(img, lm)
+    report("apply_makeup (px)", _pixel_diff(fused, sequential), PIXEL_ATOL_PER_LAYER * len(LAYERS))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check ROI makeup masks against the full-frame implementation")
+    parser.add_argument("--resolutions", default=",".join(RESOLUTIONS), help="comma separated: " + ", ".join(RESOLUTIONS))
+    args = parser.parse_args()
+
+    failures = []
+    for resolution in [r.strip().lower() for r in args.resolutions.split(",") if r.strip()]:
+        width, height = RESOLUTIONS[resolution]
+        img, lm = fixtures.synthetic_face(width, height)
+        # 얼굴을 왼쪽 위 모서리로 옮겨서 마스크/블러가 이미지 경계에 걸리는 경우도 확인
+        corner = lm - np.array([width * 0.42, height * 0.38], dtype=np.float32)
+        for label, landmarks in ((f"{resolution}/center", lm), (f"{resolution}/corner", corner)):
+            print(f"[{label}] {width}x{height}")
+            failures.extend(check(img, landmarks, label))
+
+    if failures:
+        print(f"{len(failures)} check(s) exceeded tolerance")
+        sys.exit(1)
+    print("ROI masks and blends match the full-frame implementation")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+벤치마크용 합성 얼굴 fixture
+
+- 실제 인물 사진 없이도 모든 단계를 돌릴 수 있도록, 파이프라인이 쓰는 FaceMesh 인덱스
+  (얼굴 외곽, 눈, 입술, 코, 광대) 를 파라메트릭 얼굴 위에 배치한 랜드마크와 그 얼굴 이미지를 생성
+- 시드 고정 → 해상도별로 항상 같은 입력 (결과 비교 가능)
+- FaceMesh 가 합성 얼굴을 검출하지 못해도 단계별 측정에는 이 랜드마크를 그대로 사용
+"""
+import cv2
+import numpy as np
+
+from services import get_retouch_service
+
+rs = get_retouch_service()
+
+N_LANDMARKS = 478  # refine_landmarks=True (홍채 10 포인트 포함)
+
+
+def _ellipse_points(cx, cy, a, b, n, start_deg=-90.0, end_deg=270.0):
+    t = np.deg2rad(np.linspace(start_deg, end_deg, n, endpoint=False))
+    return np.stack([cx + a * np.cos(t), cy + b * np.sin(t)], axis=1)
+
+
+def synthetic_landmarks(width: int, height: int) -> np.ndarray:
+    """해상도에 비례하는 정면 얼굴 랜드마크 (478, 2)"""
+    cx, cy = width / 2.0, height / 2.0
+    b = min(width, height) * 0.3  # 얼굴 반높이
+    a = b * 0.78  # 얼굴 반너비
+    lm = np.tile(np.array([cx, cy], dtype=np.float32), (N_LANDMARKS, 1))
+
+    # 얼굴 외곽: 이마(10) 에서 시작해 시계 방향
+    lm[rs.FACE_OVAL_IDX] = _ellipse_points(cx, cy, a, b, len(rs.FACE_OVAL_IDX))
+
+    # 눈 (LEFT_EYE_IDX = 이미지 왼쪽 눈, FaceMesh 순서대로 왼쪽 눈꼬리 → 아래 눈꺼풀 → 위 눈꺼풀)
+    ey = cy - 0.15 * b
+    for idx, iris, ex in ((rs.LEFT_EYE_IDX, slice(468, 473), cx - 0.4 * a),
+                          (rs.RIGHT_EYE_IDX, slice(473, 478), cx + 0.4 * a)):
+        lm[idx] = _ellipse_points(ex, ey, 0.18 * a, 0.07 * b, len(idx), 180.0, -180.0)
+        lm[iris] = (ex, ey)
+
+    # 입술 (아래쪽 호, 왼쪽 입꼬리 → 오른쪽 입꼬리)
+    my = cy + 0.5 * b
+    lm[rs.OUTER_LIP] = _ellipse_points(cx, my, 0.3 * a, 0.12 * b, len(rs.OUTER_LIP), 180.0, 0.0)
+    lm[rs.INNER_LIP] = _ellipse_points(cx, my, 0.22 * a, 0.05 * b, len(rs.INNER_LIP), 180.0, 0.0)
+    lm[13] = (cx, my - 0.04 * b)
+    lm[0] = (cx, my - 0.1 * b)
+
+    # 콧대 (위 → 아래), 코끝, 코옆
+    for i, pid in enumerate([168, 6, 197, 195, 5, 1]):
+        lm[pid] = (cx, cy - 0.1 * b + i * 0.05 * b)
+    lm[9] = (cx, cy - 0.3 * b)
+    lm[199] = (cx, cy + 0.8 * b)
+    lm[49] = (cx - 0.15 * a, cy + 0.12 * b)
+    lm[279] = (cx + 0.15 * a, cy + 0.12 * b)
+
+    # 광대
+    for left, right, dx, dy in ((116, 345, 0.55, 0.10), (117, 346, 0.50, 0.02), (166, 399, 0.30, 0.15)):
+        lm[left] = (cx - dx * a, cy + dy * b)
+        lm[right] = (cx + dx * a, cy + dy * b)
+    return lm
+
+
+def synthetic_face(width: int, height: int, seed: int = 0):
+    """합성 얼굴 이미지 (BGR) + 랜드마크 반환"""
+    rng = np.random.default_rng(seed)
+    lm = synthetic_landmarks(width, height)
+
+    # 배경: 세로 그라데이션 + 노이즈 (인코더/필터가 평탄한 이미지로 과소평가되지 않도록)
+    grad = np.linspace(200, 120, height, dtype=np.float32)[:, None, None]
+    img = np.broadcast_to(grad, (height, width, 3)).astype(np.float32)
+    img += rng.normal(0, 6, (height, width, 3)).astype(np.float32)
+
+    oval = lm[rs.FACE_OVAL_IDX].astype(np.int32)
+    skin = np.zeros((height, width), dtype=np.uint8)
+    cv2.fillConvexPoly(skin, oval, 255)
+    skin_tone = np.array([150, 175, 215], dtype=np.float32)  # BGR
+    texture = rng.normal(0, 10, (height, width, 1)).astype(np.float32)
+    img = np.where(skin[..., None] > 0, skin_tone + texture, img)
+
+    img = np.clip(img, 0, 255).astype(np.uint8)
+    for idx in (rs.LEFT_EYE_IDX, rs.RIGHT_EYE_IDX):
+        cv2.fillPoly(img, [lm[idx].astype(np.int32)], (60, 50, 40))
+    lips = np.concatenate([lm[rs.OUTER_LIP], lm[rs.INNER_LIP][::-1]]).astype(np.int32)
+    cv2.fillPoly(img, [lips], (90, 80, 190))
+    return img, lm
@@ -0,0 +1,265 @@
+"""
+보정 파이프라인 벤치마크 (단계별 시간/메모리, 해상도별)
+
+    python -m benchmarks.retouch_bench                       # 기본 해상도 전체, 결과 출력
+    python -m benchmarks.retouch_bench --resolutions 720p,12mp --repeat 10
+    python -m benchmarks.retouch_bench --save-baseline       # 현재 결과를 baseline 으로 저장
+    python -m benchmarks.retouch_bench --threshold 0.2       # baseline 대비 20% 넘게 느려지면 exit 1
+    python -m benchmarks.retouch_bench --require-baseline    # CI: baseline 이 없으면 exit 2 (비교 없이 통과하지 않음)
+    python -m benchmarks.retouch_bench --images ./photos     # 합성 얼굴 대신 (라이선스 문제없는) 실제 사진 사용
+
+- 입력: benchmarks.fixtures 의 합성 얼굴 (시드 고정), --images 지정 시 해당 사진을 각 해상도로 리사이즈
+- 시간: 워밍업 1회 후 repeat 회 실행의 median / min (ms)
+- 메모리: 별도 1회 실행에서 tracemalloc peak (numpy/파이썬 할당, OpenCV 내부 버퍼는 포함되지 않음)
+  + 작업 버퍼 풀(retouch_buffers) 신규 할당/재사용 횟수, 프로세스 최대 RSS
+  (최대 RSS: POSIX 는 resource, 윈도우는 psutil 이 설치돼 있을 때만, 둘 다 없으면 null)
+- 전체 파이프라인: retouch_image[landmarks] 는 fixture 랜드마크로 FaceMesh 를 건너뛴 디코딩 → 보정 → 인코딩
+  FaceMesh 가 입력에서 얼굴을 찾으면 retouch_image (검출 포함), 못 찾으면 retouch_image[no_face] (보정 없이 인코딩만)
+  → 얼굴을 못 찾은 실행의 결과가 얼굴을 찾은 baseline 의 retouch_image 와 비교되지 않음
+- 결과 JSON 의 results[해상도][단계] 를 baseline 과 비교 (시간: --threshold, 메모리: --memory-threshold)
+- baseline 은 측정한 머신에서만 의미가 있으므로 저장소에 넣지 않음 → CI 러너에서 먼저 --save-baseline 으로 만들고
+  이후 실행은 --require-baseline 으로 비교 (meta 의 머신 정보가 다르면 경고)
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import cv2
+import numpy as np
+
+from benchmarks import fixtures
+from services import retouch_limits
+from services.retouch_buffers import get_scratch
+
+try:
+    import resource
+except ImportError:  # 윈도우
+    resource = None
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+rs = fixtures.rs
+
+RESOLUTIONS = {
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+    "12mp": (4032, 3024),
+}
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+# 이 값보다 짧은 단계는 노이즈가 커서 시간 회귀 판정에서 제외 (ms)
+NOISE_FLOOR_MS = 2.0
+# baseline 과 값이 다르면 같은 머신/환경 비교가 아님
+MACHINE_META_KEYS = ("platform", "cpu_count", "opencv", "numpy", "opencv_threads")
+
+
+def _max_rss_mb():
+    """프로세스 최대 RSS (MB), 측정할 수 없으면 None"""
+    if resource is not None:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / (1024.0 * 1024.0) if sys.platform == "darwin" else rss / 1024.0
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024.0 * 1024.0)
+    return None
+
+
+def measure(fn, repeat: int) -> dict:
+    fn()  # 워밍업 (FaceMesh 그래프, 작업 버퍼 풀 채우기)
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000.0)
+
+    scratch = get_scratch()
+    allocs_before = scratch.stats["allocations"]
+    reuses_before = scratch.stats["reuses"]
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    rss = _max_rss_mb()
+    return {
+        "median_ms": round(statistics.median(times), 3),
+        "min_ms": round(min(times), 3),
+        "peak_mb": round(peak / (1024.0 * 1024.0), 3),
+        "scratch_allocations": scratch.stats["allocations"] - allocs_before,
+        "scratch_reuses": scratch.stats["reuses"] - reuses_before,
+        "max_rss_mb": None if rss is None else round(rss, 1),
+    }
+
+
+def build_stages(img: np.ndarray, landmarks: np.ndarray, detected: bool):
+    """
+    단계 이름 → 인자 없는 callable (입력은 매번 같은 원본, in-place 단계는 복사본에 적용)
+    - detected: FaceMesh 가 img 에서 얼굴을 찾았는지 (retouch_image 단계 이름 결정)
+    """
+    png = rs.encode_image(img, "png")
+    # retouch_image_result 는 작업 해상도로 줄인 이미지 기준 랜드마크를 받음
+    work_w, _ = retouch_limits.work_size(retouch_limits.ImageInfo("png", img.shape[1], img.shape[0]))
+    work_faces = [landmarks * (work_w / float(img.shape[1]))]
+    jpeg = rs.encode_image(img, "jpeg", quality=90)
+    stages = {
+        "decode_png": lambda: rs.decode_image(png, max_edge=0),
+        "decode_jpeg": lambda: rs.decode_image(jpeg, max_edge=0),
+        "get_landmarks": lambda: rs.get_landmarks(img),
+        "enlarge_eyes": lambda: rs.enlarge_eyes(img, landmarks, scale=rs.RETOUCH_EYE_SCALE),
+        "warp_face": lambda: rs.warp_face(img, landmarks),
+    }
+    for tier in rs.SMOOTHING_ENGINES:
+        stages[f"smooth_skin[{tier}]"] = (
+            lambda tier=tier: rs.smooth_skin(img, landmarks, strength=0.45, d=15,
+                                             sigma_color=100.0, sigma_space=100.0, tier=tier)
+        )
+    stages.update({
+        "apply_blush": lambda: rs.apply_blush(img, landmarks, rs.BLUSH_RGB, alpha=0.35),
+        "apply_lip_color": lambda: rs.apply_lip_color(img, landmarks, rs.BLUSH_RGB, alpha=0.45),
+        "apply_highlight": lambda: rs.apply_highlight(img, landmarks, rs.HIGHLIGHT_RGB, alpha=0.30),
+        "apply_makeup": lambda: rs.apply_makeup(img, landmarks),
+        "render_retouch": lambda: rs.render_retouch(img, landmarks),
+        "encode_png": lambda: rs.encode_image(img, "png"),
+        "encode_jpeg": lambda: rs.encode_image(img, "jpeg", quality=90),
+        "retouch_image[landmarks]": lambda: rs.retouch_image_result(png, "bench.png", "png", faces=work_faces),
+        "retouch_image" if detected else "retouch_image[no_face]":
+            lambda: rs.retouch_image_bytes(png, "bench.png", "png", use_cache=False),
+    })
+    return stages
+
+
+def load_inputs(resolution: str, images_dir: str = None):
+    """(이름, BGR 이미지, 랜드마크) 목록"""
+    width, height = RESOLUTIONS[resolution]
+    if not images_dir:
+        img, lm = fixtures.synthetic_face(width, height)
+        return [("synthetic", img, lm)]
+
+    inputs = []
+    for path in sorted(Path(images_dir).iterdir()):
+        img = cv2.imread(str(path), cv2.IMREAD_COLOR)
+        if img is None:
+            continue
+        img = cv2.resize(img, (width, height), interpolation=cv2.INTER_AREA)
+        lm = rs.get_landmarks(img)
+        if lm is None:
+            print(f"  [skip] no face: {path.name}")
+            continue
+        inputs.append((path.stem, img, lm))
+    return inputs
+
+
+def run(resolutions, repeat: int, images_dir: str = None, stage_filter=None) -> dict:
+    results = {}
+    for resolution in resolutions:
+        for name, img, lm in load_inputs(resolution, images_dir):
+            key = resolution if name == "synthetic" else f"{resolution}/{name}"
+            detected = rs.get_landmarks(img) is not None
+            print(f"[{key}] {img.shape[1]}x{img.shape[0]} (FaceMesh detected: {detected})")
+            results[key] = {}
+            for stage, fn in build_stages(img, lm, detected).items():
+                if stage_filter and not any(f in stage for f in stage_filter):
+                    continue
+                results[key][stage] = measure(fn, repeat)
+                r = results[key][stage]
+                print(f"  {stage:24s} {r['median_ms']:10.2f} ms   peak {r['peak_mb']:8.2f} MB")
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float, memory_threshold: float):
+    """baseline 대비 회귀 목록 [(해상도, 단계, 항목, baseline, 현재)]"""
+    regressions = []
+    for key, stages in results.items():
+        for stage, current in stages.items():
+            base = baseline.get(key, {}).get(stage)
+            if not base:
+                continue
+            if (current["median_ms"] > base["median_ms"] * (1.0 + threshold)
+                    and current["median_ms"] - base["median_ms"] > NOISE_FLOOR_MS):
+                regressions.append((key, stage, "median_ms", base["median_ms"], current["median_ms"]))
+            if current["peak_mb"] > base["peak_mb"] * (1.0 + memory_threshold) and current["peak_mb"] - base["peak_mb"] > 1.0:
+                regressions.append((key, stage, "peak_mb", base["peak_mb"], current["peak_mb"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the retouch pipeline per stage and resolution")
+    parser.add_argument("--resolutions", default=",".join(RESOLUTIONS), help="comma separated: " + ", ".join(RESOLUTIONS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--stages", default="", help="comma separated substrings to select stages")
+    parser.add_argument("--images", default=None, help="directory of license-free face photos (default: synthetic face)")
+    parser.add_argument("--output", default=None, help="write results JSON to this path")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--require-baseline", action="store_true", help="exit 2 when there is no baseline to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed time regression ratio")
+    parser.add_argument("--memory-threshold", type=float, default=0.3, help="allowed peak memory regression ratio")
+    args = parser.parse_args()
+
+    resolutions = [r.strip().lower() for r in args.resolutions.split(",") if r.strip()]
+    unknown = [r for r in resolutions if r not in RESOLUTIONS]
+    if unknown:
+        parser.error(f"unknown resolutions: {unknown}")
+    stage_filter = [s.strip() for s in args.stages.split(",") if s.strip()]
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "opencv_threads": cv2.getNumThreads(),
+            "pipeline_version": rs.PIPELINE_VERSION,
+            "smooth_tier": rs.SKIN_SMOOTH_TIER,
+            "repeat": args.repeat,
+            "fixture": args.images or "synthetic",
+        },
+        "results": run(resolutions, args.repeat, args.images, stage_filter),
+    }
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"results written to {args.output}")
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"baseline saved to {baseline_path}")
+        return
+
+    if not baseline_path.exists():
+        print(f"no baseline at {baseline_path} (run with --save-baseline on this machine to create one)")
+        if args.require_baseline:
+            sys.exit(2)
+        return
+
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    base_meta = baseline.get("meta", {})
+    for key in MACHINE_META_KEYS:
+        if key in base_meta and base_meta[key] != report["meta"][key]:
+            print(f"warning: baseline {key}={base_meta[key]!r} differs from this run ({report['meta'][key]!r})")
+    regressions = compare(report["results"], baseline.get("results", {}), args.threshold, args.memory_threshold)
+    if not regressions:
+        print(f"no regressions against {baseline_path}")
+        return
+    print("regressions:")
+    for key, stage, metric, base, current in regressions:
+        print(f"  [{key}] {stage}: {metric} {base} -> {current} ({(current / base - 1) * 100:+.1f}%)")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+CPU 스레드 예산 적용 (config.THREAD_BUDGET)
+
+- apply_thread_env(): BLAS/OpenMP 스레드 수 환경 변수 설정
+  numpy/sklearn 이 처음 import 되기 전에 호출해야 적용됨 → main.py 최상단
+  (이미 설정된 환경 변수는 덮어쓰지 않음, 자식 프로세스(보정 워커)에도 상속)
+- apply_thread_limits(): 위 + cv2.setNumThreads + 이미 로드된 BLAS 풀 제한 (threadpoolctl)
+  cv2 를 쓰는 프로세스마다 호출 (서버 프로세스, 보정 워커 초기화)
+- MediaPipe FaceMesh 는 Python API 로 스레드 수를 지정할 수 없으므로 워커 스레드당 인스턴스 1개로 제한
+"""
+import os
+
+from config import CV_NUM_THREADS, BLAS_NUM_THREADS
+
+BLAS_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+
+def apply_thread_env(blas_threads: int = BLAS_NUM_THREADS):
+    for name in BLAS_ENV_VARS:
+        os.environ.setdefault(name, str(blas_threads))
+
+
+def apply_thread_limits(cv_threads: int = CV_NUM_THREADS, blas_threads: int = BLAS_NUM_THREADS) -> dict:
+    """현재 프로세스에 스레드 예산 적용 → 적용된 값 반환"""
+    apply_thread_env(blas_threads)
+    applied = {"blas_threads": int(os.environ.get("OMP_NUM_THREADS", blas_threads))}
+
+    try:
+        import cv2
+        cv2.setNumThreads(cv_threads)
+        applied["cv_threads"] = cv2.getNumThreads()
+    except ImportError:
+        pass
+
+    # 환경 변수보다 먼저 로드된 BLAS 풀 (sklearn 의존성이라 보통 설치되어 있음)
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(limits=applied["blas_threads"])
+    except ImportError:
+        pass
+    return applied
+
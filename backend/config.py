@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # .env 파일 로드
@@ -17,3 +18,126 @@ DATA_FILE_NAME = "pose_data.json"  # 학습 데이터 저장 파일 이름
 # 사용 가능한 포즈 목록
 AVAILABLE_POSES = ["Wink", "V sign", "Close up", "Surprise", "Background"]
 
+
+# MediaPipe ASCII 경로 캐시 (윈도우 한글 경로 우회)
+# "auto": 설치 경로가 ASCII가 아닐 때만 복사 / "always": 항상 복사 / "never": 복사 안 함
+MEDIAPIPE_ASCII_COPY = os.getenv("MEDIAPIPE_ASCII_COPY", "auto").lower()
+MEDIAPIPE_ASCII_CACHE_DIR = os.getenv(
+    "MEDIAPIPE_ASCII_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "mediapipe_ascii_site"),
+)
+
+# 기능 플래그 (포즈 전용 부스 등에서 라우터 비활성화)
+ENABLE_POSE_API = os.getenv("ENABLE_POSE_API", "1") != "0"
+ENABLE_RETOUCH_API = os.getenv("ENABLE_RETOUCH_API", "1") != "0"
+ENABLE_METRICS = os.getenv("ENABLE_METRICS", "1") != "0"  # GET /metrics (Prometheus text format)
+# 보정 모듈 로드 시점: "lazy"(첫 요청 시) / "background"(서버 시작 후 백그라운드)
+RETOUCH_PRELOAD = os.getenv("RETOUCH_PRELOAD", "background").lower()
+
+# 얼굴 랜드마크 검출용 proxy 이미지 최대 긴 변 (px, 0이면 원본 그대로 검출)
+LANDMARK_PROXY_MAX_EDGE = int(os.getenv("LANDMARK_PROXY_MAX_EDGE", "1280"))
+# proxy 검출 후 눈/입술 포인트를 원본 해상도 crop 에서 다시 검출할지 여부
+LANDMARK_REFINE_NATIVE = os.getenv("LANDMARK_REFINE_NATIVE", "0") == "1"
+
+# 보정 결과 캐시 (입력 해시 + 파라미터 + 파이프라인 버전 기준)
+RETOUCH_CACHE_ENABLED = os.getenv("RETOUCH_CACHE_ENABLED", "1") != "0"
+RETOUCH_CACHE_MEMORY_MB = float(os.getenv("RETOUCH_CACHE_MEMORY_MB", "256"))
+RETOUCH_CACHE_DISK_MB = float(os.getenv("RETOUCH_CACHE_DISK_MB", "2048"))  # 0이면 디스크 tier 사용 안 함
+RETOUCH_CACHE_DIR = os.getenv(
+    "RETOUCH_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "retouch_result_cache"),
+)
+RETOUCH_CACHE_TTL_SEC = float(os.getenv("RETOUCH_CACHE_TTL_SEC", str(24 * 60 * 60)))
+# 랜드마크 캐시 (입력 해시 기준, 얼굴별 랜드마크만 보관, 서버 프로세스의 메모리 LRU)
+# → 같은 사진을 파라미터만 바꿔 다시 보정할 때 FaceMesh 생략 (어느 워커가 받아도 hit, 얼굴당 ~4KB)
+RETOUCH_LANDMARK_CACHE_MB = float(os.getenv("RETOUCH_LANDMARK_CACHE_MB", "8"))  # 0이면 사용 안 함
+RETOUCH_LANDMARK_CACHE_ENTRIES = int(os.getenv("RETOUCH_LANDMARK_CACHE_ENTRIES", "1024"))
+
+# CPU 스레드 예산
+# OpenCV / BLAS(OpenMP) / 워커 풀이 각자 전체 코어 수만큼 스레드를 만들면
+# uvicorn 워커 여러 개 + 보정/예측 동시 실행 시 코어를 과점유 → 코어 수와 서버 프로세스 수로 나눠서 배정
+def derive_thread_budget(cores: int, server_workers: int = 1, retouch_workers: int = 0) -> dict:
+    """
+    코어 수 / uvicorn 워커 수로 풀 크기와 라이브러리 스레드 수 계산
+    - retouch_workers: 서버 프로세스당 보정 워커 수 (0 이면 min(4, 프로세스당 코어))
+    - intra_op_threads: 보정 워커 1개가 쓰는 OpenCV/BLAS 스레드 수 (워커들이 프로세스 몫의 코어를 나눠 씀)
+    """
+    per_server = max(1, cores // max(1, server_workers))
+    workers = retouch_workers if retouch_workers > 0 else max(1, min(4, per_server))
+    intra = max(1, per_server // workers)
+    return {
+        "cores": cores,
+        "server_workers": max(1, server_workers),
+        "retouch_workers": workers,
+        "intra_op_threads": intra,
+        "face_workers": max(1, min(4, intra)),
+        "live_workers": max(1, min(4, per_server)),
+    }
+
+
+def _available_cores() -> int:
+    # 컨테이너/taskset 으로 제한된 경우 실제로 쓸 수 있는 코어만
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return os.cpu_count() or 1
+
+
+CPU_CORES = int(os.getenv("CPU_CORES", "0")) or _available_cores()
+SERVER_WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))  # uvicorn --workers 와 맞출 것
+THREAD_BUDGET = derive_thread_budget(CPU_CORES, SERVER_WORKERS, int(os.getenv("RETOUCH_WORKERS", "0")))
+# OpenCV (cv2.setNumThreads) / BLAS·OpenMP (OMP/OPENBLAS/MKL_NUM_THREADS) 스레드 수, 0 이면 예산값
+CV_NUM_THREADS = int(os.getenv("CV_NUM_THREADS", "0")) or THREAD_BUDGET["intra_op_threads"]
+BLAS_NUM_THREADS = int(os.getenv("BLAS_NUM_THREADS", "0")) or THREAD_BUDGET["intra_op_threads"]
+# 포즈 K-NN 이웃 탐색 병렬 작업 수 (요청당 샘플 1개라 1 이 가장 빠름)
+POSE_KNN_JOBS = int(os.getenv("POSE_KNN_JOBS", "1"))
+
+# 보정 작업 실행기 (이벤트 루프를 막지 않도록 별도 워커에서 처리)
+RETOUCH_EXECUTOR = os.getenv("RETOUCH_EXECUTOR", "process").lower()  # "process" / "thread"
+RETOUCH_WORKERS = THREAD_BUDGET["retouch_workers"]
+RETOUCH_QUEUE_SIZE = int(os.getenv("RETOUCH_QUEUE_SIZE", "8"))  # 실행 중 외 대기 가능한 작업 수
+
+# 로깅/진단
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()  # "text" / "json"
+# 비싼 진단 통계를 계산할 요청 비율 (0이면 X-Debug 헤더/?debug=1 요청만)
+DIAG_SAMPLE_RATE = float(os.getenv("DIAG_SAMPLE_RATE", "0"))
+
+# 피부 보정 품질 tier: "quality"(bilateral, 기존) / "balanced"(guided filter) / "fast"(축소 bilateral)
+SKIN_SMOOTH_TIER = os.getenv("SKIN_SMOOTH_TIER", "quality").lower()
+# balanced/fast tier 에서 필터를 계산할 얼굴 ROI 최대 긴 변 (px)
+SKIN_SMOOTH_WORK_EDGE = int(os.getenv("SKIN_SMOOTH_WORK_EDGE", "512"))
+
+# 기하 변형: 눈 확대 배율, 턱/광대 축소 비율 (얼굴 중심선 쪽으로 당기는 비율, 0 이면 끔)
+RETOUCH_EYE_SCALE = float(os.getenv("RETOUCH_EYE_SCALE", "1.15"))
+FACE_SLIM_STRENGTH = float(os.getenv("FACE_SLIM_STRENGTH", "0.05"))
+
+# 단체 사진: FaceMesh 한 번에 검출할 최대 얼굴 수, 얼굴별 보정 병렬 스레드 수
+RETOUCH_MAX_FACES = max(1, int(os.getenv("RETOUCH_MAX_FACES", "4")))
+RETOUCH_FACE_WORKERS = max(1, int(os.getenv("RETOUCH_FACE_WORKERS", "0")) or THREAD_BUDGET["face_workers"])
+
+# 업로드 제한: 파일 크기 (MB), 픽셀 수 (헤더로 디코딩 전에 확인)
+RETOUCH_MAX_UPLOAD_MB = float(os.getenv("RETOUCH_MAX_UPLOAD_MB", "20"))
+RETOUCH_MAX_PIXELS = int(float(os.getenv("RETOUCH_MAX_PIXELS", "50e6")))
+# 작업 해상도 긴 변 (px): 더 큰 입력은 디코딩 시 자동 축소 (0 이면 원본 해상도 그대로)
+RETOUCH_MAX_WORK_EDGE = int(os.getenv("RETOUCH_MAX_WORK_EDGE", "4096"))
+# 동시에 처리 중인 보정 작업의 예상 메모리 합계 한도 (MB, 넘으면 503)
+RETOUCH_MEMORY_BUDGET_MB = float(os.getenv("RETOUCH_MEMORY_BUDGET_MB", "2048"))
+
+# progressive 보정: 프리뷰 최대 긴 변 (px), 작업 결과 보관 시간/개수
+RETOUCH_PREVIEW_MAX_EDGE = int(os.getenv("RETOUCH_PREVIEW_MAX_EDGE", "640"))
+RETOUCH_JOB_TTL_SEC = float(os.getenv("RETOUCH_JOB_TTL_SEC", "600"))
+RETOUCH_JOB_MAX = int(os.getenv("RETOUCH_JOB_MAX", "100"))
+
+# 실시간 보정 프리뷰 (WebSocket): 최대 동시 세션 수, 처리 해상도 긴 변 (px), jpeg 품질
+RETOUCH_LIVE_MAX_SESSIONS = int(os.getenv("RETOUCH_LIVE_MAX_SESSIONS", "4"))
+RETOUCH_LIVE_MAX_EDGE = int(os.getenv("RETOUCH_LIVE_MAX_EDGE", "480"))
+RETOUCH_LIVE_QUALITY = int(os.getenv("RETOUCH_LIVE_QUALITY", "70"))
+RETOUCH_LIVE_WORKERS = max(1, int(os.getenv("RETOUCH_LIVE_WORKERS", "0")) or THREAD_BUDGET["live_workers"])
+
+# 네컷 스트립 합성: 프레임 PNG 위치, 출력 배율 (프레임 원본 837x2639 기준, PrintPage 저장과 같은 2배), 합성 스레드 수
+PHOTO_STRIP_FRAME_DIR = os.getenv(
+    "PHOTO_STRIP_FRAME_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "frontend", "src", "assets", "images", "frames"),
+)
+PHOTO_STRIP_SCALE = float(os.getenv("PHOTO_STRIP_SCALE", "2"))
+PHOTO_STRIP_WORKERS = max(1, int(os.getenv("PHOTO_STRIP_WORKERS", "2")))
@@ -1,11 +1,31 @@
-from fastapi import FastAPI
+# BLAS/OpenMP 스레드 수는 numpy/sklearn 이 처음 import 되기 전에 정해야 하므로 가장 먼저 적용
+import concurrency
+concurrency.apply_thread_env()
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from routers import pose, retouch
-from services import pose_service
-from config import CORS_ORIGINS
+from routers import metrics as metrics_router, pose, retouch
+from services import pose_service, diagnostics, metrics
+from config import CORS_ORIGINS, ENABLE_POSE_API, ENABLE_RETOUCH_API, ENABLE_METRICS, RETOUCH_PRELOAD
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 보정 모듈은 요청 처리를 막지 않도록 백그라운드에서 미리 로드
+    if ENABLE_RETOUCH_API and RETOUCH_PRELOAD == "background":
+        loop = asyncio.get_running_loop()
+        loop.run_in_executor(None, retouch.preload_retouch_service)
+    yield
+    if ENABLE_RETOUCH_API:
+        from services import retouch_pool
+        retouch_pool.shutdown_pool()
+
 
 # FastAPI 앱 생성
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # CORS 설정
 app.add_middleware(
@@ -16,9 +36,46 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 서버 시작 시 학습 데이터 로드
-pose_service.load_pose_data()
+@app.middleware("http")
+async def diagnostics_middleware(request: Request, call_next):
+    """요청 단위 진단 플래그 (X-Debug 헤더 / ?debug=1 / DIAG_SAMPLE_RATE 샘플링)"""
+    flag = diagnostics.parse_debug_flag(
+        request.headers.get("x-debug") or request.query_params.get("debug")
+    )
+    token = diagnostics.set_debug(flag)
+    try:
+        return await call_next(request)
+    finally:
+        diagnostics.reset_debug(token)
+
+
+if ENABLE_METRICS:
+    @app.middleware("http")
+    async def metrics_middleware(request: Request, call_next):
+        """라우트별 요청 수/지연 시간 (라벨은 경로 템플릿 → /api/retouch-jobs/{job_id} 처럼 묶임)"""
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            route = request.scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            metrics.HTTP_LATENCY.observe(time.perf_counter() - start, request.method, path)
+            metrics.HTTP_REQUESTS.inc(request.method, path, str(status))
+
 
 # 라우터 등록
-app.include_router(pose.router)
-app.include_router(retouch.router)
+if ENABLE_POSE_API:
+    # 서버 시작 시 학습 데이터 로드
+    pose_service.load_pose_data()
+    app.include_router(pose.router)
+if ENABLE_RETOUCH_API:
+    app.include_router(retouch.router)
+if ENABLE_METRICS:
+    app.include_router(metrics_router.router)
+    if ENABLE_RETOUCH_API:
+        # 보정 큐 깊이 gauge (retouch_pool 은 cv2 없이 import 가능)
+        from services import retouch_pool
+        retouch_pool.register_metrics()
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
 # Pydantic 모델 (React가 보낼 데이터 형식)
 class PoseData(BaseModel):
@@ -9,3 +9,13 @@ class PoseData(BaseModel):
 class PredictData(BaseModel):
     features: List[float]
 
+class StripPhoto(BaseModel):
+    # 셋 중 하나: 보정 결과 data URL / progressive 작업 id / retouch-batch 결과의 cache_key
+    image_url: Optional[str] = None
+    job_id: Optional[str] = None
+    cache_key: Optional[str] = None
+
+class PhotoStripData(BaseModel):
+    photos: List[StripPhoto]  # 위에서부터 슬롯 순서 (최대 4장)
+    frame: str = "white"      # white / black / red
+    filter: str = "none"      # none / grayscale / 6s / bright
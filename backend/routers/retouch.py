@@ -1,22 +1,137 @@
+import asyncio
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from fastapi import APIRouter, HTTPException, UploadFile, File
-from services import retouch_service
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
+from config import RETOUCH_LIVE_MAX_EDGE, RETOUCH_LIVE_QUALITY
+from models.schemas import PhotoStripData
+from services import get_retouch_service, get_retouch_service_async, diagnostics
+
+logger = diagnostics.get_logger("router.retouch")
 
 router = APIRouter(prefix="/api", tags=["retouch"])
 
 
+def preload_retouch_service():
+    """서버 시작 후 백그라운드 preload (실패해도 첫 요청에서 다시 시도)"""
+    try:
+        get_retouch_service()
+        logger.info("[retouch] retouch_service preloaded")
+        from services import photo_strip
+        photo_strip.preload_frames()
+    except Exception as e:
+        logger.warning(f"[retouch] retouch_service preload failed: {e}")
+
+
+# 응답 포맷: json(data URL, 기존 프론트엔드) 또는 이미지 바이너리
+RESPONSE_FORMATS = ["json", "png", "jpeg", "webp"]
+_ACCEPT_FORMATS = [("image/webp", "webp"), ("image/jpeg", "jpeg"), ("image/png", "png")]
+
+
+def _resolve_format(fmt: Optional[str], accept: str) -> str:
+    """format 쿼리 > Accept 헤더 > json 순으로 응답 포맷 결정"""
+    if fmt:
+        fmt = fmt.lower()
+        if fmt == "jpg":
+            fmt = "jpeg"
+        if fmt not in RESPONSE_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Unsupported format: {fmt} (use one of {RESPONSE_FORMATS})")
+        return fmt
+    accept = (accept or "").lower()
+    for media_type, name in _ACCEPT_FORMATS:
+        if media_type in accept:
+            return name
+    return "json"
+
+
+def _busy_exception(e) -> HTTPException:
+    """작업 큐 포화 → 503 + Retry-After (클라이언트는 잠시 후 재시도)"""
+    return HTTPException(
+        status_code=503,
+        detail="Retouch server is busy. Please retry shortly.",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+def _retouch_params(
+    eye_scale: Optional[float] = Query(None, ge=1.0, le=1.5, description="눈 확대 배율 (기본 RETOUCH_EYE_SCALE)"),
+    slim: Optional[float] = Query(None, ge=0.0, le=0.2, description="얼굴형 축소 비율 (기본 FACE_SLIM_STRENGTH)"),
+    smooth: Optional[float] = Query(None, ge=0.0, le=1.0, description="피부 보정 강도 (0 이면 생략)"),
+    smooth_tier: Optional[str] = Query(None, description="quality | balanced | fast"),
+    blush: Optional[float] = Query(None, ge=0.0, le=1.0, description="블러셔 alpha"),
+    lip: Optional[float] = Query(None, ge=0.0, le=1.0, description="립 컬러 alpha"),
+    highlight: Optional[float] = Query(None, ge=0.0, le=1.0, description="하이라이트 alpha"),
+):
+    """
+    요청별 보정 파라미터 (생략한 값은 기본값)
+    - 같은 사진을 파라미터만 바꿔 다시 보내면 랜드마크 캐시로 FaceMesh 를 건너뜀
+    - 동기 dependency → FastAPI 가 스레드 풀에서 실행 (preload 중 lock 대기로 이벤트 루프를 막지 않음)
+    """
+    retouch_service = get_retouch_service()
+    if smooth_tier is not None and smooth_tier not in retouch_service.SMOOTHING_ENGINES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported smooth_tier: {smooth_tier} (use one of {list(retouch_service.SMOOTHING_ENGINES)})",
+        )
+    overrides = {
+        "eye_scale": eye_scale,
+        "slim_strength": slim,
+        "smooth_strength": smooth,
+        "smooth_tier": smooth_tier,
+        "blush_alpha": blush,
+        "lip_alpha": lip,
+        "highlight_alpha": highlight,
+    }
+    return retouch_service.DEFAULT_PARAMS._replace(**{k: v for k, v in overrides.items() if v is not None})
+
+
+async def _read_upload(file: UploadFile) -> bytes:
+    """
+    업로드를 크기 한도까지만 읽고 헤더로 크기/픽셀 수 확인 (디코딩 전에 거절)
+    - 413: 파일/픽셀 수 초과, 415: 지원하지 않는 포맷
+    """
+    from services import retouch_limits
+    data = await file.read(retouch_limits.MAX_UPLOAD_BYTES + 1)
+    try:
+        retouch_limits.check_upload(data)
+    except retouch_limits.UploadRejected as e:
+        logger.info(f"[retouch] upload rejected ({file.filename}): {e.detail}")
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return data
+
+
 @router.post("/retouch-upload")
-async def retouch_image_upload(file: UploadFile = File(...)):
+async def retouch_image_upload(
+    request: Request,
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, description="json | png | jpeg | webp (생략 시 Accept 헤더 기준)"),
+    quality: int = Query(90, ge=1, le=100, description="jpeg/webp 품질"),
+    compression: Optional[int] = Query(None, ge=0, le=9, description="png 압축 레벨"),
+    params=Depends(_retouch_params),
+):
     """
     FormData로 이미지 업로드하여 AI 보정
     - MediaPipe FaceMesh로 얼굴 랜드마크 추출
     - OpenCV로 눈 확대 및 얼굴형 축소
+    - format=json(기본): data URL 을 담은 JSON / png·jpeg·webp: 이미지 바이너리
     """
+    from services import retouch_pool
+
+    response_format = _resolve_format(format, request.headers.get("accept", ""))
+    encode_format = "png" if response_format == "json" else response_format
+    image_data = await _read_upload(file)
     try:
-        image_data = await file.read()
-        enhanced_image_url = retouch_service.retouch_image(image_data, file.filename)
+        data = await retouch_pool.run_retouch(
+            image_data, file.filename, encode_format, quality=quality, compression=compression, params=params
+        )
+        retouch_service = await get_retouch_service_async()
+
+        if response_format != "json":
+            return Response(content=data, media_type=retouch_service.ENCODERS[response_format][1])
+
+        enhanced_image_url = retouch_service.to_data_url(data, "png")
         
         return {
             "enhanced_image_url": enhanced_image_url,
@@ -25,10 +140,348 @@ async def retouch_image_upload(file: UploadFile = File(...)):
     
     except HTTPException:
         raise
+    except retouch_pool.RetouchBusyError as e:
+        raise _busy_exception(e)
+    except ValueError as e:
+        # 헤더는 정상이지만 본문이 깨진 이미지 등 (디코딩 단계에서 발견)
+        raise HTTPException(status_code=400, detail=f"Invalid image: {str(e)}")
     except Exception as e:
-        print(f"Retouch error: {str(e)}")
+        logger.error(f"Retouch error: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail=f"Retouch failed: {str(e)}"
         )
 
+
+@router.post("/retouch-batch")
+async def retouch_batch_upload(
+    files: List[UploadFile] = File(...),
+    format: str = Query("png", description="결과 data URL 포맷: png | jpeg | webp"),
+    quality: int = Query(90, ge=1, le=100, description="jpeg/webp 품질"),
+    compression: Optional[int] = Query(None, ge=0, le=9, description="png 압축 레벨"),
+    params=Depends(_retouch_params),
+):
+    """
+    여러 장을 한 번에 업로드하여 병렬 보정 (4컷 모드)
+    - 입력 순서대로 결과 반환, 이미지별 status: success | fallback(원본 반환)
+    - 파일별 업로드 제한(크기/픽셀 수/포맷)에 걸린 파일은 그 항목만 fallback (이미지 없이 error, status_code)
+    """
+    from services import retouch_pool
+
+    fmt = _resolve_format(format, "")
+    if fmt == "json":
+        fmt = "png"
+    if not files:
+        raise HTTPException(status_code=400, detail="No files uploaded")
+
+    items, indices, rejected = [], [], {}
+    for i, f in enumerate(files):
+        try:
+            items.append((await _read_upload(f), f.filename, f.content_type))
+            indices.append(i)
+        except HTTPException as e:
+            rejected[i] = {
+                "index": i, "filename": f.filename, "status": "fallback",
+                "error": e.detail, "status_code": e.status_code,
+            }
+
+    try:
+        processed = []
+        if items:
+            processed = await retouch_pool.retouch_batch(
+                items, fmt, quality=quality, compression=compression, params=params
+            )
+    except retouch_pool.RetouchBusyError as e:
+        raise _busy_exception(e)
+    except Exception as e:
+        logger.error(f"Retouch batch error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Retouch batch failed: {str(e)}")
+
+    # retouch_batch 의 index 는 통과한 파일 기준 → 업로드 순서 기준으로 되돌림
+    results = [None] * len(files)
+    for i, entry in zip(indices, processed):
+        results[i] = {**entry, "index": i}
+    for i, entry in rejected.items():
+        results[i] = entry
+
+    return {
+        "results": results,
+        "status": "success" if all(r["status"] == "success" for r in results) else "partial",
+    }
+
+
+@router.post("/retouch-progressive")
+async def retouch_progressive_upload(
+    file: UploadFile = File(...),
+    format: str = Query("png", description="원본 결과 포맷: png | jpeg | webp"),
+    quality: int = Query(90, ge=1, le=100, description="jpeg/webp 품질"),
+    compression: Optional[int] = Query(None, ge=0, le=9, description="png 압축 레벨"),
+):
+    """
+    축소 해상도 프리뷰를 먼저 반환하고 원본 해상도 보정은 백그라운드에서 진행
+    - 응답: job_id + 프리뷰 data URL (jpeg)
+    - 원본 결과: GET /api/retouch-jobs/{job_id} (폴링) 또는 /stream (SSE)
+    """
+    from services import retouch_jobs, retouch_pool
+
+    fmt = _resolve_format(format, "")
+    if fmt == "json":
+        fmt = "png"
+    image_data = await _read_upload(file)
+    try:
+        started = await retouch_jobs.start_progressive(
+            image_data, file.filename, fmt, quality=quality, compression=compression
+        )
+    except retouch_pool.RetouchBusyError as e:
+        raise _busy_exception(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid image: {str(e)}")
+    except Exception as e:
+        logger.error(f"Retouch progressive error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Retouch failed: {str(e)}")
+
+    job = started["job"]
+    retouch_service = await get_retouch_service_async()
+    return {
+        "job_id": job.job_id,
+        "preview_image_url": retouch_service.to_data_url(started["preview"], "jpeg"),
+        "job_status": job.status,
+        "status": "success",
+    }
+
+
+def _job_or_404(job_id: str):
+    from services import retouch_jobs
+    job = retouch_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    return job
+
+
+@router.get("/retouch-jobs/{job_id}")
+def retouch_job_result(
+    request: Request,
+    job_id: str,
+    format: Optional[str] = Query(None, description="json | 이미지 바이너리 (생략 시 Accept 헤더 기준)"),
+):
+    """
+    원본 해상도 결과 조회
+    - 진행 중: 202 {"job_status": "pending"}
+    - 완료: data URL JSON 또는 이미지 바이너리 (작업을 만들 때 정한 포맷 그대로, 재인코딩하지 않음)
+    - 바이너리는 작업 포맷만 가능: format 이 다르거나 Accept 가 작업 포맷을 받지 않으면 406
+    """
+    job = _job_or_404(job_id)
+    if job.status == "pending":
+        return JSONResponse(status_code=202, content={"job_id": job_id, "job_status": "pending"})
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=f"Retouch failed: {job.error}")
+
+    retouch_service = get_retouch_service()
+    accept = request.headers.get("accept", "")
+    response_format = _resolve_format(format, accept)
+    media_type = retouch_service.ENCODERS[job.fmt][1]
+    if response_format != "json" and response_format != job.fmt:
+        accepts_job_fmt = any(t in accept.lower() for t in (media_type, "image/*", "*/*"))
+        if format or not accepts_job_fmt:
+            raise HTTPException(
+                status_code=406,
+                detail=f"Job result is {job.fmt}; request format={job.fmt} or json",
+            )
+        response_format = job.fmt
+    if response_format != "json":
+        return Response(content=job.data, media_type=media_type)
+    return {
+        "job_id": job_id,
+        "job_status": "done",
+        "enhanced_image_url": retouch_service.to_data_url(job.data, job.fmt),
+        "status": "success",
+    }
+
+
+@router.get("/retouch-jobs/{job_id}/stream")
+async def retouch_job_stream(job_id: str):
+    """원본 해상도 결과를 SSE 로 push (완료되면 done 또는 failed 이벤트 1개 후 종료)"""
+    import json
+    job = _job_or_404(job_id)
+
+    async def events():
+        await job.done_event.wait()
+        if job.status == "failed":
+            payload = {"job_id": job_id, "job_status": "failed", "error": job.error}
+            yield f"event: failed\ndata: {json.dumps(payload)}\n\n"
+            return
+        retouch_service = await get_retouch_service_async()
+        payload = {
+            "job_id": job_id,
+            "job_status": "done",
+            "enhanced_image_url": retouch_service.to_data_url(job.data, job.fmt),
+        }
+        yield f"event: done\ndata: {json.dumps(payload)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@router.websocket("/retouch-live")
+async def retouch_live(
+    websocket: WebSocket,
+    max_edge: Optional[int] = Query(None, ge=160, le=1280, description="처리 해상도 긴 변 (px), 생략 시 RETOUCH_LIVE_MAX_EDGE"),
+    quality: Optional[int] = Query(None, ge=1, le=100, description="응답 jpeg 품질, 생략 시 RETOUCH_LIVE_QUALITY"),
+):
+    """
+    카메라 프레임 실시간 보정 프리뷰
+    - 클라이언트: jpeg/png 프레임을 바이너리 메시지로 전송
+    - 서버: 보정된 jpeg 프레임을 바이너리 메시지로 응답 (눈 확대 + 화장만, 축소 해상도)
+    - 처리 중에 도착한 프레임은 최신 1장만 남기고 버림 → 느린 서버에서도 지연이 쌓이지 않음
+    - 동시 세션 한도 초과 시 close code 1013 (Try Again Later)
+    """
+    from services import retouch_live
+
+    await websocket.accept()
+    session = await retouch_live.open_session(
+        max_edge if max_edge is not None else RETOUCH_LIVE_MAX_EDGE,
+        quality if quality is not None else RETOUCH_LIVE_QUALITY,
+    )
+    if session is None:
+        await websocket.close(code=1013, reason="Too many live preview sessions")
+        return
+
+    latest = {"frame": None, "closed": False}
+    frame_ready = asyncio.Event()
+
+    async def receive_frames():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                data = message.get("bytes")
+                if not data:
+                    continue  # 텍스트 메시지는 무시
+                if latest["frame"] is not None:
+                    session.dropped += 1
+                latest["frame"] = data
+                frame_ready.set()
+        finally:
+            latest["closed"] = True
+            frame_ready.set()
+
+    receiver = asyncio.create_task(receive_frames())
+    try:
+        while True:
+            await frame_ready.wait()
+            frame_ready.clear()
+            if latest["closed"]:
+                break
+            frame, latest["frame"] = latest["frame"], None
+            if frame is None:
+                continue
+            out = await retouch_live.process_frame(session, frame)
+            if out is not None:
+                await websocket.send_bytes(out)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Retouch live error: {str(e)}")
+        try:
+            await websocket.close(code=1011)
+        except RuntimeError:
+            pass  # 이미 닫힌 연결
+    finally:
+        receiver.cancel()
+        await retouch_live.close_session(session)
+
+
+@router.get("/retouch-cache/stats")
+def retouch_cache_stats():
+    """보정 결과 캐시 hit/miss 및 사용량"""
+    from services import retouch_cache
+    if retouch_cache.result_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **retouch_cache.result_cache.get_stats()}
+
+
+# progressive 작업의 원본 결과가 아직 렌더링 중이면 기다리는 최대 시간 (초)
+_STRIP_JOB_WAIT_SEC = 30
+
+
+async def _strip_photo_bytes(photo) -> bytes:
+    """스트립 사진 1장 (data URL / progressive 작업 결과 / 결과 캐시) → 인코딩된 바이트"""
+    import base64
+    import binascii
+    from services import retouch_cache, retouch_limits
+
+    if photo.job_id:
+        job = _job_or_404(photo.job_id)
+        try:
+            await asyncio.wait_for(job.done_event.wait(), timeout=_STRIP_JOB_WAIT_SEC)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail=f"Retouch job {photo.job_id} is still running")
+        if job.status == "failed":
+            raise HTTPException(status_code=500, detail=f"Retouch failed: {job.error}")
+        return job.data
+
+    if photo.cache_key:
+        data = None
+        if retouch_cache.result_cache is not None:
+            # 디스크 tier 는 파일을 읽으므로 이벤트 루프 밖에서 조회
+            loop = asyncio.get_running_loop()
+            data = await loop.run_in_executor(None, retouch_cache.result_cache.get, photo.cache_key)
+        if data is None:
+            raise HTTPException(status_code=404, detail="Unknown or expired cache_key")
+        return data
+
+    if photo.image_url:
+        _, _, encoded = photo.image_url.partition("base64,")
+        try:
+            data = base64.b64decode(encoded or photo.image_url, validate=True)
+        except (binascii.Error, ValueError):
+            raise HTTPException(status_code=400, detail="image_url must be a base64 data URL")
+        try:
+            retouch_limits.check_upload(data)
+        except retouch_limits.UploadRejected as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        return data
+
+    raise HTTPException(status_code=400, detail="Each photo needs image_url, job_id or cache_key")
+
+
+@router.post("/photo-strip")
+async def photo_strip(
+    request: Request,
+    data: PhotoStripData,
+    format: Optional[str] = Query(None, description="json | png | jpeg | webp (생략 시 Accept 헤더 기준)"),
+    quality: int = Query(90, ge=1, le=100, description="jpeg/webp 품질"),
+    compression: Optional[int] = Query(None, ge=0, le=9, description="png 압축 레벨"),
+):
+    """
+    보정 결과를 프레임(white/black/red)에 합성한 출력용 네컷 스트립 (PrintPage 저장 이미지와 같은 해상도)
+    - 사진: 보정 결과 data URL, progressive job_id, retouch-batch cache_key 중 하나씩 (위에서부터 최대 4장)
+    - filter: none | grayscale | 6s | bright (PrintPage 의 CSS filter 와 동일)
+    """
+    from services import photo_strip as strip_service
+
+    if data.frame not in strip_service.FRAMES:
+        raise HTTPException(status_code=400, detail=f"Unknown frame: {data.frame} (use one of {list(strip_service.FRAMES)})")
+    if data.filter not in strip_service.FILTERS:
+        raise HTTPException(status_code=400, detail=f"Unknown filter: {data.filter} (use one of {list(strip_service.FILTERS)})")
+    if not data.photos or len(data.photos) > len(strip_service.PHOTO_SLOTS):
+        raise HTTPException(status_code=400, detail=f"Send 1 to {len(strip_service.PHOTO_SLOTS)} photos")
+
+    response_format = _resolve_format(format, request.headers.get("accept", ""))
+    encode_format = "png" if response_format == "json" else response_format
+    images = [await _strip_photo_bytes(p) for p in data.photos]
+    try:
+        strip = await strip_service.compose(
+            images, data.frame, data.filter, encode_format, quality=quality, compression=compression
+        )
+    except ValueError as e:
+        # 헤더 확인은 통과했지만 디코딩할 수 없는 사진 (클라이언트 입력 오류)
+        raise HTTPException(status_code=400, detail=f"Invalid photo: {str(e)}")
+    except Exception as e:
+        logger.error(f"Photo strip error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Photo strip failed: {str(e)}")
+
+    retouch_service = await get_retouch_service_async()
+    if response_format != "json":
+        return Response(content=strip, media_type=retouch_service.ENCODERS[response_format][1])
+    return {"strip_image_url": retouch_service.to_data_url(strip, encode_format), "status": "success"}
@@ -1,4 +1,36 @@
 # services 패키지
+# retouch_service는 무거운 의존성(cv2, mediapipe)을 가지므로 여기서 import 하지 않음
+# (get_retouch_service 로 처음 사용할 때 로드)
+import asyncio
+import threading
+
 from . import pose_service
-from . import retouch_service
 
+_retouch_service = None
+_retouch_lock = threading.Lock()
+
+
+def get_retouch_service():
+    """retouch_service 지연 로드 (최초 1회만 import + MediaPipe 초기화)"""
+    global _retouch_service
+    if _retouch_service is None:
+        with _retouch_lock:
+            if _retouch_service is None:
+                import concurrency
+                concurrency.apply_thread_limits()
+                from . import retouch_service
+                retouch_service._init_mediapipe()
+                _retouch_service = retouch_service
+    return _retouch_service
+
+
+async def get_retouch_service_async():
+    """
+    이벤트 루프용 get_retouch_service
+    - 아직 로드 전이거나 백그라운드 preload 가 lock 을 잡고 있으면 기본 스레드 풀에서 기다림
+      (cv2/mediapipe import 동안 이벤트 루프가 멈추지 않도록)
+    """
+    if _retouch_service is not None:
+        return _retouch_service
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, get_retouch_service)
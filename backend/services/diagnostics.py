@@ -0,0 +1,128 @@
+"""
+진단/로깅 레이어
+
+- 표준 logging 기반, 레벨은 LOG_LEVEL 로 설정 (LOG_FORMAT=json 이면 한 줄 JSON)
+- 실제 출력은 QueueListener 스레드에서 처리 → 요청 스레드는 큐에 넣기만 함
+  (보정 프로세스 풀 워커는 setup_worker_logging 으로 큐 없이 바로 출력)
+- 비싼 진단 통계(diff, mask 통계, 확률 분포 등)는 enabled() 일 때만 계산
+  - 요청 단위 디버그: X-Debug: 1 헤더 또는 ?debug=1
+  - 샘플링: DIAG_SAMPLE_RATE (0.0~1.0) 비율의 요청에서 자동 활성화
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from typing import Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import LOG_LEVEL, LOG_FORMAT, DIAG_SAMPLE_RATE
+
+LOGGER_ROOT = "booth"
+
+_debug_var: contextvars.ContextVar = contextvars.ContextVar("diagnostics_debug", default=False)
+_listener: Optional[logging.handlers.QueueListener] = None
+_configured = False
+_setup_lock = threading.Lock()
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def _stream_handler() -> logging.Handler:
+    stream = logging.StreamHandler()
+    if LOG_FORMAT == "json":
+        stream.setFormatter(_JsonFormatter())
+    else:
+        stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    return stream
+
+
+def setup_logging():
+    """booth.* 로거를 큐 기반 비동기 출력으로 설정 (여러 번 호출해도 한 번만 적용)"""
+    global _listener, _configured
+    if _configured:
+        return
+    with _setup_lock:
+        if _configured:
+            return
+        log_queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        root = logging.getLogger(LOGGER_ROOT)
+        root.setLevel(LOG_LEVEL)
+        root.addHandler(logging.handlers.QueueHandler(log_queue))
+        root.propagate = False
+
+        _listener = logging.handlers.QueueListener(log_queue, _stream_handler(), respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+        _configured = True
+
+
+def setup_worker_logging():
+    """
+    프로세스 풀 워커용: booth.* 로거를 큐/리스너 없이 바로 stderr 로 출력
+    - 워커 프로세스는 atexit 를 실행하지 않고 끝나므로 리스너 큐에 남은 로그를 잃지 않도록 직접 출력
+    - 이미 붙어 있는 핸들러(import 시 만든 QueueHandler, fork 로 물려받은 핸들러)는 모두 교체
+    """
+    global _listener, _configured
+    with _setup_lock:
+        root = logging.getLogger(LOGGER_ROOT)
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        listener, _listener = _listener, None
+        if listener is not None:
+            # 이 프로세스에서 시작한 리스너면 남은 로그를 내보내고 종료
+            # (fork 로 복사된 리스너는 스레드가 이미 멈춘 상태라 바로 반환)
+            atexit.unregister(listener.stop)
+            listener.stop()
+        root.setLevel(LOG_LEVEL)
+        root.addHandler(_stream_handler())
+        root.propagate = False
+        _configured = True
+
+
+def get_logger(name: str) -> logging.Logger:
+    setup_logging()
+    return logging.getLogger(f"{LOGGER_ROOT}.{name}")
+
+
+def enabled() -> bool:
+    """현재 요청에서 비싼 진단 통계를 계산할지 여부"""
+    return _debug_var.get()
+
+
+def set_debug(flag: Optional[bool] = None) -> contextvars.Token:
+    """
+    현재 컨텍스트(요청)의 디버그 여부 설정
+    - flag=None 이면 DIAG_SAMPLE_RATE 확률로 활성화
+    - 반환된 token 으로 reset_debug() 호출
+    """
+    if flag is None:
+        flag = DIAG_SAMPLE_RATE > 0 and random.random() < DIAG_SAMPLE_RATE
+    return _debug_var.set(bool(flag))
+
+
+def reset_debug(token: contextvars.Token):
+    _debug_var.reset(token)
+
+
+def parse_debug_flag(value: Optional[str]) -> Optional[bool]:
+    """헤더/쿼리 값 → True/False/None(지정 안 함)"""
+    if value is None:
+        return None
+    return value.strip().lower() in ("1", "true", "yes", "on")
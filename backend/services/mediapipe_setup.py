@@ -0,0 +1,214 @@
+"""
+MediaPipe ASCII 경로 준비 (윈도우 한글 경로 문제 우회)
+
+- 설치 경로가 ASCII 이면 복사 없이 그대로 사용
+- 그렇지 않으면 ASCII 캐시 디렉토리에 패키지를 복사하고 stamp 파일로 버전/무결성 확인
+- 서버 시작 전에 미리 만들어 둘 수 있음:
+    python -m services.mediapipe_setup [--force]
+"""
+import argparse
+import contextlib
+import hashlib
+import importlib.metadata
+import importlib.util
+import json
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import MEDIAPIPE_ASCII_COPY, MEDIAPIPE_ASCII_CACHE_DIR
+from services import diagnostics
+
+logger = diagnostics.get_logger("mediapipe_setup")
+
+ASCII_MP_SITE = Path(MEDIAPIPE_ASCII_CACHE_DIR)
+ASCII_MP_PACKAGE = ASCII_MP_SITE / "mediapipe"
+STAMP_FILE = ASCII_MP_SITE / "mediapipe_ascii_stamp.json"
+LOCK_FILE = ASCII_MP_SITE / "mediapipe_ascii.lock"
+
+_LOCK_WAIT_SEC = 300       # 다른 프로세스의 빌드를 기다리는 최대 시간
+_LOCK_STALE_SEC = 600      # 이보다 오래된 락 파일은 죽은 프로세스가 남긴 것으로 보고 제거
+_LOCK_POLL_SEC = 0.2
+
+
+def _find_source_package() -> Path:
+    spec = importlib.util.find_spec("mediapipe")
+    if spec is None or spec.origin is None:
+        raise ImportError("mediapipe package not found in site-packages")
+    source_pkg = Path(spec.origin).resolve().parent
+    if source_pkg == ASCII_MP_PACKAGE.resolve():
+        # 이미 캐시 경로가 sys.path 앞에 있는 경우: 원본 위치를 다시 찾음
+        for entry in sys.path:
+            candidate = Path(entry) / "mediapipe" / "__init__.py"
+            if Path(entry).resolve() != ASCII_MP_SITE.resolve() and candidate.exists():
+                return candidate.resolve().parent
+    return source_pkg
+
+
+def _mediapipe_version() -> str:
+    try:
+        return importlib.metadata.version("mediapipe")
+    except importlib.metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def _tree_hash(root: Path) -> str:
+    """상대 경로 + 파일 크기 기반 해시 (복사본 무결성 확인용)"""
+    h = hashlib.sha256()
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d != "__pycache__")
+        for name in sorted(filenames):
+            if name.endswith(".pyc"):
+                continue
+            path = Path(dirpath) / name
+            rel = path.relative_to(root).as_posix()
+            h.update(rel.encode("utf-8"))
+            h.update(str(path.stat().st_size).encode("ascii"))
+    return h.hexdigest()
+
+
+def _read_stamp():
+    try:
+        with open(STAMP_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_cache_valid(source_pkg: Path = None) -> bool:
+    """stamp 의 버전/해시가 현재 설치본 및 복사본과 모두 일치하는지 확인"""
+    stamp = _read_stamp()
+    if not stamp or not ASCII_MP_PACKAGE.exists():
+        return False
+    if stamp.get("version") != _mediapipe_version():
+        return False
+    if source_pkg is not None and stamp.get("source_hash") != _tree_hash(source_pkg):
+        return False
+    return stamp.get("copy_hash") == _tree_hash(ASCII_MP_PACKAGE)
+
+
+@contextlib.contextmanager
+def _build_lock():
+    """
+    캐시 빌드 프로세스 간 락 (O_EXCL 로 락 파일 생성, OS 무관)
+    - 서버 여러 개 / 워커 프로세스가 동시에 시작해도 rmtree + rename 이 겹치지 않음
+    - _LOCK_STALE_SEC 보다 오래된 락은 비정상 종료로 남은 것으로 보고 제거
+    """
+    ASCII_MP_SITE.mkdir(parents=True, exist_ok=True)
+    deadline = time.monotonic() + _LOCK_WAIT_SEC
+    while True:
+        try:
+            fd = os.open(LOCK_FILE, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                age = time.time() - LOCK_FILE.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if age > _LOCK_STALE_SEC:
+                logger.warning("Removing stale lock file %s (age %.0fs)", LOCK_FILE, age)
+                with contextlib.suppress(FileNotFoundError):
+                    LOCK_FILE.unlink()
+                continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Timed out waiting for MediaPipe cache lock: {LOCK_FILE}")
+            time.sleep(_LOCK_POLL_SEC)
+    try:
+        os.write(fd, str(os.getpid()).encode("ascii"))
+        os.close(fd)
+        yield
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            LOCK_FILE.unlink()
+
+
+def build_cache(source_pkg: Path = None, force: bool = False) -> Path:
+    """
+    ASCII 캐시 생성
+    - 임시 디렉토리에 복사한 뒤 rename → 중간에 끊긴 복사본은 절대 재사용되지 않음
+    - stamp 는 복사 완료 후 마지막에 기록
+    - 빌드는 락 안에서만 수행, 락을 잡은 뒤 stamp 를 다시 확인해서
+      기다리는 동안 다른 프로세스가 만든 유효한 캐시는 그대로 사용
+    """
+    source_pkg = source_pkg or _find_source_package()
+    if not force and is_cache_valid(source_pkg):
+        return ASCII_MP_SITE
+
+    with _build_lock():
+        if not force and is_cache_valid(source_pkg):
+            logger.info("ASCII cache was built by another process: %s", ASCII_MP_PACKAGE)
+            return ASCII_MP_SITE
+        _build_cache_locked(source_pkg)
+    return ASCII_MP_SITE
+
+
+def _build_cache_locked(source_pkg: Path):
+    logger.info("Building ASCII cache: %s -> %s", source_pkg, ASCII_MP_PACKAGE)
+    if STAMP_FILE.exists():
+        STAMP_FILE.unlink()
+
+    tmp_pkg = ASCII_MP_SITE / f"mediapipe.tmp-{os.getpid()}"
+    if tmp_pkg.exists():
+        shutil.rmtree(tmp_pkg)
+    shutil.copytree(source_pkg, tmp_pkg, ignore=shutil.ignore_patterns("__pycache__", "*.pyc"))
+
+    if ASCII_MP_PACKAGE.exists():
+        shutil.rmtree(ASCII_MP_PACKAGE)
+    os.replace(tmp_pkg, ASCII_MP_PACKAGE)
+
+    stamp = {
+        "version": _mediapipe_version(),
+        "source": str(source_pkg),
+        "source_hash": _tree_hash(source_pkg),
+        "copy_hash": _tree_hash(ASCII_MP_PACKAGE),
+    }
+    with open(STAMP_FILE, "w", encoding="utf-8") as f:
+        json.dump(stamp, f, indent=2)
+    logger.info("ASCII cache ready (mediapipe %s)", stamp["version"])
+
+
+def prepare_mediapipe_package():
+    """
+    mediapipe import 전에 호출
+    - MEDIAPIPE_ASCII_COPY: "auto"(비ASCII 경로일 때만) / "always" / "never"
+    - 반환값: 사용 중인 ASCII site 경로 (복사하지 않았으면 None)
+    """
+    if MEDIAPIPE_ASCII_COPY == "never":
+        return None
+
+    source_pkg = _find_source_package()
+    if MEDIAPIPE_ASCII_COPY == "auto" and str(source_pkg).isascii():
+        return None
+
+    site = build_cache(source_pkg)
+
+    if str(site) not in sys.path:
+        sys.path.insert(0, str(site))
+
+    # 원본 경로에서 이미 import 된 경우에만 모듈을 내려서 캐시 경로로 다시 import
+    loaded = sys.modules.get("mediapipe")
+    if loaded is not None and not str(getattr(loaded, "__file__", "")).startswith(str(site)):
+        for name in [m for m in sys.modules if m == "mediapipe" or m.startswith("mediapipe.")]:
+            del sys.modules[name]
+    return site
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prebuild the ASCII-path MediaPipe package cache")
+    parser.add_argument("--force", action="store_true", help="rebuild even if the cache is valid")
+    parser.add_argument("--check", action="store_true", help="only report whether the cache is valid")
+    args = parser.parse_args()
+
+    source_pkg = _find_source_package()
+    if args.check:
+        valid = is_cache_valid(source_pkg)
+        logger.info("source=%s, cache=%s, valid=%s", source_pkg, ASCII_MP_SITE, valid)
+        sys.exit(0 if valid else 1)
+    build_cache(source_pkg, force=args.force)
+
+
+if __name__ == "__main__":
+    main()
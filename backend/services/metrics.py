@@ -0,0 +1,213 @@
+"""
+in-process 메트릭 레지스트리 (Prometheus text format, GET /metrics)
+
+- Counter / Histogram: 라벨 값 tuple 별로 누적, 관측 1번 = bisect + lock 1번 (부하 중에도 켜 둘 수 있음)
+- span(stage) / timed(stage): 단계별 소요 시간 → booth_stage_duration_seconds{stage="..."}
+- 보정 프로세스 풀 워커에서 기록한 값은 작업 결과와 함께 부모로 보내서 합침 (take_delta → merge_delta)
+- gauge 는 scrape 시점에 등록된 collector 콜백으로 수집 (보정 큐 깊이 등)
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, List, Tuple
+
+# 요청/단계 지연 시간 버킷 (초)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values: Dict[tuple, object] = {}
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def take(self) -> Dict[tuple, object]:
+        """지금까지 값을 꺼내고 0 으로 초기화 (워커 → 부모 전달용)"""
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_items(items))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def merge(self, values: Dict[tuple, float]):
+        with self._lock:
+            for labels, value in values.items():
+                self._values[labels] = self._values.get(labels, 0.0) + value
+
+    def _render_items(self, items):
+        for labels, value in items:
+            yield f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels):
+        i = bisect.bisect_left(self.buckets, value)  # le 는 상한 포함
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def merge(self, values: Dict[tuple, list]):
+        with self._lock:
+            for labels, (counts, total, n) in values.items():
+                state = self._values.get(labels)
+                if state is None:
+                    state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                for i, c in enumerate(counts):
+                    state[0][i] += c
+                state[1] += total
+                state[2] += n
+
+    def _render_items(self, items):
+        for labels, (counts, total, n) in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.label_names, labels)} {n}"
+
+
+# =========================
+# 레지스트리
+# =========================
+
+_metrics: Dict[str, _Metric] = {}
+_collectors: List[Callable[[], List[Tuple[str, str, str, float]]]] = []
+_registry_lock = threading.Lock()
+
+
+def _register(metric: _Metric) -> _Metric:
+    with _registry_lock:
+        existing = _metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        _metrics[metric.name] = metric
+        return metric
+
+
+def counter(name: str, help_text: str, label_names: Tuple[str, ...] = ()) -> Counter:
+    return _register(Counter(name, help_text, label_names))
+
+
+def histogram(name: str, help_text: str, label_names: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+    return _register(Histogram(name, help_text, label_names, buckets))
+
+
+def register_collector(fn: Callable[[], List[Tuple[str, str, str, float]]]):
+    """scrape 시점에 호출 → [(이름, 타입(gauge/counter), 설명, 값), ...]"""
+    with _registry_lock:
+        if fn not in _collectors:
+            _collectors.append(fn)
+
+
+HTTP_REQUESTS = counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+HTTP_LATENCY = histogram("http_request_duration_seconds", "HTTP request latency by route", ("method", "route"))
+STAGE_LATENCY = histogram("booth_stage_duration_seconds", "Pipeline stage latency", ("stage",))
+
+
+@contextmanager
+def span(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - start, stage)
+
+
+def timed(stage: str):
+    """함수 전체를 span(stage) 로 측정하는 데코레이터"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                STAGE_LATENCY.observe(time.perf_counter() - start, stage)
+        return wrapper
+    return decorator
+
+
+# =========================
+# 프로세스 풀 워커 ↔ 부모
+# =========================
+
+def take_delta() -> Dict[str, Dict[tuple, object]]:
+    """워커: 마지막 전달 이후 기록된 값 (pickle 가능한 dict)"""
+    delta = {}
+    for name, metric in list(_metrics.items()):
+        values = metric.take()
+        if values:
+            delta[name] = values
+    return delta
+
+
+def merge_delta(delta: Dict[str, Dict[tuple, object]]):
+    """부모: 워커에서 받은 값 합치기 (부모에 없는 메트릭은 무시)"""
+    for name, values in (delta or {}).items():
+        metric = _metrics.get(name)
+        if metric is not None:
+            metric.merge(values)
+
+
+def render() -> str:
+    lines = []
+    for metric in list(_metrics.values()):
+        lines.extend(metric.render())
+    for collect in list(_collectors):
+        for name, kind, help_text, value in collect():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
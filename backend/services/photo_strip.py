@@ -0,0 +1,272 @@
+"""
+네컷 스트립 합성 (PrintPage 의 브라우저 캔버스 합성을 서버에서 처리)
+
+- 프레임 PNG 는 출력 해상도(PHOTO_STRIP_SCALE 배)로 한 번만 읽어서 프로세스 메모리에 보관
+  슬롯 밖은 흰 배경 위로 미리 합성해 두고, 슬롯 안은 투명(사진 자리) / 반투명(가장자리) 픽셀만 따로 기록
+- 사진: 헤더로 크기를 보고 슬롯에 필요한 해상도로만 디코딩 (JPEG 는 축소 디코딩)
+  → cover crop 후 슬롯 크기로 1회 리사이즈 → 필터 → 프레임 구멍에 복사
+- 필터는 PrintPage 의 CSS filter 와 같은 순서/값 (색 행렬은 cv2.transform, 밝기/대비는 LUT)
+- 결과는 출력 해상도에서 1회만 인코딩
+"""
+import asyncio
+import math
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import PHOTO_STRIP_FRAME_DIR, PHOTO_STRIP_SCALE, PHOTO_STRIP_WORKERS
+from services import diagnostics, metrics, retouch_limits
+
+logger = diagnostics.get_logger("photo_strip")
+
+FRAMES = {
+    "white": "frame_white.png",
+    "black": "frame_black.png",
+    "red": "frame_red.png",
+}
+# 프레임 원본 크기와 사진 슬롯 (x, y, w, h), PrintPage.jsx 와 동일
+FRAME_SIZE = (837, 2639)
+PHOTO_SLOTS = [
+    (21, 122, 795, 597),
+    (21, 737, 795, 597),
+    (21, 1352, 795, 597),
+    (21, 1967, 795, 597),
+]
+
+
+# =========================
+# 필터 (CSS filter 함수와 같은 정의, sRGB 기준)
+# =========================
+
+def _grayscale_matrix(amount: float) -> np.ndarray:
+    a = 1.0 - amount
+    return np.array([
+        [0.2126 + 0.7874 * a, 0.7152 - 0.7152 * a, 0.0722 - 0.0722 * a],
+        [0.2126 - 0.2126 * a, 0.7152 + 0.2848 * a, 0.0722 - 0.0722 * a],
+        [0.2126 - 0.2126 * a, 0.7152 - 0.7152 * a, 0.0722 + 0.9278 * a],
+    ])
+
+
+def _saturate_matrix(s: float) -> np.ndarray:
+    return np.array([
+        [0.213 + 0.787 * s, 0.715 - 0.715 * s, 0.072 - 0.072 * s],
+        [0.213 - 0.213 * s, 0.715 + 0.285 * s, 0.072 - 0.072 * s],
+        [0.213 - 0.213 * s, 0.715 - 0.715 * s, 0.072 + 0.928 * s],
+    ])
+
+
+def _tone_lut(brightness: float = 1.0, contrast: float = 1.0) -> np.ndarray:
+    """brightness → contrast (단계마다 0~255 clamp, CSS 와 동일)"""
+    x = np.clip(np.arange(256, dtype=np.float32) * brightness, 0, 255)
+    x = (x - 127.5) * contrast + 127.5
+    return np.clip(np.rint(x), 0, 255).astype(np.uint8)
+
+
+def _bgr(matrix_rgb: np.ndarray) -> np.ndarray:
+    """RGB 기준 색 행렬 → BGR 이미지용"""
+    return np.ascontiguousarray(matrix_rgb[::-1, ::-1], dtype=np.float32)
+
+
+# 필터 이름 → 단계 목록 ("matrix", 3x3) / ("lut", 256)
+FILTERS = {
+    "none": [],
+    # grayscale(100%) brightness(1.3) contrast(0.8)
+    "grayscale": [("matrix", _bgr(_grayscale_matrix(1.0))), ("lut", _tone_lut(1.3, 0.8))],
+    # grayscale(10%) brightness(0.9) contrast(0.8) saturate(0.9)
+    "6s": [
+        ("matrix", _bgr(_grayscale_matrix(0.1))),
+        ("lut", _tone_lut(0.9, 0.8)),
+        ("matrix", _bgr(_saturate_matrix(0.9))),
+    ],
+    # brightness(1.1) saturate(1.1) contrast(0.8)
+    "bright": [
+        ("lut", _tone_lut(brightness=1.1)),
+        ("matrix", _bgr(_saturate_matrix(1.1))),
+        ("lut", _tone_lut(contrast=0.8)),
+    ],
+}
+
+
+def apply_filter(img: np.ndarray, filter_name: str) -> np.ndarray:
+    for kind, op in FILTERS[filter_name]:
+        img = cv2.transform(img, op) if kind == "matrix" else cv2.LUT(img, op)
+    return img
+
+
+# =========================
+# 프레임 (출력 해상도, 프로세스당 1회 로드)
+# =========================
+
+class _Slot(NamedTuple):
+    rect: Tuple[int, int, int, int]  # x0, y0, x1, y1 (출력 해상도)
+    hole: np.ndarray                 # (h, w, 1) bool, 프레임이 완전히 투명한 사진 자리
+    ys: np.ndarray                   # 반투명 가장자리 픽셀 좌표 (슬롯 기준)
+    xs: np.ndarray
+    inv_alpha: np.ndarray            # (n, 1) float32, 1 - alpha
+    fg: np.ndarray                   # (n, 3) float32, 프레임 색 * alpha
+
+
+class _Frame(NamedTuple):
+    base: np.ndarray  # 출력 해상도 BGR (슬롯 밖/투명 영역은 흰 배경 위로 합성됨)
+    slots: List[_Slot]
+
+
+_frames: Dict[str, _Frame] = {}
+_frames_lock = threading.Lock()
+
+
+def canvas_size() -> Tuple[int, int]:
+    return int(round(FRAME_SIZE[0] * PHOTO_STRIP_SCALE)), int(round(FRAME_SIZE[1] * PHOTO_STRIP_SCALE))
+
+
+def _load_frame(frame_id: str) -> _Frame:
+    path = os.path.join(PHOTO_STRIP_FRAME_DIR, FRAMES[frame_id])
+    frame = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    if frame is None:
+        raise FileNotFoundError(f"Frame asset not found: {path}")
+    if frame.ndim == 2:
+        frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGRA)
+    elif frame.shape[2] == 3:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA)
+
+    width, height = canvas_size()
+    sx, sy = width / float(frame.shape[1]), height / float(frame.shape[0])
+    if (frame.shape[1], frame.shape[0]) != (width, height):
+        interp = cv2.INTER_AREA if sx < 1.0 else cv2.INTER_LINEAR
+        frame = cv2.resize(frame, (width, height), interpolation=interp)
+
+    alpha = frame[:, :, 3:4].astype(np.float32) * (1.0 / 255.0)
+    color = frame[:, :, :3].astype(np.float32)
+    base = np.clip(color * alpha + 255.0 * (1.0 - alpha) + 0.5, 0, 255).astype(np.uint8)
+
+    slots = []
+    for x, y, w, h in PHOTO_SLOTS:
+        x0, y0 = int(round(x * sx)), int(round(y * sy))
+        x1, y1 = min(width, int(round((x + w) * sx))), min(height, int(round((y + h) * sy)))
+        a = frame[y0:y1, x0:x1, 3]
+        ys, xs = np.nonzero((a > 0) & (a < 255))
+        wa = alpha[y0:y1, x0:x1][ys, xs]
+        slots.append(_Slot(
+            rect=(x0, y0, x1, y1),
+            hole=(a == 0)[..., None],
+            ys=ys,
+            xs=xs,
+            inv_alpha=1.0 - wa,
+            fg=color[y0:y1, x0:x1][ys, xs] * wa,
+        ))
+    logger.debug(f"[photo_strip] frame '{frame_id}' loaded at {width}x{height}")
+    return _Frame(base=base, slots=slots)
+
+
+def get_frame(frame_id: str) -> _Frame:
+    frame = _frames.get(frame_id)
+    if frame is None:
+        with _frames_lock:
+            frame = _frames.get(frame_id)
+            if frame is None:
+                frame = _load_frame(frame_id)
+                _frames[frame_id] = frame
+    return frame
+
+
+def preload_frames():
+    """서버 시작 시 모든 프레임을 출력 해상도로 미리 로드 (실패한 프레임은 첫 요청에서 다시 시도)"""
+    for frame_id in FRAMES:
+        try:
+            get_frame(frame_id)
+        except Exception as e:
+            logger.warning(f"[photo_strip] frame '{frame_id}' preload failed: {e}")
+
+
+# =========================
+# 합성
+# =========================
+
+def _decode_for_slot(image_data, width: int, height: int) -> np.ndarray:
+    """슬롯을 cover 로 채우는 데 필요한 해상도까지만 디코딩"""
+    from services import get_retouch_service
+    retouch_service = get_retouch_service()
+
+    max_edge = 0
+    info = retouch_limits.probe_image(image_data)
+    if info is not None and info.width > 0 and info.height > 0:
+        scale = max(width / float(info.width), height / float(info.height))
+        if scale < 1.0:
+            max_edge = int(math.ceil(max(info.width, info.height) * scale))
+    return retouch_service.decode_image(image_data, max_edge=max_edge)
+
+
+def _cover(img: np.ndarray, width: int, height: int) -> np.ndarray:
+    """비율 유지, 가운데 기준으로 잘라서 슬롯을 꽉 채움 (리사이즈 1회)"""
+    ih, iw = img.shape[:2]
+    if iw * height > width * ih:
+        cw = max(1, int(round(ih * width / float(height))))
+        x0 = (iw - cw) // 2
+        img = img[:, x0:x0 + cw]
+    else:
+        ch = max(1, int(round(iw * height / float(width))))
+        y0 = (ih - ch) // 2
+        img = img[y0:y0 + ch]
+    if img.shape[1] == width and img.shape[0] == height:
+        return img
+    interp = cv2.INTER_AREA if img.shape[1] > width else cv2.INTER_LINEAR
+    return cv2.resize(img, (width, height), interpolation=interp)
+
+
+@metrics.timed("photo_strip")
+def compose_strip(
+    images: List[bytes],
+    frame_id: str = "white",
+    filter_name: str = "none",
+    fmt: str = "png",
+    quality: int = 90,
+    compression: Optional[int] = None,
+) -> bytes:
+    """
+    보정 결과 이미지(최대 4장)를 프레임에 합성 → 인코딩된 스트립 바이트
+    - 사진이 없는 슬롯은 흰 배경
+    """
+    from services import get_retouch_service
+
+    frame = get_frame(frame_id)
+    canvas = frame.base.copy()
+    for slot, image_data in zip(frame.slots, images):
+        x0, y0, x1, y1 = slot.rect
+        photo = _cover(_decode_for_slot(image_data, x1 - x0, y1 - y0), x1 - x0, y1 - y0)
+        photo = apply_filter(photo, filter_name)
+
+        roi = canvas[y0:y1, x0:x1]
+        np.copyto(roi, photo, where=slot.hole)
+        if len(slot.ys):
+            under = photo[slot.ys, slot.xs].astype(np.float32)
+            roi[slot.ys, slot.xs] = np.clip(under * slot.inv_alpha + slot.fg + 0.5, 0, 255).astype(np.uint8)
+
+    return get_retouch_service().encode_image(canvas, fmt, quality=quality, compression=compression)
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=PHOTO_STRIP_WORKERS, thread_name_prefix="photo-strip")
+    return _executor
+
+
+async def compose(images: List[bytes], frame_id: str, filter_name: str, fmt: str = "png",
+                  quality: int = 90, compression: Optional[int] = None) -> bytes:
+    """이벤트 루프를 막지 않도록 합성 전용 스레드에서 실행 (프레임 캐시는 서버 프로세스에 1벌)"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_executor(), compose_strip, images, frame_id, filter_name, fmt, quality, compression
+    )
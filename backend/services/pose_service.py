@@ -10,13 +10,16 @@ from fastapi import HTTPException
 
 # 상위 디렉토리를 Python 경로에 추가
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config import MODEL_FILE_NAME, DATA_FILE_NAME
+from config import MODEL_FILE_NAME, DATA_FILE_NAME, POSE_KNN_JOBS
+from services import diagnostics, metrics
+
+logger = diagnostics.get_logger("pose")
 
 # AI 모델 및 데이터베이스 (간단한 인메모리)
 pose_data_db: Dict[str, List[List[float]]] = {}  # 예: { "브이": [ [좌표1], [좌표2] ] }
 
 # AI 뇌(분류기) 생성
-classifier = KNeighborsClassifier(n_neighbors=3)  # K-NN 알고리즘 사용
+classifier = KNeighborsClassifier(n_neighbors=3, n_jobs=POSE_KNN_JOBS)  # K-NN 알고리즘 사용
 
 
 def save_pose_data():
@@ -24,9 +27,9 @@ def save_pose_data():
     try:
         with open(DATA_FILE_NAME, 'w', encoding='utf-8') as f:
             json.dump(pose_data_db, f, ensure_ascii=False, indent=2)
-        print(f"학습 데이터 저장 완료: {DATA_FILE_NAME}")
+        logger.debug(f"학습 데이터 저장 완료: {DATA_FILE_NAME}")
     except Exception as e:
-        print(f"학습 데이터 저장 실패: {str(e)}")
+        logger.warning(f"학습 데이터 저장 실패: {str(e)}")
 
 
 def load_pose_data():
@@ -39,12 +42,12 @@ def load_pose_data():
                 # JSON은 키를 문자열로 저장하므로 그대로 사용
                 pose_data_db = {k: v for k, v in loaded_data.items()}
             total_count = sum(len(data) for data in pose_data_db.values())
-            print(f"학습 데이터 로드 완료: {DATA_FILE_NAME} (총 {total_count}개 데이터)")
+            logger.info(f"학습 데이터 로드 완료: {DATA_FILE_NAME} (총 {total_count}개 데이터)")
         except Exception as e:
-            print(f"학습 데이터 로드 실패: {str(e)}")
+            logger.warning(f"학습 데이터 로드 실패: {str(e)}")
             pose_data_db = {}
     else:
-        print(f"학습 데이터 파일이 없습니다. 새로 시작합니다.")
+        logger.info(f"학습 데이터 파일이 없습니다. 새로 시작합니다.")
         pose_data_db = {}
 
 
@@ -56,10 +59,11 @@ def add_pose_data(label: str, features: List[float]) -> int:
     pose_data_db[label].append(features)
     save_pose_data()
     
-    print(f"'{label}' 포즈 데이터 1개 수신. (총 {len(pose_data_db[label])}개)")
+    logger.debug(f"'{label}' 포즈 데이터 1개 수신. (총 {len(pose_data_db[label])}개)")
     return len(pose_data_db[label])
 
 
+@metrics.timed("train_model")
 def train_model():
     """지금까지 DB에 쌓인 모든 데이터를 AI에게 학습시킴"""
     try:
@@ -101,8 +105,8 @@ def train_model():
         # 모든 포즈의 최대 길이로 통일 (K-NN은 모든 샘플이 같은 길이여야 함)
         global_max_length = max(pose_expected_lengths.values()) if pose_expected_lengths else 0
         
-        print(f"[Training] 포즈별 기대 feature 길이: {pose_expected_lengths}")
-        print(f"[Training] 전역 최대 feature 길이: {global_max_length}")
+        logger.info(f"[Training] 포즈별 기대 feature 길이: {pose_expected_lengths}")
+        logger.info(f"[Training] 전역 최대 feature 길이: {global_max_length}")
         
         # 데이터 변환 및 정규화
         for label, features_list in pose_data_db.items():
@@ -177,7 +181,7 @@ def train_model():
             except Exception as e:
                 raise HTTPException(status_code=500, detail=f"Failed to save model: {str(e)}")
             
-            print(f"이상 탐지 모델 학습 완료! {len(X_train)}개의 데이터로 학습. (포즈: {pose_name})")
+            logger.info(f"이상 탐지 모델 학습 완료! {len(X_train)}개의 데이터로 학습. (포즈: {pose_name})")
             return {"message": f"Anomaly detection model trained! (Total: {len(X_train)} samples, Pose: {pose_name})"}
         else:
             # 2개 이상 포즈가 있는 경우: 기존 K-NN 분류기 사용
@@ -192,8 +196,8 @@ def train_model():
             for label in set(y_train):
                 pose_counts[label] = y_train.count(label)
             
-            print(f"[Training] 포즈별 샘플 수: {pose_counts}")
-            print(f"[Training] 총 샘플: {n_samples}, 포즈 종류: {n_poses}")
+            logger.info(f"[Training] 포즈별 샘플 수: {pose_counts}")
+            logger.info(f"[Training] 총 샘플: {n_samples}, 포즈 종류: {n_poses}")
             
             # K 값 결정: 샘플이 적으면 k=3, 많으면 k=5
             # 단, k는 각 포즈의 최소 샘플 수보다 작아야 함
@@ -201,13 +205,13 @@ def train_model():
             optimal_k = min(5, max(3, min_samples_per_pose // 2))
             optimal_k = max(1, optimal_k)  # 최소 1
             
-            print(f"[Training] K-NN k 값: {optimal_k} (최소 샘플 수: {min_samples_per_pose})")
+            logger.info(f"[Training] K-NN k 값: {optimal_k} (최소 샘플 수: {min_samples_per_pose})")
             
             # K 값이 다르면 새로운 분류기 생성
             if optimal_k != classifier.n_neighbors:
                 from sklearn.neighbors import KNeighborsClassifier
-                classifier = KNeighborsClassifier(n_neighbors=optimal_k, weights='distance')
-                print(f"[Training] K 값 변경: {classifier.n_neighbors} -> {optimal_k}")
+                classifier = KNeighborsClassifier(n_neighbors=optimal_k, weights='distance', n_jobs=POSE_KNN_JOBS)
+                logger.info(f"[Training] K 값 변경: {classifier.n_neighbors} -> {optimal_k}")
             
             try:
                 classifier.fit(X_train, y_train)
@@ -220,13 +224,13 @@ def train_model():
             except Exception as e:
                 raise HTTPException(status_code=500, detail=f"Failed to save model: {str(e)}")
         
-            print(f"모델 학습 완료! {len(X_train)}개의 데이터로 학습. (정규화 적용됨) -> {MODEL_FILE_NAME} 저장됨")
+            logger.info(f"모델 학습 완료! {len(X_train)}개의 데이터로 학습. (정규화 적용됨) -> {MODEL_FILE_NAME} 저장됨")
             return {"message": f"Model training completed! (Total: {len(X_train)} samples, {len(set(y_train))} poses, normalization applied)"}
     
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Unexpected error during model training: {str(e)}")
+        logger.error(f"Unexpected error during model training: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Unexpected error during model training: {str(e)}")
 
 
@@ -238,7 +242,8 @@ def predict_pose(features: List[float]) -> Dict[str, any]:
     
     try:
         # 저장된 뇌(.pkl)를 불러옴
-        loaded_model = joblib.load(MODEL_FILE_NAME)
+        with metrics.span("joblib_load"):
+            loaded_model = joblib.load(MODEL_FILE_NAME)
         
         # 모델 타입 확인
         if isinstance(loaded_model, dict) and loaded_model.get("type") == "anomaly_detection":
@@ -292,7 +297,7 @@ def predict_pose(features: List[float]) -> Dict[str, any]:
                 features = features + [0.0] * (expected_features - len(features))
             elif len(features) > expected_features:
                 # feature가 더 많으면 앞에서부터 자르기 (예상치 못한 경우)
-                print(f"Warning: Input features ({len(features)}) longer than expected ({expected_features}), truncating")
+                logger.warning(f"Input features ({len(features)}) longer than expected ({expected_features}), truncating")
                 features = features[:expected_features]
             
             # 학습 시와 동일하게 정규화 적용 (중요!)
@@ -304,20 +309,22 @@ def predict_pose(features: List[float]) -> Dict[str, any]:
                 raise HTTPException(status_code=400, detail="Invalid input features: all zeros")
         
             # 뇌에게 "이 좌표 뭐야?"라고 물어봄 (예측)
-            prediction = loaded_classifier.predict(features_array)
-            # "이 포즈 90% 확신해" (신뢰도)
-            probability = loaded_classifier.predict_proba(features_array)
+            with metrics.span("knn_predict"):
+                prediction = loaded_classifier.predict(features_array)
+                # "이 포즈 90% 확신해" (신뢰도)
+                probability = loaded_classifier.predict_proba(features_array)
             
             pose_name = prediction[0]
             confidence = np.max(probability[0])
             
-            # 디버깅: 예측 결과 로그
-            prob_dict = {str(k): float(v) for k, v in zip(loaded_classifier.classes_, probability[0])}
-            print(f"[Predict] Features: {len(features)} -> {expected_features}, Predicted: {pose_name}, Confidence: {confidence:.3f}")
-            print(f"[Predict] All probabilities: {prob_dict}")
-            # Feature 값 일부 출력 (처음 10개만)
-            if len(features) > 0:
-                print(f"[Predict] Feature sample (first 10): {features[:10]}")
+            # 디버깅: 예측 결과 로그 (진단 활성화된 요청에서만)
+            if diagnostics.enabled():
+                prob_dict = {str(k): float(v) for k, v in zip(loaded_classifier.classes_, probability[0])}
+                logger.debug(f"[Predict] Features: {len(features)} -> {expected_features}, Predicted: {pose_name}, Confidence: {confidence:.3f}")
+                logger.debug(f"[Predict] All probabilities: {prob_dict}")
+                # Feature 값 일부 출력 (처음 10개만)
+                if len(features) > 0:
+                    logger.debug(f"[Predict] Feature sample (first 10): {features[:10]}")
             
             return {"pose": pose_name, "confidence": confidence}
     
@@ -353,7 +360,7 @@ def delete_pose(pose_name: str) -> int:
     if os.path.exists(MODEL_FILE_NAME):
         os.remove(MODEL_FILE_NAME)
     
-    print(f"'{pose_name}' 포즈 데이터 {deleted_count}개 삭제 완료")
+    logger.info(f"'{pose_name}' 포즈 데이터 {deleted_count}개 삭제 완료")
     return deleted_count
 
 
@@ -367,7 +374,7 @@ def reset_all_data() -> int:
     # 학습 데이터 파일 삭제
     if os.path.exists(DATA_FILE_NAME):
         os.remove(DATA_FILE_NAME)
-        print(f"학습 데이터 파일 삭제: {DATA_FILE_NAME}")
+        logger.info(f"학습 데이터 파일 삭제: {DATA_FILE_NAME}")
     
     # 모델 파일도 삭제
     if os.path.exists(MODEL_FILE_NAME):
@@ -381,8 +388,8 @@ def reset_all_data() -> int:
     
     # 분류기도 초기화
     global classifier
-    classifier = KNeighborsClassifier(n_neighbors=3)
+    classifier = KNeighborsClassifier(n_neighbors=3, n_jobs=POSE_KNN_JOBS)
     
-    print(f"전체 데이터 {total_count}개 삭제 완료 (모든 학습 데이터 및 모델 파일 삭제됨)")
+    logger.info(f"전체 데이터 {total_count}개 삭제 완료 (모든 학습 데이터 및 모델 파일 삭제됨)")
     return total_count
 
@@ -0,0 +1,73 @@
+"""
+보정 작업 버퍼 풀 (워커 스레드별 재사용)
+
+- 마스크/float 누적 버퍼를 요청마다 새로 할당하지 않고 같은 워커 스레드에서 재사용
+- 용량은 해상도 class 단위로 올려 잡음 → 비슷한 크기의 요청끼리는 재할당 없음
+- 가장 큰 class 보다 큰 요청은 풀에 보관하지 않음 (유휴 워커가 거대한 버퍼를 계속 쥐고 있지 않도록)
+- get() 으로 받은 배열은 같은 이름으로 다시 get() 하기 전까지만 유효
+"""
+import threading
+from typing import Dict, Tuple
+
+import numpy as np
+
+# 해상도 class (픽셀 수): VGA, HD, FHD, 4K UHD, 12MP (폰 카메라)
+RESOLUTION_CLASSES = [640 * 480, 1280 * 720, 1920 * 1080, 3840 * 2160, 4032 * 3024]
+
+
+class ScratchPool:
+    def __init__(self):
+        self._buffers: Dict[Tuple[str, str], np.ndarray] = {}
+        self.stats = {"allocations": 0, "reuses": 0, "oversize": 0, "bytes": 0}
+
+    @staticmethod
+    def _class_pixels(pixels: int):
+        for c in RESOLUTION_CLASSES:
+            if pixels <= c:
+                return c
+        return None
+
+    def get(self, name: str, shape, dtype=np.float32, zero: bool = False) -> np.ndarray:
+        """shape 크기의 C-contiguous 작업 배열 (zero=True 이면 0 으로 채움)"""
+        dtype = np.dtype(dtype)
+        pixels = int(shape[0]) * int(shape[1])
+        channels = int(np.prod(shape[2:])) if len(shape) > 2 else 1
+        n = pixels * channels
+
+        class_pixels = self._class_pixels(pixels)
+        if class_pixels is None:
+            self.stats["oversize"] += 1
+            return np.zeros(shape, dtype=dtype) if zero else np.empty(shape, dtype=dtype)
+
+        key = (name, dtype.str)
+        buf = self._buffers.get(key)
+        if buf is None or buf.size < n:
+            if buf is not None:
+                self.stats["bytes"] -= buf.nbytes
+            buf = np.empty(class_pixels * channels, dtype=dtype)
+            self._buffers[key] = buf
+            self.stats["allocations"] += 1
+            self.stats["bytes"] += buf.nbytes
+        else:
+            self.stats["reuses"] += 1
+
+        out = buf[:n].reshape(shape)
+        if zero:
+            out.fill(0)
+        return out
+
+    def clear(self):
+        self._buffers.clear()
+        self.stats["bytes"] = 0
+
+
+_local = threading.local()
+
+
+def get_scratch() -> ScratchPool:
+    """현재 스레드(워커)의 작업 버퍼 풀"""
+    pool = getattr(_local, "pool", None)
+    if pool is None:
+        pool = ScratchPool()
+        _local.pool = pool
+    return pool
@@ -0,0 +1,325 @@
+"""
+보정 결과 캐시 (content-addressed)
+
+- 키: 입력 바이트 해시 + 파이프라인 파라미터 + 파이프라인 버전
+- 메모리 tier (LRU, 용량 제한) → 디스크 tier (LRU, 용량 제한) 순으로 조회
+- 두 tier 모두 TTL 적용, hit/miss 카운트 제공
+- LandmarkCache: 입력별 얼굴 랜드마크 (서버 프로세스 메모리 LRU, 파라미터만 바뀐 재보정용)
+"""
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import (
+    RETOUCH_CACHE_ENABLED,
+    RETOUCH_CACHE_MEMORY_MB,
+    RETOUCH_CACHE_DISK_MB,
+    RETOUCH_CACHE_DIR,
+    RETOUCH_CACHE_TTL_SEC,
+    RETOUCH_LANDMARK_CACHE_MB,
+    RETOUCH_LANDMARK_CACHE_ENTRIES,
+)
+from services import diagnostics
+
+logger = diagnostics.get_logger("retouch_cache")
+
+
+def content_digest(image_data) -> bytes:
+    """입력 바이트 해시 (한 요청에서 키를 여러 개 만들 때 한 번만 계산)"""
+    return hashlib.sha256(image_data).digest()
+
+
+def make_key(image_data, params: Dict, version: str, digest: bytes = None) -> str:
+    """입력 바이트(또는 미리 계산한 digest) + 파라미터 + 버전으로 캐시 키 생성"""
+    h = hashlib.sha256()
+    h.update(digest if digest is not None else content_digest(image_data))
+    h.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+    h.update(version.encode("utf-8"))
+    return h.hexdigest()
+
+
+class ResultCache:
+    """
+    - 메모리 tier 와 통계는 self._lock, 디스크 크기 집계는 self._disk_lock 으로 보호
+    - 디스크 읽기/쓰기/정리(파일 I/O, glob)는 어느 lock 도 잡지 않고 실행 → 메모리 hit 가 디스크 I/O 를 기다리지 않음
+    - 여러 서버 프로세스가 같은 RETOUCH_CACHE_DIR 를 쓸 수 있으므로 다른 프로세스가 지운 파일은 조용히 건너뜀
+    """
+
+    def __init__(self, memory_bytes: int, disk_bytes: int, disk_dir: Optional[str], ttl_sec: float):
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir and disk_bytes > 0 else None
+        self.ttl_sec = ttl_sec
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (data, 저장 시각)
+        self._memory_size = 0
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        self._disk_lock = threading.Lock()
+        self._disk_size = None  # 첫 디스크 접근 시 계산
+        self._evicting = False  # 디스크 정리는 한 스레드만
+
+    # ---- 메모리 tier (self._lock 안에서 호출) ----
+
+    def _memory_get(self, key: str) -> Optional[bytes]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        data, stored_at = entry
+        if self.ttl_sec and time.time() - stored_at > self.ttl_sec:
+            self._memory_remove(key)
+            return None
+        self._memory.move_to_end(key)
+        return data
+
+    def _memory_put(self, key: str, data: bytes, stored_at: float):
+        if len(data) > self.memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_remove(key)
+        self._memory[key] = (data, stored_at)
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_bytes and self._memory:
+            old_key, _ = next(iter(self._memory.items()))
+            self._memory_remove(old_key)
+            self.stats["evictions"] += 1
+
+    def _memory_remove(self, key: str):
+        data, _ = self._memory.pop(key)
+        self._memory_size -= len(data)
+
+    # ---- 디스크 tier (lock 밖에서 호출, 크기 집계만 self._disk_lock) ----
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}.bin"
+
+    def _disk_files(self):
+        """[(mtime, size, path), ...] (목록을 읽는 사이 지워진 파일은 제외)"""
+        files = []
+        for path in self.disk_dir.glob("*/*.bin"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+        return files
+
+    def _ensure_disk_size(self):
+        if self._disk_size is not None:
+            return
+        self.disk_dir.mkdir(parents=True, exist_ok=True)
+        size = sum(s for _, s, _ in self._disk_files())
+        with self._disk_lock:
+            if self._disk_size is None:
+                self._disk_size = size
+
+    def _disk_add(self, delta: int) -> bool:
+        """디스크 사용량 갱신 → 정리를 이 스레드가 맡아야 하면 True"""
+        with self._disk_lock:
+            self._disk_size += delta
+            if self._disk_size > self.disk_bytes and not self._evicting:
+                self._evicting = True
+                return True
+        return False
+
+    def _disk_get(self, key: str) -> Optional[bytes]:
+        path = self._disk_path(key)
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        if self.ttl_sec and time.time() - st.st_mtime > self.ttl_sec:
+            self._disk_remove(path)
+            return None
+        try:
+            data = path.read_bytes()
+            os.utime(path, None)  # LRU 순서 갱신 (mtime = 마지막 사용 시각)
+        except OSError:
+            return None
+        return data
+
+    def _disk_put(self, key: str, data: bytes):
+        if len(data) > self.disk_bytes:
+            return
+        try:
+            self._ensure_disk_size()
+            path = self._disk_path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".tmp-{os.getpid()}-{threading.get_ident()}")
+            tmp.write_bytes(data)
+            try:
+                old_size = path.stat().st_size
+            except OSError:
+                old_size = 0
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"[retouch_cache] disk write failed: {e}")
+            return
+        if self._disk_add(len(data) - old_size):
+            self._disk_evict()
+
+    def _disk_remove(self, path: Path) -> bool:
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except OSError:
+            return False
+        with self._disk_lock:
+            if self._disk_size is not None:
+                self._disk_size -= size
+        return True
+
+    def _disk_evict(self):
+        """오래 안 쓴 파일부터 용량의 90% 까지 정리 (_disk_add 가 True 를 반환한 스레드만 호출)"""
+        evicted = 0
+        try:
+            for _, _, path in sorted(self._disk_files(), key=lambda f: f[0]):
+                with self._disk_lock:
+                    if self._disk_size <= self.disk_bytes * 0.9:
+                        break
+                if self._disk_remove(path):
+                    evicted += 1
+        finally:
+            with self._disk_lock:
+                self._evicting = False
+            with self._lock:
+                self.stats["evictions"] += evicted
+
+    # ---- 공개 API ----
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._memory_get(key)
+            if data is not None:
+                self.stats["memory_hits"] += 1
+                return data
+
+        data = self._disk_get(key) if self.disk_dir is not None else None
+        with self._lock:
+            if data is not None:
+                self.stats["disk_hits"] += 1
+                self._memory_put(key, data, time.time())
+                return data
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key: str, data: bytes):
+        with self._lock:
+            self._memory_put(key, data, time.time())
+        if self.disk_dir is not None:
+            self._disk_put(key, data)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_size = 0
+        if self.disk_dir is not None and self.disk_dir.exists():
+            for _, _, path in self._disk_files():
+                self._disk_remove(path)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["misses"]
+            hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+            return {
+                **self.stats,
+                "hit_rate": (hits / lookups) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_size,
+                "memory_budget_bytes": self.memory_bytes,
+                "disk_bytes": self._disk_size or 0,
+                "disk_budget_bytes": self.disk_bytes if self.disk_dir is not None else 0,
+                "ttl_sec": self.ttl_sec,
+            }
+
+
+class LandmarkCache:
+    """
+    key -> 얼굴별 랜드마크 list (작업 해상도 좌표) 메모리 LRU (용량/개수 제한)
+    - 서버 프로세스에서만 조회/저장하고 보정 작업에 인자로 넘김 → 어느 워커가 작업을 받아도 재사용
+    - 디코딩 이미지는 보관하지 않음 (얼굴당 수 KB, 보정 메모리 예산에 영향 없음)
+    """
+
+    def __init__(self, memory_bytes: int, max_entries: int):
+        self.memory_bytes = memory_bytes
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (faces, nbytes)
+        self._size = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key: str) -> Optional[list]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[0]
+
+    def put(self, key: str, faces):
+        """faces: 얼굴별 (N, 2) float32 배열 list (얼굴이 없으면 빈 list 도 저장 → 재검출 생략)"""
+        faces = [np.array(lm, dtype=np.float32) for lm in faces]
+        for lm in faces:
+            lm.flags.writeable = False
+        nbytes = sum(lm.nbytes for lm in faces) + 64
+        if nbytes > self.memory_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._size -= self._entries.pop(key)[1]
+            self._entries[key] = (faces, nbytes)
+            self._size += nbytes
+            while self._entries and (self._size > self.memory_bytes or len(self._entries) > self.max_entries):
+                _, (_, size) = self._entries.popitem(last=False)
+                self._size -= size
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": (self.stats["hits"] / lookups) if lookups else 0.0,
+                "entries": len(self._entries),
+                "memory_bytes": self._size,
+                "memory_budget_bytes": self.memory_bytes,
+            }
+
+
+# 전역 캐시 (비활성화 시 None)
+result_cache: Optional[ResultCache] = (
+    ResultCache(
+        memory_bytes=int(RETOUCH_CACHE_MEMORY_MB * 1024 * 1024),
+        disk_bytes=int(RETOUCH_CACHE_DISK_MB * 1024 * 1024),
+        disk_dir=RETOUCH_CACHE_DIR,
+        ttl_sec=RETOUCH_CACHE_TTL_SEC,
+    )
+    if RETOUCH_CACHE_ENABLED
+    else None
+)
+
+landmark_cache: Optional[LandmarkCache] = (
+    LandmarkCache(
+        memory_bytes=int(RETOUCH_LANDMARK_CACHE_MB * 1024 * 1024),
+        max_entries=RETOUCH_LANDMARK_CACHE_ENTRIES,
+    )
+    if RETOUCH_LANDMARK_CACHE_MB > 0
+    else None
+)
@@ -0,0 +1,128 @@
+"""
+점진적(progressive) 보정 작업 저장소
+
+- 1단계: 축소 해상도 프리뷰를 먼저 렌더링해서 바로 응답
+- 2단계: 프리뷰에서 검출한 랜드마크로 원본 해상도 렌더링을 백그라운드에서 실행
+- 작업 결과는 job_id 로 조회 (폴링 또는 SSE), 완료된 원본 결과는 결과 캐시에도 저장
+  (보정 단계가 실패해서 원본으로 대체된 결과는 저장하지 않음)
+- 오래된 작업은 RETOUCH_JOB_TTL_SEC 이후, 또는 RETOUCH_JOB_MAX 개를 넘으면 정리
+"""
+import asyncio
+import os
+import sys
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import RETOUCH_JOB_TTL_SEC, RETOUCH_JOB_MAX
+from services import diagnostics, retouch_limits, retouch_pool
+
+logger = diagnostics.get_logger("retouch_jobs")
+
+
+@dataclass
+class RetouchJob:
+    job_id: str
+    filename: str
+    fmt: str
+    status: str = "pending"  # pending / done / failed
+    data: Optional[bytes] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    done_event: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def finish(self, data: Optional[bytes] = None, error: Optional[str] = None):
+        if error is None:
+            self.status, self.data = "done", data
+        else:
+            self.status, self.error = "failed", error
+        self.done_event.set()
+
+
+# job_id -> RetouchJob (이벤트 루프 스레드에서만 변경)
+_jobs: "OrderedDict[str, RetouchJob]" = OrderedDict()
+_tasks = set()  # 백그라운드 태스크가 GC 되지 않도록 참조 유지
+
+
+def _cleanup():
+    now = time.time()
+    for job_id in [j for j, job in _jobs.items() if now - job.created_at > RETOUCH_JOB_TTL_SEC]:
+        del _jobs[job_id]
+    # 개수 제한: 완료된 작업부터 오래된 순으로 제거
+    while len(_jobs) > RETOUCH_JOB_MAX:
+        victim = next((j for j, job in _jobs.items() if job.status != "pending"), None)
+        if victim is None:
+            break
+        del _jobs[victim]
+
+
+def get_job(job_id: str) -> Optional[RetouchJob]:
+    _cleanup()
+    return _jobs.get(job_id)
+
+
+async def _render_full(job: RetouchJob, image_data: bytes, faces, quality: int, compression: Optional[int],
+                       lookup: retouch_pool.CacheLookup, memory: int):
+    """원본 해상도 렌더링 (슬롯 1개 + memory bytes 는 호출자가 이미 확보)"""
+    try:
+        data, ok, _ = await retouch_pool.run_call(
+            "retouch_image_result", image_data, job.filename, job.fmt, quality, compression, None, faces
+        )
+    except Exception as e:
+        logger.warning(f"[retouch_jobs] job {job.job_id} failed: {e}")
+        job.finish(error=str(e) or e.__class__.__name__)
+        return
+    finally:
+        retouch_pool.release(1, memory)
+
+    await retouch_pool.cache_store(lookup, data, ok)
+    job.finish(data=data)
+
+
+async def start_progressive(
+    image_data: bytes,
+    filename: str,
+    fmt: str = "png",
+    quality: int = 90,
+    compression: Optional[int] = None,
+) -> Dict:
+    """
+    프리뷰를 렌더링해서 반환하고 원본 해상도 작업을 예약
+    - 반환: {"job": RetouchJob, "preview": 프리뷰 jpeg 바이트}
+    - 원본 결과가 이미 캐시에 있으면 작업은 즉시 완료 상태
+    - 프리뷰 + 원본 두 작업의 슬롯을 한 번에 확보 (부족하면 RetouchBusyError)
+    """
+    [lookup] = await retouch_pool.cache_lookup([image_data], fmt, quality, compression)
+    cached = lookup.data
+
+    _cleanup()
+    job = RetouchJob(job_id=uuid.uuid4().hex, filename=filename, fmt=fmt)
+    _jobs[job.job_id] = job
+
+    if cached is not None:
+        job.finish(data=cached)
+
+    # 프리뷰도 디코딩은 작업 해상도로 하므로 메모리는 원본 렌더링과 같은 추정치를 사용
+    memory = retouch_limits.estimate_memory(image_data)
+    slots = 1 if cached is not None else 2
+    reserved = memory if cached is not None else memory * 2
+    retouch_pool.acquire(slots, reserved)
+    try:
+        preview, faces = await retouch_pool.run_call("retouch_preview", image_data, filename)
+    except BaseException:
+        retouch_pool.release(slots, reserved)
+        del _jobs[job.job_id]
+        raise
+    retouch_pool.release(1, memory)
+
+    if cached is None:
+        # 프리뷰에서 검출한 랜드마크 → 같은 사진을 파라미터만 바꿔 보정할 때 재사용
+        await retouch_pool.cache_store(lookup, None, False, faces)
+        # 남은 슬롯 1개와 메모리는 _render_full 이 끝날 때 반환
+        task = asyncio.create_task(_render_full(job, image_data, faces, quality, compression, lookup, memory))
+        _tasks.add(task)
+        task.add_done_callback(_tasks.discard)
+    return {"job": job, "preview": preview}
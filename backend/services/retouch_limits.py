@@ -0,0 +1,147 @@
+"""
+보정 업로드 제한 / 메모리 예산
+
+- 파일 크기, 픽셀 수를 이미지 헤더만 읽어서 디코딩 전에 확인 (decompression bomb 방지)
+- 작업 해상도(RETOUCH_MAX_WORK_EDGE 로 축소된 크기)로 요청당 메모리 사용량을 추정 → retouch_pool 의 admission control 에 사용
+- cv2/numpy 없이 동작 (라우터에서 바로 호출)
+"""
+import os
+import struct
+import sys
+from typing import NamedTuple, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import RETOUCH_MAX_UPLOAD_MB, RETOUCH_MAX_PIXELS, RETOUCH_MAX_WORK_EDGE
+
+MAX_UPLOAD_BYTES = int(RETOUCH_MAX_UPLOAD_MB * 1024 * 1024)
+
+# 업로드 허용 포맷 (cv2.imdecode 로 디코딩 가능한 것만, GIF 는 헤더는 읽지만 OpenCV 가 디코딩하지 못해서 거절)
+UPLOAD_FORMATS = ("png", "jpeg", "webp", "bmp")
+
+# 작업 해상도 픽셀당 최대 메모리 (대략적인 상한)
+# - uint8 BGR 전체 프레임: 디코딩 + 작업 복사본 + 결과/인코딩 버퍼 ≈ 12 B
+# - 얼굴 ROI float32 임시 버퍼 (remap map, 피부 마스크/블렌딩, 화장 누적) ≈ 24 B (ROI = 프레임인 최악의 경우)
+BYTES_PER_WORK_PIXEL = 36
+
+
+class ImageInfo(NamedTuple):
+    format: str
+    width: int
+    height: int
+
+    @property
+    def pixels(self) -> int:
+        return self.width * self.height
+
+
+class UploadRejected(Exception):
+    """업로드 제한 위반 (status_code 로 HTTP 응답)"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+# JPEG SOF 마커 (baseline/progressive/lossless, DHT/DAC/JPG 제외)
+_JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _probe_jpeg(data) -> Optional[ImageInfo]:
+    pos, n = 2, len(data)
+    while pos + 4 <= n:
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:  # fill byte
+            pos += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD9:  # 길이 없는 마커
+            pos += 2
+            continue
+        length = struct.unpack(">H", bytes(data[pos + 2:pos + 4]))[0]
+        if marker in _JPEG_SOF:
+            if pos + 9 > n:
+                return None
+            height, width = struct.unpack(">HH", bytes(data[pos + 5:pos + 9]))
+            return ImageInfo("jpeg", width, height)
+        pos += 2 + length
+    return None
+
+
+def _probe_webp(data) -> Optional[ImageInfo]:
+    chunk = bytes(data[12:16])
+    if chunk == b"VP8 " and len(data) >= 30:
+        width, height = struct.unpack("<HH", bytes(data[26:30]))
+        return ImageInfo("webp", width & 0x3FFF, height & 0x3FFF)
+    if chunk == b"VP8L" and len(data) >= 25:
+        bits = struct.unpack("<I", bytes(data[21:25]))[0]
+        return ImageInfo("webp", (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1)
+    if chunk == b"VP8X" and len(data) >= 30:
+        width = 1 + int.from_bytes(bytes(data[24:27]), "little")
+        height = 1 + int.from_bytes(bytes(data[27:30]), "little")
+        return ImageInfo("webp", width, height)
+    return None
+
+
+def probe_image(data) -> Optional[ImageInfo]:
+    """헤더만 읽어서 (포맷, 가로, 세로) 반환 (지원하지 않거나 깨진 헤더면 None)"""
+    head = bytes(data[:32])
+    try:
+        if head.startswith(b"\x89PNG\r\n\x1a\n") and len(head) >= 24:
+            width, height = struct.unpack(">II", head[16:24])
+            return ImageInfo("png", width, height)
+        if head.startswith(b"\xff\xd8"):
+            return _probe_jpeg(data)
+        if head.startswith(b"RIFF") and head[8:12] == b"WEBP":
+            return _probe_webp(data)
+        if head[:6] in (b"GIF87a", b"GIF89a"):
+            width, height = struct.unpack("<HH", head[6:10])
+            return ImageInfo("gif", width, height)
+        if head.startswith(b"BM") and len(head) >= 26:
+            width, height = struct.unpack("<ii", head[18:26])
+            return ImageInfo("bmp", abs(width), abs(height))
+    except struct.error:
+        return None
+    return None
+
+
+def work_size(info: ImageInfo, max_edge: int = RETOUCH_MAX_WORK_EDGE):
+    """자동 축소 후 작업 해상도 (가로, 세로)"""
+    long_edge = max(info.width, info.height)
+    if not max_edge or long_edge <= max_edge:
+        return info.width, info.height
+    scale = max_edge / float(long_edge)
+    return max(1, int(round(info.width * scale))), max(1, int(round(info.height * scale)))
+
+
+def check_upload(data) -> ImageInfo:
+    """
+    업로드 바이트 검증 (디코딩 전)
+    - 크기 초과 / 픽셀 수 초과: 413, 헤더를 읽을 수 없거나 UPLOAD_FORMATS 가 아닌 포맷: 415
+    - 작업 해상도로 자동 축소하더라도 RETOUCH_MAX_PIXELS 는 원본 기준 (디코더가 원본 크기로 버퍼를 잡으므로)
+    """
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise UploadRejected(413, f"Image is too large (max {RETOUCH_MAX_UPLOAD_MB:g} MB)")
+    if len(data) == 0:
+        raise UploadRejected(400, "Empty upload")
+    info = probe_image(data)
+    if info is None:
+        raise UploadRejected(415, "Unsupported or corrupted image (use png, jpeg, webp or bmp)")
+    if info.format not in UPLOAD_FORMATS:
+        raise UploadRejected(415, f"Unsupported image format: {info.format} (use png, jpeg, webp or bmp)")
+    if info.width <= 0 or info.height <= 0 or info.pixels > RETOUCH_MAX_PIXELS:
+        raise UploadRejected(
+            413, f"Image dimensions {info.width}x{info.height} exceed the limit ({RETOUCH_MAX_PIXELS} pixels)"
+        )
+    return info
+
+
+def estimate_memory(data) -> int:
+    """보정 작업 1건의 예상 최대 메모리 (bytes, 헤더를 읽을 수 없으면 업로드 크기 한도 기준)"""
+    info = probe_image(data)
+    if info is None:
+        return len(data) + MAX_UPLOAD_BYTES
+    width, height = work_size(info)
+    # 디코딩 시점에는 (축소 전) 원본 크기의 버퍼가 잠시 필요
+    return len(data) + info.pixels * 3 + width * height * BYTES_PER_WORK_PIXEL
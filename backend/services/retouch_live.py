@@ -0,0 +1,100 @@
+"""
+실시간 보정 프리뷰 (카메라 프레임 스트리밍)
+
+- 세션마다 tracking 모드(static_image_mode=False) FaceMesh 를 하나씩 유지 → 매 프레임 콜드 검출 없음
+- 축소 해상도에서 가벼운 단계만 적용 (눈 확대 + 화장 레이어) 후 jpeg 로 인코딩
+- 한 세션의 프레임은 한 번에 하나씩만 처리 (FaceMesh 추적 상태는 스레드 안전하지 않음)
+- 동시 세션 수는 RETOUCH_LIVE_MAX_SESSIONS 로 제한
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import RETOUCH_LIVE_MAX_SESSIONS, RETOUCH_LIVE_MAX_EDGE, RETOUCH_LIVE_QUALITY, RETOUCH_LIVE_WORKERS
+from services import diagnostics
+
+logger = diagnostics.get_logger("retouch_live")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_active_sessions = 0  # 이벤트 루프 스레드에서만 변경
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=max(1, min(RETOUCH_LIVE_MAX_SESSIONS, RETOUCH_LIVE_WORKERS)), thread_name_prefix="retouch-live"
+                )
+    return _executor
+
+
+class LiveSession:
+    def __init__(self, max_edge: int = RETOUCH_LIVE_MAX_EDGE, quality: int = RETOUCH_LIVE_QUALITY):
+        from services import get_retouch_service
+        self._retouch_service = get_retouch_service()
+        self.face_mesh = self._retouch_service.create_face_mesh(static_image_mode=False, max_num_faces=1)
+        self.max_edge = max_edge
+        self.quality = quality
+        self.frames = 0
+        self.dropped = 0
+        self.started_at = time.time()
+
+    def process(self, frame_data: bytes) -> Optional[bytes]:
+        """프레임 1장 보정 → jpeg 바이트 (디코딩 실패 시 None)"""
+        rs = self._retouch_service
+        try:
+            frame = rs.decode_image(frame_data)
+        except ValueError as e:
+            logger.debug(f"[retouch_live] bad frame: {e}")
+            return None
+        small, _ = rs.make_detection_proxy(frame, self.max_edge)
+        out = rs.render_live_frame(small, self.face_mesh)
+        self.frames += 1
+        return rs.encode_image(out, "jpeg", quality=self.quality)
+
+    def close(self):
+        try:
+            self.face_mesh.close()
+        except Exception:
+            pass
+        elapsed = max(1e-6, time.time() - self.started_at)
+        logger.info(f"[retouch_live] session closed: {self.frames} frames "
+                    f"({self.frames / elapsed:.1f} fps), {self.dropped} dropped")
+
+
+async def open_session(max_edge: int = RETOUCH_LIVE_MAX_EDGE, quality: int = RETOUCH_LIVE_QUALITY) -> Optional[LiveSession]:
+    """세션 시작 (동시 세션 한도를 넘으면 None). FaceMesh 그래프 초기화는 스레드에서 처리"""
+    global _active_sessions
+    if _active_sessions >= RETOUCH_LIVE_MAX_SESSIONS:
+        return None
+    _active_sessions += 1
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_get_executor(), LiveSession, max_edge, quality)
+    except BaseException:
+        _active_sessions -= 1
+        raise
+
+
+async def close_session(session: LiveSession):
+    global _active_sessions
+    _active_sessions = max(0, _active_sessions - 1)
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(_get_executor(), session.close)
+
+
+async def process_frame(session: LiveSession, frame_data: bytes) -> Optional[bytes]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), session.process, frame_data)
+
+
+def active_sessions() -> int:
+    return _active_sessions
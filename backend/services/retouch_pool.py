@@ -0,0 +1,481 @@
+"""
+보정 작업 실행기 (이벤트 루프 밖에서 CPU 작업 처리)
+
+- RETOUCH_EXECUTOR="process": 프로세스 풀, 입출력 이미지는 shared memory 로 전달 (pipe 직렬화 복사 없음)
+- RETOUCH_EXECUTOR="thread": 스레드 풀 (cv2/numpy 는 GIL 을 놓으므로 가벼운 배포용)
+- 실행 중 + 대기 작업 수가 RETOUCH_WORKERS + RETOUCH_QUEUE_SIZE 를 넘거나
+  작업들의 예상 메모리 합계가 RETOUCH_MEMORY_BUDGET_MB 를 넘으면 RetouchBusyError (→ 503 + Retry-After)
+- 프로세스 워커는 forkserver(윈도우: spawn)로 시작 → 부모의 스레드/lock/로깅 큐/메트릭을 복사하지 않음
+- 각 워커는 시작 시 스레드 예산(CV_NUM_THREADS/BLAS_NUM_THREADS)을 적용하고 retouch_service 를 import 해서 FaceMesh 를 미리 만들어 둠
+- 워커 예외는 값으로 돌려받아 부모에서 다시 발생 (입력 오류: ValueError, 그 외: RetouchJobError)
+  → pickle 되지 않는 예외가 프로세스 풀 전체를 깨뜨리지 않음
+- 결과 캐시와 랜드마크 캐시는 부모 프로세스에서만 조회/저장 (워커마다 메모리 캐시가 갈라지지 않도록)
+  랜드마크 캐시 hit 이면 랜드마크를 작업 인자로 넘겨서 어느 워커가 받아도 FaceMesh 생략
+  키 계산(입력 전체 해시)과 조회/저장(디스크 tier)은 이벤트 루프가 아니라 기본 스레드 풀에서 실행
+"""
+import asyncio
+import base64
+import math
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import RETOUCH_EXECUTOR, RETOUCH_WORKERS, RETOUCH_QUEUE_SIZE, RETOUCH_MEMORY_BUDGET_MB, CV_NUM_THREADS
+from services import diagnostics, metrics, retouch_limits
+
+logger = diagnostics.get_logger("retouch_pool")
+
+_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+
+# 동시 작업 수 제한 (이벤트 루프 스레드에서만 변경)
+MAX_INFLIGHT = RETOUCH_WORKERS + RETOUCH_QUEUE_SIZE
+MEMORY_BUDGET_BYTES = int(RETOUCH_MEMORY_BUDGET_MB * 1024 * 1024)
+_inflight = 0
+_inflight_bytes = 0  # 실행 중 + 대기 작업의 예상 메모리 합계
+_avg_job_sec = 2.0  # 작업 시간 지수 이동 평균 (Retry-After 추정용)
+
+
+class RetouchBusyError(Exception):
+    """작업 큐가 가득 참"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Retouch queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class RetouchJobError(Exception):
+    """워커에서 난 예상하지 못한 오류 (원래 예외는 '타입: 메시지' 문자열로만 전달)"""
+
+
+# =========================
+# shared memory 전달
+# =========================
+
+# 윈도우는 마지막 핸들이 닫히면 shared memory 가 사라지므로
+# 워커가 만든 결과 버퍼를 부모가 열기 전에 잃을 수 있음 → 결과는 POSIX 에서만 shared memory 로 전달
+_SHARED_OUTPUT = os.name != "nt"
+
+
+def _create_shared(data: bytes) -> shared_memory.SharedMemory:
+    shm = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+    shm.buf[:len(data)] = data
+    return shm
+
+
+def _from_shared(name: str, size: int, unlink: bool = True) -> bytes:
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        return bytes(shm.buf[:size])
+    finally:
+        shm.close()
+        if unlink:
+            shm.unlink()
+
+
+# =========================
+# 워커
+# =========================
+
+def _worker_init():
+    """워커 초기화: 로깅 + 스레드 예산 적용 + 보정 모듈 로드 + FaceMesh 미리 생성"""
+    import concurrency
+    if RETOUCH_EXECUTOR != "thread":
+        diagnostics.setup_worker_logging()
+    concurrency.apply_thread_limits()
+    from services import retouch_service
+    retouch_service.get_face_mesh()
+
+
+def _worker_call(func_name: str, image_data, args: tuple, debug: bool = False):
+    """
+    retouch_service.<func_name>(image_data, *args) 실행
+    - 반환: ("ok", 결과) / ("invalid", 메시지) (입력 오류, ValueError) / ("error", 메시지) (그 외)
+      예외 객체를 그대로 돌려보내면 pickle 되지 않는 예외가 부모에서 풀 전체를 깨뜨리므로 문자열만 전달
+    """
+    from services import retouch_service
+    # 요청의 진단 플래그는 워커로 자동 전달되지 않으므로 인자로 받아서 설정
+    token = diagnostics.set_debug(debug)
+    try:
+        return "ok", getattr(retouch_service, func_name)(image_data, *args)
+    except ValueError as e:
+        return "invalid", str(e) or "invalid image"
+    except Exception as e:
+        logger.exception(f"[retouch_pool] {func_name} failed")
+        return "error", f"{e.__class__.__name__}: {e}"
+    finally:
+        diagnostics.reset_debug(token)
+
+
+def _job_result(status: str, value):
+    """_worker_call 결과 → 값 또는 예외 (부모에서 호출)"""
+    if status == "invalid":
+        raise ValueError(value)
+    if status == "error":
+        raise RetouchJobError(value)
+    return value
+
+
+def _worker_call_shared(func_name: str, in_name: str, in_size: int, args: tuple, debug: bool = False):
+    """
+    입력은 부모가 만든 shared memory 에서 읽고, bytes 결과는 새 shared memory 에 써서 반환
+    - 결과가 (bytes, ...) tuple 이면 첫 요소만 shared memory, 나머지는 그대로 전달
+    - 반환: ("shm", 이름, 크기, 나머지 요소 tuple 또는 None, 메트릭) 또는 (_worker_call 상태, 결과, 메트릭)
+      (메트릭: 워커에서 기록한 단계별 시간, 부모 레지스트리에 합침 → 실패한 작업도 항상 함께 반환)
+    """
+    try:
+        # 입력 버퍼를 복사하지 않고 shared memory 뷰에서 바로 디코딩
+        shm_in = shared_memory.SharedMemory(name=in_name)
+        view = shm_in.buf[:in_size]
+        try:
+            status, result = _worker_call(func_name, view, args, debug)
+        finally:
+            try:
+                view.release()
+                shm_in.close()
+            except BufferError:
+                # 예외 traceback 이 아직 버퍼 뷰를 잡고 있는 경우: 프로세스 종료 시 정리됨
+                pass
+        if status != "ok":
+            return status, result, metrics.take_delta()
+        data, rest = (result[0], tuple(result[1:])) if isinstance(result, tuple) and result else (result, None)
+        if not _SHARED_OUTPUT or not isinstance(data, bytes):
+            return "ok", result, metrics.take_delta()
+        shm = _create_shared(data)
+        shm.close()
+        return "shm", shm.name, len(data), rest, metrics.take_delta()
+    except Exception as e:
+        # shared memory 열기/만들기 실패 (/dev/shm 용량 부족 등)
+        logger.exception("[retouch_pool] shared memory transfer failed")
+        return "error", f"{e.__class__.__name__}: {e}", metrics.take_delta()
+
+
+def _unpack_shared(packed):
+    if packed[0] != "shm":
+        return _job_result(packed[0], packed[1])
+    data = _from_shared(packed[1], packed[2])
+    return data if packed[3] is None else (data, *packed[3])
+
+
+def _mp_context():
+    """
+    워커 시작 방식: forkserver (없으면 spawn, 윈도우는 spawn 만 지원)
+    - fork 는 부모의 스레드(로그 QueueListener, 기본 스레드 풀 등)와 잠긴 lock, 메트릭 값까지 복사하므로 사용하지 않음
+      → 워커는 모듈을 새로 import 해서 로깅/메트릭/cv2 상태를 처음부터 만듦
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                if RETOUCH_EXECUTOR == "thread":
+                    _executor = ThreadPoolExecutor(
+                        max_workers=RETOUCH_WORKERS, thread_name_prefix="retouch", initializer=_worker_init
+                    )
+                else:
+                    _executor = ProcessPoolExecutor(
+                        max_workers=RETOUCH_WORKERS, mp_context=_mp_context(), initializer=_worker_init
+                    )
+                logger.info(f"[retouch_pool] {RETOUCH_EXECUTOR} executor started "
+                            f"({RETOUCH_WORKERS} workers x {CV_NUM_THREADS} cv threads, queue {RETOUCH_QUEUE_SIZE})")
+    return _executor
+
+
+def _reset_executor(broken: Executor):
+    """
+    워커 프로세스가 죽어서(segfault, OOM kill 등) 깨진 풀을 정리 → 다음 요청에서 새로 생성
+    - 같은 풀에서 실패한 작업들이 각자 호출해도, 이미 새 풀로 바뀌었으면 그대로 둠
+      (작업 오류는 _worker_call 이 값으로 돌려주므로 풀이 깨지는 건 워커가 죽은 경우뿐)
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            logger.warning("[retouch_pool] process pool is broken (worker died), restarting on next job")
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def shutdown_pool():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True, cancel_futures=True)
+            _executor = None
+
+
+# =========================
+# 동시성 제한
+# =========================
+
+def _retry_after(n: int) -> int:
+    waves = math.ceil((_inflight + n) / max(1, RETOUCH_WORKERS))
+    return max(1, int(math.ceil(waves * _avg_job_sec)))
+
+
+def acquire(n: int = 1, memory: int = 0):
+    """작업 n 개 + 예상 메모리 memory bytes 만큼 슬롯 확보 (부족하면 RetouchBusyError)"""
+    global _inflight, _inflight_bytes
+    # 큐가 비어 있으면 한도보다 큰 배치도 받아들임 (그렇지 않으면 영원히 거절됨)
+    if _inflight > 0 and (
+        _inflight + n > MAX_INFLIGHT
+        or (MEMORY_BUDGET_BYTES and _inflight_bytes + memory > MEMORY_BUDGET_BYTES)
+    ):
+        raise RetouchBusyError(_retry_after(n))
+    _inflight += n
+    _inflight_bytes += memory
+
+
+def release(n: int = 1, memory: int = 0):
+    global _inflight, _inflight_bytes
+    _inflight = max(0, _inflight - n)
+    _inflight_bytes = max(0, _inflight_bytes - memory)
+
+
+def _collect_metrics():
+    """/metrics scrape 시점의 보정 큐 상태"""
+    return [
+        ("retouch_queue_inflight", "gauge", "Retouch jobs running or queued", _inflight),
+        ("retouch_queue_max_inflight", "gauge", "Retouch queue capacity (workers + queue)", MAX_INFLIGHT),
+        ("retouch_workers", "gauge", "Retouch worker count", RETOUCH_WORKERS),
+        ("retouch_inflight_memory_bytes", "gauge", "Estimated memory of retouch jobs in flight", _inflight_bytes),
+        ("retouch_memory_budget_bytes", "gauge", "Retouch memory admission budget", MEMORY_BUDGET_BYTES),
+        ("retouch_job_seconds_avg", "gauge", "Moving average retouch job duration", _avg_job_sec),
+    ]
+
+
+def register_metrics():
+    """/metrics 에 보정 큐 상태 gauge 등록 (main.py 에서 호출, 여러 번 호출해도 1번만 등록)"""
+    metrics.register_collector(_collect_metrics)
+
+
+def queue_depth() -> Dict:
+    return {
+        "inflight": _inflight,
+        "max_inflight": MAX_INFLIGHT,
+        "workers": RETOUCH_WORKERS,
+        "inflight_memory_bytes": _inflight_bytes,
+        "memory_budget_bytes": MEMORY_BUDGET_BYTES,
+    }
+
+
+async def run_call(func_name: str, image_data: bytes, *args):
+    """
+    이미 슬롯을 확보한 작업 1개 실행: retouch_service.<func_name>(image_data, *args)
+    - process 모드에서는 입력/결과 이미지를 shared memory 로 전달
+    - 입력 오류는 ValueError, 그 외 워커 오류는 RetouchJobError
+    """
+    global _avg_job_sec
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    debug = diagnostics.enabled()
+
+    if RETOUCH_EXECUTOR == "thread":
+        status, value = await loop.run_in_executor(get_executor(), _worker_call, func_name, image_data, args, debug)
+        result = _job_result(status, value)
+    else:
+        # 부모가 입력 버퍼 핸들을 작업이 끝날 때까지 유지
+        shm_in = _create_shared(image_data)
+        call_args = (func_name, shm_in.name, len(image_data), args, debug)
+        executor = get_executor()
+        try:
+            try:
+                future = loop.run_in_executor(executor, _worker_call_shared, *call_args)
+            except BrokenProcessPool:
+                _reset_executor(executor)
+                executor = get_executor()
+                future = loop.run_in_executor(executor, _worker_call_shared, *call_args)
+            try:
+                packed = await future
+            except BrokenProcessPool:
+                _reset_executor(executor)
+                raise
+        finally:
+            shm_in.close()
+            shm_in.unlink()
+        metrics.merge_delta(packed[-1])
+        result = _unpack_shared(packed)
+
+    _avg_job_sec = _avg_job_sec * 0.8 + (time.perf_counter() - start) * 0.2
+    return result
+
+
+async def _run_job(image_data: bytes, filename: str, fmt: str, quality: int, compression: Optional[int],
+                   params=None, faces=None) -> Tuple[bytes, bool, list]:
+    """
+    보정 1장 → (바이트, 결과 캐시 저장 가능 여부, 사용한 랜드마크) (슬롯은 호출자가 확보)
+    - faces: landmark_cache 에서 찾은 랜드마크 (있으면 워커에서 FaceMesh 생략)
+    """
+    return await run_call("retouch_image_result", image_data, filename, fmt, quality, compression, params, faces)
+
+
+# =========================
+# 결과 / 랜드마크 캐시 (서버 프로세스, 기본 스레드 풀에서 실행)
+# =========================
+
+class CacheLookup(NamedTuple):
+    key: Optional[str]            # 결과 캐시 키 (비활성화 시 None)
+    data: Optional[bytes]         # 캐시된 보정 결과
+    landmark_key: Optional[str]   # 랜드마크 캐시 키 (결과 캐시 hit 이거나 비활성화 시 None)
+    faces: Optional[list]         # 캐시된 랜드마크 (None 이면 워커에서 FaceMesh)
+
+
+def _cache_lookup(items: List[bytes], fmt: str, quality: int, compression: Optional[int],
+                  params=None) -> List[CacheLookup]:
+    from services import get_retouch_service, retouch_cache
+    result_cache, landmark_cache = retouch_cache.result_cache, retouch_cache.landmark_cache
+    if result_cache is None and landmark_cache is None:
+        return [CacheLookup(None, None, None, None)] * len(items)
+    retouch_service = get_retouch_service()
+    found = []
+    for image_data in items:
+        digest = retouch_cache.content_digest(image_data)  # 입력 해시는 1번만
+        key = data = landmark_key = faces = None
+        if result_cache is not None:
+            key = retouch_service.result_cache_key(image_data, fmt, quality, compression, params, digest=digest)
+            data = result_cache.get(key)
+        if data is None and landmark_cache is not None:
+            landmark_key = retouch_service.landmark_cache_key(image_data, digest=digest)
+            faces = landmark_cache.get(landmark_key)
+        found.append(CacheLookup(key, data, landmark_key, faces))
+    return found
+
+
+async def cache_lookup(items: List[bytes], fmt: str, quality: int, compression: Optional[int],
+                       params=None) -> List[CacheLookup]:
+    """입력별 CacheLookup (키 계산 = 입력 전체 해시, 결과 캐시 디스크 tier 읽기 → 이벤트 루프 밖)"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, _cache_lookup, items, fmt, quality, compression, params)
+
+
+def _cache_store(lookup: CacheLookup, data: Optional[bytes], ok: bool, faces):
+    from services import retouch_cache
+    if ok and data is not None and lookup.key is not None and retouch_cache.result_cache is not None:
+        retouch_cache.result_cache.put(lookup.key, data)
+    if (faces is not None and lookup.faces is None and lookup.landmark_key is not None
+            and retouch_cache.landmark_cache is not None):
+        retouch_cache.landmark_cache.put(lookup.landmark_key, faces)
+
+
+async def cache_store(lookup: CacheLookup, data: Optional[bytes], ok: bool = True, faces=None):
+    """
+    보정 결과(ok 일 때만)와 워커에서 검출한 랜드마크 저장
+    - 보정 단계가 실패해서 원본이 섞인 결과(ok=False)는 결과 캐시에 넣지 않음
+    """
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, _cache_store, lookup, data, ok, faces)
+
+
+# =========================
+# 공개 API
+# =========================
+
+async def run_retouch(
+    image_data: bytes,
+    filename: str,
+    fmt: str = "png",
+    quality: int = 90,
+    compression: Optional[int] = None,
+    params=None,
+) -> bytes:
+    """
+    보정 1장 (캐시 hit 이면 큐를 거치지 않음). 큐가 가득 차면 RetouchBusyError
+    - params: retouch_service.RetouchParams (생략 시 기본 파라미터)
+    """
+    [lookup] = await cache_lookup([image_data], fmt, quality, compression, params)
+    if lookup.data is not None:
+        return lookup.data
+
+    memory = retouch_limits.estimate_memory(image_data)
+    acquire(1, memory)
+    try:
+        data, ok, faces = await _run_job(image_data, filename, fmt, quality, compression, params, lookup.faces)
+    finally:
+        release(1, memory)
+
+    await cache_store(lookup, data, ok, faces)
+    return data
+
+
+def _fallback_data_url(image_data: bytes, content_type: Optional[str]) -> str:
+    """보정 실패 시 원본 업로드 그대로 data URL 로 반환"""
+    media_type = content_type if content_type and content_type.startswith("image/") else "application/octet-stream"
+    return f"data:{media_type};base64,{base64.b64encode(image_data).decode('utf-8')}"
+
+
+async def retouch_batch(
+    items: List[Tuple[bytes, str, Optional[str]]],
+    fmt: str = "png",
+    quality: int = 90,
+    compression: Optional[int] = None,
+    params=None,
+) -> List[Dict]:
+    """
+    items: [(image_data, filename, content_type), ...]
+    - 캐시에 없는 이미지만 풀에 분배, 입력 순서대로 결과 반환
+    - 배치 전체 슬롯을 한 번에 확보 (부족하면 RetouchBusyError)
+    - 실패한 이미지는 원본으로 대체 (status="fallback"), 배치 전체는 실패시키지 않음
+      일부 단계만 실패한 이미지도 status="fallback" + error (실패한 부분만 원본인 결과 이미지)
+    """
+    from services import get_retouch_service_async
+    results: List[Optional[Dict]] = [None] * len(items)
+    misses = []
+
+    found = await cache_lookup([image_data for image_data, _, _ in items], fmt, quality, compression, params)
+    for i, lookup in enumerate(found):
+        if lookup.data is not None:
+            results[i] = {"data": lookup.data, "status": "success", "cached": True, "key": lookup.key}
+        else:
+            misses.append((i, lookup))
+
+    memory = sum(retouch_limits.estimate_memory(items[i][0]) for i, _ in misses)
+    acquire(len(misses), memory)
+    try:
+        outcomes = await asyncio.gather(
+            *(_run_job(items[i][0], items[i][1], fmt, quality, compression, params, lookup.faces)
+              for i, lookup in misses),
+            return_exceptions=True,
+        )
+    finally:
+        release(len(misses), memory)
+
+    for (i, lookup), outcome in zip(misses, outcomes):
+        if isinstance(outcome, BaseException):
+            logger.warning(f"[retouch_batch] image {i} failed: {outcome}")
+            results[i] = {"error": str(outcome) or outcome.__class__.__name__, "status": "fallback"}
+            continue
+        data, ok, faces = outcome
+        await cache_store(lookup, data, ok, faces)
+        if ok:
+            results[i] = {"data": data, "status": "success", "cached": False, "key": lookup.key}
+        else:
+            # 일부 단계가 실패해서 해당 부분은 원본 그대로인 결과: 캐시하지 않으므로 cache_key 도 없음
+            results[i] = {"data": data, "status": "fallback", "error": "some retouch stages failed"}
+
+    retouch_service = await get_retouch_service_async()
+    response = []
+    for i, ((image_data, filename, content_type), result) in enumerate(zip(items, results)):
+        entry = {"index": i, "filename": filename, "status": result["status"]}
+        if result["status"] == "success":
+            entry["enhanced_image_url"] = retouch_service.to_data_url(result["data"], fmt)
+            entry["cached"] = result["cached"]
+            if result["key"] is not None:
+                entry["cache_key"] = result["key"]  # /api/photo-strip 에서 결과를 다시 보내지 않고 참조
+        else:
+            if result.get("data") is not None:
+                entry["enhanced_image_url"] = retouch_service.to_data_url(result["data"], fmt)
+            else:
+                entry["enhanced_image_url"] = _fallback_data_url(image_data, content_type)
+            entry["error"] = result["error"]
+        response.append(entry)
+    return response
@@ -1,51 +1,56 @@
-import io
 import base64
 import cv2
 import numpy as np
-from PIL import Image
-from fastapi import HTTPException
 import sys
 import os
-import tempfile
-import shutil
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from functools import lru_cache
+from typing import NamedTuple
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-import importlib.util
+from config import (
+    LANDMARK_PROXY_MAX_EDGE,
+    LANDMARK_REFINE_NATIVE,
+    SKIN_SMOOTH_TIER,
+    SKIN_SMOOTH_WORK_EDGE,
+    RETOUCH_PREVIEW_MAX_EDGE,
+    RETOUCH_EYE_SCALE,
+    FACE_SLIM_STRENGTH,
+    RETOUCH_MAX_FACES,
+    RETOUCH_FACE_WORKERS,
+    RETOUCH_MAX_PIXELS,
+    RETOUCH_MAX_WORK_EDGE,
+)
 
 
 # =========================
-# MediaPipe ASCII 경로 준비
+# MediaPipe ASCII 경로 준비 (services/mediapipe_setup.py)
 # =========================
 
-ASCII_MP_SITE = Path(tempfile.gettempdir()) / "mediapipe_ascii_site"
-ASCII_MP_PACKAGE = ASCII_MP_SITE / "mediapipe"
-
+from services.mediapipe_setup import prepare_mediapipe_package
+from services import retouch_cache, retouch_limits, diagnostics, metrics
+from services.retouch_buffers import get_scratch
 
-def _prepare_mediapipe_package():
-    if not ASCII_MP_PACKAGE.exists():
-        spec = importlib.util.find_spec("mediapipe")
-        if spec is None or spec.origin is None:
-            raise ImportError("mediapipe package not found in site-packages")
-        source_pkg = Path(spec.origin).resolve().parent
-        ASCII_MP_SITE.mkdir(parents=True, exist_ok=True)
-        if ASCII_MP_PACKAGE.exists():
-            shutil.rmtree(ASCII_MP_PACKAGE)
-        shutil.copytree(source_pkg, ASCII_MP_PACKAGE, dirs_exist_ok=True)
+logger = diagnostics.get_logger("retouch")
 
-    if str(ASCII_MP_SITE) not in sys.path:
-        sys.path.insert(0, str(ASCII_MP_SITE))
+prepare_mediapipe_package()
 
-    if "mediapipe" in sys.modules:
-        del sys.modules["mediapipe"]
+import mediapipe as mp
+from mediapipe.python._framework_bindings import resource_util as mp_resource_util
 
 
-_prepare_mediapipe_package()
+# =========================
+# 채널 순서
+#   파이프라인 전체는 OpenCV 기본 순서인 BGR 하나로 통일
+#   (cv2.imdecode → 각 단계 → cv2.imencode 까지 변환 없음)
+#   RGB 가 필요한 곳은 FaceMesh 입력(검출용 proxy)뿐
+# =========================
 
-import mediapipe as mp
-from mediapipe.python._framework_bindings import resource_util as mp_resource_util
+PIPELINE_CHANNEL_ORDER = "BGR"
+BGRImage = np.ndarray  # (H, W, 3) uint8, BGR 순서
 
 
 # =========================
@@ -67,44 +72,162 @@ def _init_mediapipe():
     return True
 
 
-def get_landmarks(image: np.ndarray) -> np.ndarray:
+# FaceMesh 인스턴스는 그래프 초기화 비용이 크므로 스레드별로 한 번만 생성해서 재사용
+# (static_image_mode=True 이므로 이전 프레임 상태를 공유하지 않음)
+_face_mesh_local = threading.local()
+
+
+def create_face_mesh(static_image_mode: bool = True, max_num_faces: int = RETOUCH_MAX_FACES):
     """
-    MediaPipe FaceMesh로 얼굴 랜드마크 추출 (468 포인트)
+    FaceMesh 생성
+    - static_image_mode=True : 업로드 사진용, 매번 검출
+    - static_image_mode=False: 실시간 프레임용, 이전 프레임 결과로 추적 (세션별 인스턴스 필요)
     """
     _init_mediapipe()
+    return mp.solutions.face_mesh.FaceMesh(
+        static_image_mode=static_image_mode,
+        max_num_faces=max_num_faces,
+        refine_landmarks=True,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5,
+    )
 
-    h, w = image.shape[:2]
 
-    if len(image.shape) == 3 and image.shape[2] == 3:
-        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-    else:
-        rgb_image = image
+def get_face_mesh():
+    face_mesh = getattr(_face_mesh_local, "face_mesh", None)
+    if face_mesh is None:
+        face_mesh = create_face_mesh()
+        _face_mesh_local.face_mesh = face_mesh
+    return face_mesh
 
+
+def _run_face_mesh(rgb_image: np.ndarray, face_mesh=None):
+    """
+    FaceMesh 1회 실행 → 검출된 얼굴들의 정규화 좌표 [(N, 2), ...] (없으면 빈 list)
+    - face_mesh 생략 시 스레드별 static 인스턴스 사용
+    """
     try:
-        with mp.solutions.face_mesh.FaceMesh(
-            static_image_mode=True,
-            max_num_faces=1,
-            refine_landmarks=True,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5,
-        ) as face_mesh:
-            results = face_mesh.process(rgb_image)
+        results = (face_mesh if face_mesh is not None else get_face_mesh()).process(rgb_image)
     except Exception as e:
-        print("[get_landmarks] FaceMesh error:", e)
-        return None
+        logger.warning(f"[get_landmarks] FaceMesh error: {e}")
+        if face_mesh is None:
+            _face_mesh_local.face_mesh = None  # 오류 난 인스턴스는 버리고 다음에 새로 생성
+        return []
 
     if not results.multi_face_landmarks:
-        print("[get_landmarks] No face detected")
-        return None
+        return []
+
+    return [
+        np.array([[lm.x, lm.y] for lm in face_landmarks.landmark], dtype=np.float32)
+        for face_landmarks in results.multi_face_landmarks
+    ]
+
 
-    face_landmarks = results.multi_face_landmarks[0]
-    landmarks = []
-    for lm in face_landmarks.landmark:
-        x = lm.x * w
-        y = lm.y * h
-        landmarks.append([x, y])
+def _to_rgb(image: BGRImage) -> np.ndarray:
+    """FaceMesh 입력용 BGR → RGB (검출용 축소본에만 적용)"""
+    if len(image.shape) == 3 and image.shape[2] == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    return image
+
+
+def make_detection_proxy(image: np.ndarray, max_edge: int = LANDMARK_PROXY_MAX_EDGE):
+    """
+    검출용 축소 이미지 생성 (긴 변이 max_edge 이하)
+    - FaceMesh 는 내부에서 어차피 작은 입력으로 리사이즈하므로 원본 크기로 넘길 필요 없음
+    - 반환: (proxy, scale)  scale = proxy / 원본
+    """
+    h, w = image.shape[:2]
+    long_edge = max(h, w)
+    if not max_edge or long_edge <= max_edge:
+        return image, 1.0
+    scale = max_edge / float(long_edge)
+    proxy = cv2.resize(image, (max(1, int(round(w * scale))), max(1, int(round(h * scale)))),
+                       interpolation=cv2.INTER_AREA)
+    return proxy, scale
+
+
+# 원본 해상도 crop 에서 다시 잡을 세밀한 포인트 (눈/입술/홍채)
+def _refine_point_indices(n_points):
+    idx = set(LEFT_EYE_IDX + RIGHT_EYE_IDX + OUTER_LIP + INNER_LIP)
+    idx.update(range(468, n_points))  # refine_landmarks=True 의 홍채 포인트
+    return sorted(i for i in idx if i < n_points)
+
+
+def _refine_on_native_crop(image: np.ndarray, landmarks: np.ndarray) -> np.ndarray:
+    """
+    proxy 검출 결과의 얼굴 bbox 를 원본 해상도로 잘라 다시 검출하고
+    눈/입술 포인트만 교체 (crop 검출 실패 시 proxy 결과 유지)
+    """
+    h, w = image.shape[:2]
+    x, y, bw, bh = cv2.boundingRect(landmarks.astype(np.int32))
+    pad = int(max(bw, bh) * 0.25)
+    x1, y1 = max(0, x - pad), max(0, y - pad)
+    x2, y2 = min(w, x + bw + pad), min(h, y + bh + pad)
+    if x2 <= x1 or y2 <= y1:
+        return landmarks
+
+    crop = image[y1:y2, x1:x2]
+    faces = _run_face_mesh(_to_rgb(crop))
+    # crop 에 옆 사람 얼굴이 함께 잡힐 수 있으므로 proxy 결과와 가장 가까운 얼굴 사용
+    expected = (landmarks - np.array([x1, y1], dtype=np.float32)) / np.array([x2 - x1, y2 - y1], dtype=np.float32)
+    faces = [f for f in faces if len(f) == len(landmarks)]
+    norm = min(faces, key=lambda f: float(np.mean(np.abs(f - expected)))) if faces else None
+    if norm is None:
+        logger.warning("[get_landmarks] native crop refine failed, keeping proxy landmarks")
+        return landmarks
+
+    refined = landmarks.copy()
+    idx = _refine_point_indices(len(landmarks))
+    refined[idx, 0] = norm[idx, 0] * (x2 - x1) + x1
+    refined[idx, 1] = norm[idx, 1] * (y2 - y1) + y1
+    return refined
 
-    return np.array(landmarks, dtype=np.float32)
+
+def _face_area(landmarks: np.ndarray) -> float:
+    x1, y1 = landmarks.min(axis=0)
+    x2, y2 = landmarks.max(axis=0)
+    return float((x2 - x1) * (y2 - y1))
+
+
+@metrics.timed("get_landmarks")
+def get_all_landmarks(
+    image: BGRImage,
+    max_edge: int = LANDMARK_PROXY_MAX_EDGE,
+    refine_native: bool = LANDMARK_REFINE_NATIVE,
+):
+    """
+    MediaPipe FaceMesh 한 번으로 최대 RETOUCH_MAX_FACES 명의 랜드마크 추출
+    - 반환: [(468+, 2) 원본 좌표, ...] 얼굴 크기 내림차순 (없으면 빈 list)
+    - 긴 변이 max_edge 를 넘으면 축소 proxy 에서 검출 후 원본 좌표로 환산
+    - refine_native=True 이면 눈/입술 포인트를 원본 해상도 얼굴 crop 에서 다시 검출
+    """
+    _init_mediapipe()
+
+    h, w = image.shape[:2]
+
+    proxy, scale = make_detection_proxy(image, max_edge)
+    faces = _run_face_mesh(_to_rgb(proxy))
+    if not faces:
+        logger.info("[get_landmarks] No face detected")
+        return []
+
+    # 정규화 좌표이므로 원본 크기를 곱하면 바로 원본 좌표
+    faces = [norm * np.array([w, h], dtype=np.float32) for norm in faces]
+    if refine_native and scale < 1.0:
+        faces = [_refine_on_native_crop(image, lm) for lm in faces]
+
+    faces.sort(key=_face_area, reverse=True)
+    return [lm.astype(np.float32) for lm in faces]
+
+
+def get_landmarks(
+    image: BGRImage,
+    max_edge: int = LANDMARK_PROXY_MAX_EDGE,
+    refine_native: bool = LANDMARK_REFINE_NATIVE,
+) -> np.ndarray:
+    """가장 큰 얼굴 하나의 랜드마크 (468 포인트) 또는 None"""
+    faces = get_all_landmarks(image, max_edge, refine_native)
+    return faces[0] if faces else None
 
 
 # =========================
@@ -155,116 +278,326 @@ def hex_to_rgb(hex_str):
     hex_str = hex_str.lstrip('#')
     return tuple(int(hex_str[i:i+2], 16) for i in (0, 2, 4))
 
-# 화장 색상 정의
+def rgb_to_bgr(color_rgb):
+    return tuple(color_rgb[::-1])
+
+# 화장 색상 정의 (파이프라인 순서인 BGR 로도 보관)
 BLUSH_RGB = hex_to_rgb("#FA7D77")
 HIGHLIGHT_RGB = hex_to_rgb("#FEEDEF")
+BLUSH_BGR = rgb_to_bgr(BLUSH_RGB)
+HIGHLIGHT_BGR = rgb_to_bgr(HIGHLIGHT_RGB)
+
+# ---- ROI 기반 소프트 마스크 ----
+# 마스크는 (mask_roi, (x1, y1, x2, y2)) 형태로 다룸
+# 도형 bbox + 3σ 영역만 래스터화/블러 → 전체 프레임 버퍼를 만들지 않음
+
+def _gaussian_ksize(sigma):
+    """GaussianBlur(ksize=(0,0))가 float32 에서 쓰는 커널 크기와 동일"""
+    return int(round(sigma * 8 + 1)) | 1
+
+
+def _soft_shape_roi(h, w, bbox, sigma, draw):
+    """
+    bbox 를 3σ 만큼 넓힌 ROI 안에서만 도형을 그리고 블러
+    - 블러 버퍼는 커널 반경만큼 더 넓게 잡아 전체 프레임 블러와 같은 값을 얻음
+    - draw(buf, ox, oy): buf 에 (ox, oy) 오프셋 기준으로 도형을 그림
+    """
+    bx1, by1, bx2, by2 = bbox
+    ksize = _gaussian_ksize(sigma)
+    pad = int(np.ceil(sigma * 3))
+    r = ksize // 2
+
+    x1, y1 = max(0, bx1 - pad), max(0, by1 - pad)
+    x2, y2 = min(w, bx2 + pad), min(h, by2 + pad)
+    if x2 <= x1 or y2 <= y1:
+        return None, (0, 0, 0, 0)
+
+    X1, Y1 = max(0, x1 - r), max(0, y1 - r)
+    X2, Y2 = min(w, x2 + r), min(h, y2 + r)
+    buf = np.zeros((Y2 - Y1, X2 - X1), dtype=np.float32)
+    draw(buf, X1, Y1)
+    buf = cv2.GaussianBlur(buf, (ksize, ksize), sigma)
+    mask = np.clip(buf[y1 - Y1:y2 - Y1, x1 - X1:x2 - X1], 0, 1)
+    return mask, (x1, y1, x2, y2)
+
+
+def make_soft_mask_roi(h, w, pts, feather=35):
+    """볼록 다각형 소프트 마스크 (ROI 버전)"""
+    pts = pts.astype(np.int32)
+    bbox = (int(pts[:, 0].min()), int(pts[:, 1].min()), int(pts[:, 0].max()) + 1, int(pts[:, 1].max()) + 1)
+
+    def draw(buf, ox, oy):
+        cv2.fillConvexPoly(buf, pts - np.array([ox, oy], dtype=np.int32), 1.0)
+
+    return _soft_shape_roi(h, w, bbox, feather, draw)
+
+
+def make_soft_ellipse_roi(h, w, center, axes, sigma):
+    """채워진 타원 소프트 마스크 (ROI 버전)"""
+    cx, cy = int(center[0]), int(center[1])
+    ax, ay = int(axes[0]), int(axes[1])
+    bbox = (cx - ax - 1, cy - ay - 1, cx + ax + 2, cy + ay + 2)
+
+    def draw(buf, ox, oy):
+        cv2.ellipse(buf, (cx - ox, cy - oy), (ax, ay), 0, 0, 360, 1.0, -1)
+
+    return _soft_shape_roi(h, w, bbox, sigma, draw)
+
+
+def _union_rect(rects):
+    rects = [r for r in rects if r[2] > r[0] and r[3] > r[1]]
+    if not rects:
+        return (0, 0, 0, 0)
+    return (
+        min(r[0] for r in rects), min(r[1] for r in rects),
+        max(r[2] for r in rects), max(r[3] for r in rects),
+    )
+
+
+def _expand_mask(mask, rect, target_rect):
+    """ROI 마스크를 더 큰 target_rect 좌표계로 옮김 (나머지는 0)"""
+    tx1, ty1, tx2, ty2 = target_rect
+    out = np.zeros((ty2 - ty1, tx2 - tx1), dtype=np.float32)
+    if mask is not None:
+        x1, y1, x2, y2 = rect
+        out[y1 - ty1:y2 - ty1, x1 - tx1:x2 - tx1] = mask
+    return out
+
+
+def max_masks_roi(masks):
+    """여러 ROI 마스크의 최대값 합성 → (mask, union_rect)"""
+    masks = [(m, r) for m, r in masks if m is not None]
+    rect = _union_rect([r for _, r in masks])
+    if rect[2] <= rect[0]:
+        return None, rect
+    out = np.zeros((rect[3] - rect[1], rect[2] - rect[0]), dtype=np.float32)
+    for m, (x1, y1, x2, y2) in masks:
+        sub = out[y1 - rect[1]:y2 - rect[1], x1 - rect[0]:x2 - rect[0]]
+        np.maximum(sub, m, out=sub)
+    return out, rect
+
 
 def make_soft_mask(h, w, pts, feather=35):
-    """부드러운 마스크 생성 (feather 적용)"""
-    mask = np.zeros((h, w), dtype=np.float32)
-    cv2.fillConvexPoly(mask, pts.astype(np.int32), 1.0)
-    mask = cv2.GaussianBlur(mask, (0, 0), feather)
-    return np.clip(mask, 0, 1)
-
-def alpha_blend_color(img, mask, color_rgb, alpha=1.0):
-    """색상 레이어를 이미지에 블렌딩"""
-    color_layer = np.zeros_like(img, dtype=np.float32)
-    color_layer[:] = np.array(color_rgb, dtype=np.float32)
+    """부드러운 마스크 생성 (feather 적용) - 전체 프레임 크기 (하위 호환용)"""
+    mask, rect = make_soft_mask_roi(h, w, pts, feather=feather)
+    return _expand_mask(mask, rect, (0, 0, w, h))
+
+
+def alpha_blend_color_roi(img, mask, rect, color, alpha=1.0):
+    """색상 레이어를 마스크 ROI 영역에만 블렌딩 (color 는 img 와 같은 채널 순서)"""
+    out = img.copy()
+    if mask is None:
+        return out
+    x1, y1, x2, y2 = rect
     m = (mask * alpha)[..., None]
-    out = img.astype(np.float32) * (1 - m) + color_layer * m
-    return np.clip(out, 0, 255).astype(np.uint8)
+    roi = img[y1:y2, x1:x2].astype(np.float32)
+    color = np.array(color, dtype=np.float32)
+    blended = roi * (1 - m) + color * m
+    out[y1:y2, x1:x2] = np.clip(blended, 0, 255).astype(np.uint8)
+    return out
+
 
-def safe_crop(img, x1, y1, x2, y2):
+def alpha_blend_color(img, mask, color, alpha=1.0):
+    """색상 레이어를 이미지에 블렌딩 (전체 프레임 마스크, color 는 img 와 같은 채널 순서)"""
     h, w = img.shape[:2]
-    x1 = max(0, min(w - 1, x1))
-    x2 = max(0, min(w, x2))
-    y1 = max(0, min(h - 1, y1))
-    y2 = max(0, min(h, y2))
-    if x2 <= x1 or y2 <= y1:
-        return None, x1, y1, x2, y2
-    return img[y1:y2, x1:x2].copy(), x1, y1, x2, y2
+    return alpha_blend_color_roi(img, mask, (0, 0, w, h), color, alpha=alpha)
 
 
 # =========================
-# 4. 눈 확대 (패치 리사이즈 + 원형 마스크)
+# 4. 기하 변형 (눈 확대 + 턱/광대 축소)
+#    모든 변형을 얼굴 ROI 위의 displacement field 하나로 모아서 cv2.remap 한 번으로 적용
+#    - 역방향 매핑: 출력 픽셀 x 는 원본의 x - d(x) 위치에서 샘플링
+#    - 각 연산은 반경 R 안에서만 작동하고 경계로 갈수록 (1 - t²)² 로 0 에 수렴
+#    - 연산: ("scale", cx, cy, R, k)            중심 기준 국소 확대 (중심 배율 1 / (1 - k))
+#            ("translate", px, py, R, vx, vy)   p 주변을 v 만큼 이동 (겹치는 이동은 가중 평균)
 # =========================
 
-def enlarge_eye_simple(img: np.ndarray, landmarks: np.ndarray, eye_indices, scale: float) -> np.ndarray:
-    h, w, _ = img.shape
-    eye_pts = landmarks[eye_indices].astype(np.int32)
-    ex, ey, ew, eh = cv2.boundingRect(eye_pts)
+# 얼굴형 축소 시 중심선 쪽으로 당기는 턱선/광대 외곽 포인트
+SLIM_POINTS = sorted(set(JAW_POINTS + [58, 93, 132, 288, 323, 361]))
 
-    pad = int(max(ew, eh) * 0.3)
-    cx = ex + ew // 2
-    cy = ey + eh // 2
 
-    x1 = cx - (ew // 2 + pad)
-    x2 = cx + (ew // 2 + pad)
-    y1 = cy - (eh // 2 + pad)
-    y2 = cy + (eh // 2 + pad)
+def _falloff(dist2, radius):
+    t2 = dist2 / np.float32(radius * radius)
+    return np.square(np.clip(1.0 - t2, 0.0, None)).astype(np.float32)
 
-    patch, x1, y1, x2, y2 = safe_crop(img, x1, y1, x2, y2)
-    if patch is None:
-        return img
 
-    ph, pw = patch.shape[:2]
-    new_w = int(pw * scale)
-    new_h = int(ph * scale)
-    resized = cv2.resize(patch, (new_w, new_h), interpolation=cv2.INTER_CUBIC)
-
-    cx_local = (x2 - x1) // 2
-    cy_local = (y2 - y1) // 2
-    nx1 = cx_local - new_w // 2
-    ny1 = cy_local - new_h // 2
-    nx2 = nx1 + new_w
-    ny2 = ny1 + new_h
-
-    nx1_clip = max(0, nx1)
-    ny1_clip = max(0, ny1)
-    nx2_clip = min(pw, nx2)
-    ny2_clip = min(ph, ny2)
-
-    rx1 = nx1_clip - nx1
-    ry1 = ny1_clip - ny1
-    rx2 = rx1 + (nx2_clip - nx1_clip)
-    ry2 = ry1 + (ny2_clip - ny1_clip)
-
-    if nx2_clip <= nx1_clip or ny2_clip <= ny1_clip:
-        return img
+def _op_terms(op, x, y):
+    """연산 하나의 (가중치, x 변위, y 변위) - x, y 는 broadcast 가능한 좌표 배열"""
+    if op[0] == "scale":
+        _, cx, cy, radius, k = op
+        ox = x - np.float32(cx)
+        oy = y - np.float32(cy)
+        w = _falloff(ox * ox + oy * oy, radius)
+        wk = w * np.float32(k)
+        return w, ox * wk, oy * wk
+    _, px, py, radius, vx, vy = op
+    ox = x - np.float32(px)
+    oy = y - np.float32(py)
+    w = _falloff(ox * ox + oy * oy, radius)
+    return w, w * np.float32(vx), w * np.float32(vy)
 
-    patch_target = patch[ny1_clip:ny2_clip, nx1_clip:nx2_clip].astype(np.float32)
-    patch_resized = resized[ry1:ry2, rx1:rx2].astype(np.float32)
 
-    hh, ww = patch_target.shape[:2]
-    yy, xx = np.ogrid[:hh, :ww]
-    cy0 = hh / 2.0
-    cx0 = ww / 2.0
-    radius = min(hh, ww) / 2.0
-    dist = np.sqrt((xx - cx0) ** 2 + (yy - cy0) ** 2)
-    mask = (dist <= radius).astype(np.float32)
-    mask = cv2.GaussianBlur(mask, (0, 0), radius * 0.4)
-    mask3 = mask[..., None]
+def _op_rect(op):
+    r = op[3]
+    return (int(np.floor(op[1] - r)), int(np.floor(op[2] - r)),
+            int(np.ceil(op[1] + r)) + 1, int(np.ceil(op[2] + r)) + 1)
 
-    blended = patch_target * (1 - mask3) + patch_resized * mask3
-    blended = np.clip(blended, 0, 255).astype(np.uint8)
 
-    out = img.copy()
-    out[y1:y2, x1:x2][ny1_clip:ny2_clip, nx1_clip:nx2_clip] = blended
+def _accumulate(ops, x, y, shape, slices=None):
+    """
+    연산들의 변위 합산
+    - slices: 연산별 (row slice, col slice) → 연산 반경 안쪽만 계산 (그리드용)
+    """
+    dx = np.zeros(shape, dtype=np.float32)
+    dy = np.zeros(shape, dtype=np.float32)
+    tx = ty = tw = None
+    for i, op in enumerate(ops):
+        sl = slices[i] if slices is not None else (Ellipsis,)
+        xs = x[:, sl[1]] if slices is not None else x
+        ys = y[sl[0], :] if slices is not None else y
+        w, ddx, ddy = _op_terms(op, xs, ys)
+        if op[0] == "scale":
+            dx[sl] += ddx
+            dy[sl] += ddy
+        else:
+            if tx is None:
+                tx = np.zeros(shape, dtype=np.float32)
+                ty = np.zeros(shape, dtype=np.float32)
+                tw = np.zeros(shape, dtype=np.float32)
+            tx[sl] += ddx
+            ty[sl] += ddy
+            tw[sl] += w
+    if tx is not None:
+        # 이동 연산이 겹치는 곳은 가중 평균 (포인트가 촘촘한 턱선에서 이동량이 누적되지 않도록)
+        norm = np.maximum(tw, 1.0)
+        dx += tx / norm
+        dy += ty / norm
+    return dx, dy
+
+
+def displacement_at(ops, points: np.ndarray):
+    """임의 좌표들 (N, 2) 에서의 변위 (N, 2)"""
+    x = points[:, 0].astype(np.float32)
+    y = points[:, 1].astype(np.float32)
+    dx, dy = _accumulate(ops, x, y, x.shape)
+    return np.stack([dx, dy], axis=1)
+
+
+def apply_displacement(img: BGRImage, ops, inplace=False) -> BGRImage:
+    """연산들을 합친 displacement field 를 ROI 에 만들고 cv2.remap 한 번으로 적용"""
+    out = img if inplace else img.copy()
+    if not ops:
+        return out
+    h, w = img.shape[:2]
+    rects = [_op_rect(op) for op in ops]
+    x1, y1, x2, y2 = _union_rect(rects)
+    x1, y1, x2, y2 = max(0, x1), max(0, y1), min(w, x2), min(h, y2)
+    if x2 <= x1 or y2 <= y1:
+        return out
+
+    xs = np.arange(x1, x2, dtype=np.float32)[None, :]
+    ys = np.arange(y1, y2, dtype=np.float32)[:, None]
+    slices = []
+    for rx1, ry1, rx2, ry2 in rects:
+        slices.append((
+            slice(max(0, ry1 - y1), max(0, min(y2, ry2) - y1)),
+            slice(max(0, rx1 - x1), max(0, min(x2, rx2) - x1)),
+        ))
+    dx, dy = _accumulate(ops, xs, ys, (y2 - y1, x2 - x1), slices)
+
+    map_x = xs - dx
+    map_y = ys - dy
+    # 원본 전체를 소스로 주고 ROI 크기의 map 으로 샘플링 (ROI 밖 픽셀도 참조 가능)
+    warped = cv2.remap(img, map_x, map_y, cv2.INTER_LINEAR, borderMode=cv2.BORDER_REFLECT_101)
+    out[y1:y2, x1:x2] = warped
     return out
 
 
-def enlarge_eyes(img: np.ndarray, landmarks: np.ndarray, scale: float = 1.1) -> np.ndarray:
-    out = img.copy()
-    before = out.copy()
-    out = enlarge_eye_simple(out, landmarks, LEFT_EYE_IDX, scale)
-    out = enlarge_eye_simple(out, landmarks, RIGHT_EYE_IDX, scale)
-    diff_eye = np.mean(np.abs(out.astype(np.int32) - before.astype(np.int32)))
-    print(f"[enlarge_eyes] mean abs diff: {diff_eye:.2f} (scale={scale})")
-    return out
+def warp_points(points: np.ndarray, ops, iters: int = 4) -> np.ndarray:
+    """
+    랜드마크를 변형 후 위치로 이동 (field 의 순방향)
+    - 역방향 매핑 x - d(x) = p 를 고정점 반복 x = p + d(x) 로 풂
+    """
+    if not ops:
+        return points
+    src = points.astype(np.float32)
+    moved = src.copy()
+    for _ in range(iters):
+        moved = src + displacement_at(ops, moved)
+    return moved.astype(points.dtype, copy=False)
+
+
+def eye_scale_op(landmarks: np.ndarray, eye_indices, scale: float):
+    """눈 중심 기준 국소 확대 연산 (중심 배율 = scale)"""
+    pts = landmarks[eye_indices]
+    x1, y1 = pts.min(axis=0)
+    x2, y2 = pts.max(axis=0)
+    radius = max(x2 - x1, y2 - y1) * 0.8
+    return ("scale", float(x1 + x2) / 2.0, float(y1 + y2) / 2.0, float(max(radius, 2.0)), 1.0 - 1.0 / scale)
+
+
+def slim_ops(landmarks: np.ndarray, strength: float):
+    """턱선/광대 외곽 포인트를 얼굴 중심선 쪽으로 strength 비율만큼 당기는 이동 연산들"""
+    oval_x = landmarks[FACE_OVAL_IDX][:, 0]
+    face_w = float(oval_x.max() - oval_x.min())
+    center_x = float(np.mean(landmarks[[1, 152, 168], 0]))  # 코끝, 턱끝, 미간
+    radius = max(face_w * 0.2, 2.0)
+    ops = []
+    for i in SLIM_POINTS:
+        px, py = float(landmarks[i][0]), float(landmarks[i][1])
+        vx = (center_x - px) * strength
+        if abs(vx) >= 0.5:
+            ops.append(("translate", px, py, radius, vx, 0.0))
+    return ops
+
+
+def face_warp_ops(landmarks: np.ndarray, eye_scale: float, slim_strength: float):
+    ops = []
+    if eye_scale and eye_scale != 1.0:
+        ops.append(eye_scale_op(landmarks, LEFT_EYE_IDX, eye_scale))
+        ops.append(eye_scale_op(landmarks, RIGHT_EYE_IDX, eye_scale))
+    if slim_strength > 0:
+        # 턱/광대 랜드마크가 이상하면 얼굴형이 찌그러지므로 축소는 생략
+        if validate_landmarks(landmarks):
+            ops.extend(slim_ops(stabilize_landmarks(landmarks), slim_strength))
+        else:
+            logger.debug("[warp_face] landmarks failed validation → skip slimming")
+    return ops
+
+
+@metrics.timed("warp_face")
+def warp_face(
+    img: BGRImage,
+    landmarks: np.ndarray,
+    eye_scale: float = RETOUCH_EYE_SCALE,
+    slim_strength: float = FACE_SLIM_STRENGTH,
+    inplace: bool = False,
+):
+    """
+    눈 확대 + 턱/광대 축소를 remap 한 번으로 적용 → (이미지, 변형된 랜드마크) 반환
+    - 이후 단계는 재검출 없이 변형된 랜드마크를 그대로 사용
+    """
+    ops = face_warp_ops(landmarks, eye_scale, slim_strength)
+    landmarks_out = warp_points(landmarks, ops)
+    if any(op[0] == "translate" for op in ops) and has_fold(landmarks, landmarks_out):
+        # 얼굴형 축소가 메시를 접으면 (삼각형 뒤집힘) 축소는 생략하고 눈 확대만 적용
+        logger.debug("[warp_face] slimming folds the face mesh → skip slimming")
+        ops = [op for op in ops if op[0] != "translate"]
+        landmarks_out = warp_points(landmarks, ops)
+    out = apply_displacement(img, ops, inplace=inplace)
+    if diagnostics.enabled() and not inplace:
+        diff = np.mean(np.abs(out.astype(np.int32) - img.astype(np.int32)))
+        logger.debug(f"[warp_face] mean abs diff: {diff:.2f} (eye={eye_scale}, slim={slim_strength}, ops={len(ops)})")
+    return out, landmarks_out
+
+
+def enlarge_eyes(img: BGRImage, landmarks: np.ndarray, scale: float = 1.1):
+    """양쪽 눈 확대만 적용 → (이미지, 변형된 랜드마크) 반환"""
+    return warp_face(img, landmarks, eye_scale=scale, slim_strength=0.0)
 
 
 # ============================================================
-# 5. 얼굴형 보정 (Piecewise Affine, 턱/광대만 자연스럽게)
+# 5. 얼굴형 컨트롤 포인트 / 랜드마크 검증
 # ============================================================
 
 # 얼굴형 변형에 쓰는 컨트롤 포인트(외곽 + 안정 anchor)
@@ -275,91 +608,93 @@ FACE_SHAPE_CTRL_IDX = sorted(set(
     + [234, 454]  # 광대 중심
 ))
 
+def _signed_areas(points: np.ndarray, tris: np.ndarray) -> np.ndarray:
+    """삼각형별 부호 있는 면적 x2 (양수 = 기준 방향)"""
+    a = points[tris[:, 0]]
+    b = points[tris[:, 1]]
+    c = points[tris[:, 2]]
+    return (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0])
+
+
 def _delaunay_triangles(rect, points):
-    """points 기준으로 Delaunay triangulation 반환 (triangle vertex index 3개씩) - 최적화 버전"""
+    """points 기준으로 Delaunay triangulation 반환 ((T, 3) vertex index, 모두 양의 방향)"""
     subdiv = cv2.Subdiv2D(rect)
     for p in points:
         subdiv.insert((float(p[0]), float(p[1])))
 
     triangleList = subdiv.getTriangleList()
     if len(triangleList) == 0:
-        return []
-    
-    triangleList = np.array(triangleList, dtype=np.float32)
+        return np.empty((0, 3), dtype=np.int32)
 
-    # 좌표 -> 인덱스 매핑 (최적화: 벡터화된 거리 계산)
+    # 좌표 -> 인덱스 매핑: 모든 정점과 모든 포인트의 거리를 한 번에 계산
     pts = points.astype(np.float32)
-    tris = []
-    
-    # 모든 삼각형의 모든 정점에 대해 한 번에 거리 계산
-    for t in triangleList:
-        tri = t.reshape(3, 2)
-        idxs = []
-        ok = True
-        for v in tri:
-            # 벡터화된 거리 계산 (더 빠름)
-            d = np.sum((pts - v) ** 2, axis=1)
-            i = int(np.argmin(d))
-            if d[i] > 4.0:  # 거리 임계값 (2.0^2 = 4.0)
-                ok = False
-                break
-            idxs.append(i)
-        if ok and len(set(idxs)) == 3:
-            tris.append(tuple(sorted(idxs)))  # 정렬하여 중복 제거 용이
-    
-    # 중복 제거 (set 사용으로 더 빠름)
-    tris = list(set(tris))
-    return tris
+    verts = np.asarray(triangleList, dtype=np.float32).reshape(-1, 2)
+    d = np.sum((verts[:, None, :] - pts[None, :, :]) ** 2, axis=2)
+    idx = np.argmin(d, axis=1)
+    near = d[np.arange(len(idx)), idx] <= 4.0  # 거리 임계값 (2.0^2 = 4.0), 바깥 가상 정점 제외
 
-def _warp_triangle(img, out, t_src, t_dst):
-    """삼각형 하나를 src->dst로 warp해서 out에 합침 (에러 처리 추가)"""
-    try:
-        r1 = cv2.boundingRect(np.float32([t_src]))
-        r2 = cv2.boundingRect(np.float32([t_dst]))
+    idx = idx.reshape(-1, 3)
+    ok = near.reshape(-1, 3).all(axis=1)
+    ok &= (idx[:, 0] != idx[:, 1]) & (idx[:, 1] != idx[:, 2]) & (idx[:, 0] != idx[:, 2])
+    tris = np.unique(np.sort(idx[ok], axis=1), axis=0)
 
-        x1, y1, w1, h1 = r1
-        x2, y2, w2, h2 = r2
+    # 방향 통일 (뒤집힘 판정을 부호 비교 한 번으로 하기 위해)
+    neg = _signed_areas(pts, tris) < 0
+    tris[neg] = tris[neg][:, [0, 2, 1]]
+    return tris.astype(np.int32)
 
-        if w1 <= 0 or h1 <= 0 or w2 <= 0 or h2 <= 0:
-            return
 
-        # 경계 체크
-        h, w = img.shape[:2]
-        if x1 < 0 or y1 < 0 or x1 + w1 > w or y1 + h1 > h:
-            return
-        if x2 < 0 or y2 < 0 or x2 + w2 > w or y2 + h2 > h:
-            return
+def _points_rect(points):
+    x, y, w, h = cv2.boundingRect(points.astype(np.float32))
+    return (x - 1, y - 1, w + 2, h + 2)
 
-        t1_rect = []
-        t2_rect = []
-
-        for i in range(3):
-            t1_rect.append(((t_src[i][0] - x1), (t_src[i][1] - y1)))
-            t2_rect.append(((t_dst[i][0] - x2), (t_dst[i][1] - y2)))
-
-        img1_rect = img[y1:y1+h1, x1:x1+w1]
-        if img1_rect.size == 0:
-            return
-
-        mat = cv2.getAffineTransform(np.float32(t1_rect), np.float32(t2_rect))
-        if mat is None:
-            return
-            
-        warped = cv2.warpAffine(img1_rect, mat, (w2, h2),
-                                flags=cv2.INTER_LINEAR,
-                                borderMode=cv2.BORDER_REFLECT_101)
 
-        mask = np.zeros((h2, w2, 3), dtype=np.float32)
-        cv2.fillConvexPoly(mask, np.int32(t2_rect), (1.0, 1.0, 1.0), 16, 0)
+def _canonical_shape_points() -> np.ndarray:
+    """
+    FACE_SHAPE_CTRL_IDX 순서의 정면 기준 얼굴 좌표 (고정 값, 1000x1000 프레임)
+    - 외곽: 이마(10) 에서 시작해 시계 방향으로 타원 위에 배치
+    - 눈: 눈꼬리(33 / 362) + 아래 눈꺼풀 3점, 중앙 anchor: 미간 → 콧대 → 코끝 → 턱
+    """
+    cx, cy, b = 500.0, 500.0, 300.0
+    a = b * 0.78
+    pos = {}
+    for pid, t in zip(FACE_OVAL_IDX, np.deg2rad(np.linspace(-90.0, 270.0, len(FACE_OVAL_IDX), endpoint=False))):
+        pos[pid] = (cx + a * np.cos(t), cy + b * np.sin(t))
+    ey = cy - 0.15 * b
+    for idx, ex in ((LEFT_EYE_IDX, cx - 0.4 * a), (RIGHT_EYE_IDX, cx + 0.4 * a)):
+        for pid, deg in zip(idx[:4], (180.0, 157.5, 135.0, 112.5)):
+            t = np.deg2rad(deg)
+            pos[pid] = (ex + 0.18 * a * np.cos(t), ey + 0.07 * b * np.sin(t))
+    for pid, dy in ((9, -0.3), (168, -0.1), (5, 0.1), (1, 0.15), (199, 0.8)):
+        pos[pid] = (cx, cy + dy * b)
+    return np.array([pos[pid] for pid in FACE_SHAPE_CTRL_IDX], dtype=np.float32)
+
+
+# FACE_SHAPE_CTRL_IDX 의 삼각형 테이블: FaceMesh 토폴로지가 고정이므로 기준 좌표에서 import 시 한 번 계산
+# (처음 처리한 얼굴에 따라 테이블이 달라지지 않도록 입력과 무관한 고정 좌표 사용)
+_SHAPE_CTRL_CANONICAL = _canonical_shape_points()
+_SHAPE_TRIANGLES = _delaunay_triangles(_points_rect(_SHAPE_CTRL_CANONICAL), _SHAPE_CTRL_CANONICAL)
+
+
+def shape_triangles(ctrl_pts: np.ndarray) -> np.ndarray:
+    """
+    컨트롤 포인트(landmarks[FACE_SHAPE_CTRL_IDX]) 의 삼각형 인덱스 테이블
+    - 기본은 기준 좌표에서 만든 고정 테이블
+    - 이 얼굴에서 뒤집힌 삼각형이 있으면(고개를 많이 돌린 경우 등) 이 얼굴 좌표로만 다시 계산
+    """
+    if np.any(_signed_areas(ctrl_pts, _SHAPE_TRIANGLES) < 0):
+        logger.debug("[shape_triangles] flipped triangle on this face → recompute")
+        return _delaunay_triangles(_points_rect(ctrl_pts), ctrl_pts)
+    return _SHAPE_TRIANGLES
 
-        out_roi = out[y2:y2+h2, x2:x2+w2].astype(np.float32)
-        warped_f = warped.astype(np.float32)
 
-        blended = out_roi * (1.0 - mask) + warped_f * mask
-        out[y2:y2+h2, x2:x2+w2] = np.clip(blended, 0, 255).astype(np.uint8)
-    except Exception as e:
-        # 개별 삼각형 warp 실패는 무시 (다른 삼각형은 계속 처리)
-        pass
+def has_fold(src_pts: np.ndarray, dst_pts: np.ndarray) -> bool:
+    """변형 전후 컨트롤 포인트 메시에서 방향이 뒤집힌 삼각형이 있는지 (warp 가 접힘)"""
+    src_ctrl = src_pts[FACE_SHAPE_CTRL_IDX]
+    tris = shape_triangles(src_ctrl)
+    if len(tris) == 0:
+        return False
+    return bool(np.any(_signed_areas(dst_pts[FACE_SHAPE_CTRL_IDX], tris) < 0))
 
 def validate_landmarks(landmarks) -> bool:
     """
@@ -367,7 +702,7 @@ def validate_landmarks(landmarks) -> bool:
     이상한 랜드마크가 있으면 False 반환 (TPS 실행 금지)
     """
     if landmarks is None or len(landmarks) < 468:
-        print("[validate_landmarks] 랜드마크 개수 부족")
+        logger.debug("[validate_landmarks] 랜드마크 개수 부족")
         return False
     
     try:
@@ -376,7 +711,7 @@ def validate_landmarks(landmarks) -> bool:
             chin_y = landmarks[152][1]
             mouth_y = landmarks[13][1]
             if chin_y > mouth_y + 80:
-                print(f"[validate_landmarks] 턱끝이 입보다 너무 아래 (차이: {chin_y - mouth_y:.1f}px)")
+                logger.debug(f"[validate_landmarks] 턱끝이 입보다 너무 아래 (차이: {chin_y - mouth_y:.1f}px)")
                 return False
         
         # 2) 왼쪽/오른쪽 광대의 x 좌표가 뒤집힘
@@ -392,7 +727,7 @@ def validate_landmarks(landmarks) -> bool:
             left_x_avg = np.mean([landmarks[p][0] for p in valid_left])
             right_x_avg = np.mean([landmarks[p][0] for p in valid_right])
             if left_x_avg > right_x_avg:
-                print(f"[validate_landmarks] 광대 좌표 뒤집힘 (왼쪽: {left_x_avg:.1f} > 오른쪽: {right_x_avg:.1f})")
+                logger.debug(f"[validate_landmarks] 광대 좌표 뒤집힘 (왼쪽: {left_x_avg:.1f} > 오른쪽: {right_x_avg:.1f})")
                 return False
         
         # 3) 턱선 평균 y가 얼굴 전체 y 범위에서 너무 벗어나면 → 오류
@@ -404,7 +739,7 @@ def validate_landmarks(landmarks) -> bool:
             face_y_range = face_y_max - face_y_min
             
             if jaw_y_mean < face_y_min - face_y_range * 0.2 or jaw_y_mean > face_y_max + face_y_range * 0.2:
-                print(f"[validate_landmarks] 턱선 y가 얼굴 범위를 벗어남 (턱: {jaw_y_mean:.1f}, 얼굴: {face_y_min:.1f}~{face_y_max:.1f})")
+                logger.debug(f"[validate_landmarks] 턱선 y가 얼굴 범위를 벗어남 (턱: {jaw_y_mean:.1f}, 얼굴: {face_y_min:.1f}~{face_y_max:.1f})")
                 return False
         
         # 4) 입꼬리(61, 291)가 입 중앙(13)보다 더 아래 위치 → 오류
@@ -413,13 +748,13 @@ def validate_landmarks(landmarks) -> bool:
             mouth_left_y = landmarks[61][1]
             mouth_right_y = landmarks[291][1]
             if mouth_left_y > mouth_center_y + 15 or mouth_right_y > mouth_center_y + 15:
-                print(f"[validate_landmarks] 입꼬리가 입 중앙보다 아래 (중앙: {mouth_center_y:.1f}, 좌: {mouth_left_y:.1f}, 우: {mouth_right_y:.1f})")
+                logger.debug(f"[validate_landmarks] 입꼬리가 입 중앙보다 아래 (중앙: {mouth_center_y:.1f}, 좌: {mouth_left_y:.1f}, 우: {mouth_right_y:.1f})")
                 return False
         
         return True
         
     except Exception as e:
-        print(f"[validate_landmarks] 검증 중 오류: {e}")
+        logger.warning(f"[validate_landmarks] 검증 중 오류: {e}")
         return False
 
 def stabilize_landmarks(landmarks):
@@ -494,28 +829,130 @@ def stabilize_oval(landmarks, thr=15):
                 lm[p][1] = med
                 corrected += 1
         if corrected > 0:
-            print(f"[stabilize_oval] {corrected}개 oval 포인트 보정 (중앙값: {med:.1f}, thr={thr})")
+            logger.debug(f"[stabilize_oval] {corrected}개 oval 포인트 보정 (중앙값: {med:.1f}, thr={thr})")
         return lm
     except Exception as e:
-        print(f"[stabilize_oval] Error: {e}, returning original landmarks")
+        logger.warning(f"[stabilize_oval] Error: {e}, returning original landmarks")
         return landmarks
 
 
+# ---- 스무딩 엔진 (품질 tier 별) ----
+# quality : 원본 해상도 bilateral (기존 방식, 얼굴 크기의 제곱에 비례해 느려짐)
+# balanced: fast guided filter (box filter 기반, 계수만 축소 해상도에서 계산)
+# fast    : 축소 해상도 bilateral → 필터가 만든 변화량만 업샘플해서 원본에 더함 (경계/디테일 유지)
+
+def _work_scale(shape, work_edge: int) -> float:
+    """ROI 긴 변을 work_edge 이하로 줄이는 배율 (>= 1)"""
+    long_edge = max(shape[0], shape[1])
+    return max(1.0, long_edge / float(work_edge))
+
+
+def _smooth_bilateral(roi: BGRImage, d: int, sigma_color: float, sigma_space: float) -> BGRImage:
+    return cv2.bilateralFilter(roi, d, sigma_color, sigma_space)
+
+
+def _box(x: np.ndarray, r: int) -> np.ndarray:
+    return cv2.boxFilter(x, -1, (2 * r + 1, 2 * r + 1), normalize=True, borderType=cv2.BORDER_REFLECT)
+
+
+def _smooth_guided(roi: BGRImage, d: int, sigma_color: float, sigma_space: float) -> BGRImage:
+    """
+    self-guided fast guided filter (He et al.), 채널별
+    - 반경은 bilateral 의 d 에 맞추고, eps 는 sigma_color 로부터 환산
+    - a, b 계수는 축소 해상도에서 계산 후 업샘플 → 얼굴 크기와 거의 무관한 시간
+    """
+    rh, rw = roi.shape[:2]
+    s = _work_scale(roi.shape, SKIN_SMOOTH_WORK_EDGE)
+    I = roi.astype(np.float32) * (1.0 / 255.0)
+    I_small = I if s == 1.0 else cv2.resize(I, (max(1, int(rw / s)), max(1, int(rh / s))), interpolation=cv2.INTER_AREA)
+
+    r = max(1, int(round((d // 2) / s)))
+    eps = (sigma_color / 255.0) ** 2 * 0.25
+
+    mean_I = _box(I_small, r)
+    var_I = _box(I_small * I_small, r) - mean_I * mean_I
+    a = var_I / (var_I + eps)
+    b = mean_I - a * mean_I
+    mean_a = _box(a, r)
+    mean_b = _box(b, r)
+
+    if s != 1.0:
+        mean_a = cv2.resize(mean_a, (rw, rh), interpolation=cv2.INTER_LINEAR)
+        mean_b = cv2.resize(mean_b, (rw, rh), interpolation=cv2.INTER_LINEAR)
+
+    q = mean_a * I + mean_b
+    return np.clip(q * 255.0, 0, 255).astype(np.uint8)
+
+
+def _smooth_downsampled_bilateral(roi: BGRImage, d: int, sigma_color: float, sigma_space: float) -> BGRImage:
+    """
+    축소 해상도에서 bilateral → (필터 결과 - 축소본) 변화량만 업샘플해서 원본에 더함
+    - 업/다운 샘플로 생기는 흐림은 결과에 섞이지 않으므로 원본 디테일/경계 유지
+    """
+    rh, rw = roi.shape[:2]
+    s = _work_scale(roi.shape, SKIN_SMOOTH_WORK_EDGE)
+    if s == 1.0:
+        return _smooth_bilateral(roi, d, sigma_color, sigma_space)
+
+    small = cv2.resize(roi, (max(1, int(rw / s)), max(1, int(rh / s))), interpolation=cv2.INTER_AREA)
+    d_small = max(3, int(round(d / s))) | 1
+    filtered = cv2.bilateralFilter(small, d_small, sigma_color, sigma_space / s)
+    delta = filtered.astype(np.float32) - small.astype(np.float32)
+    delta = cv2.resize(delta, (rw, rh), interpolation=cv2.INTER_LINEAR)
+    return np.clip(roi.astype(np.float32) + delta, 0, 255).astype(np.uint8)
+
+
+SMOOTHING_ENGINES = {
+    "quality": _smooth_bilateral,
+    "balanced": _smooth_guided,
+    "fast": _smooth_downsampled_bilateral,
+}
+
+
+@metrics.timed("smooth_skin")
+def _skin_mask_kernels(frame_edge: int):
+    """smooth_skin 마스크 블러 (sigma, ksize) - 눈, 입, 최종 순서 (원본 프레임 긴 변 기준)"""
+    kernels = []
+    for ratio in (0.02, 0.015, 0.01):
+        sigma = frame_edge * ratio
+        kernels.append((sigma, max(3, int(sigma * 6) | 1)))
+    return kernels
+
+
+def _skin_window_margin(frame_edge: int) -> int:
+    """smooth_skin 작업 창이 얼굴 ROI 밖으로 넓어지는 폭 (블러 반경 합)"""
+    eye, mouth, final = _skin_mask_kernels(frame_edge)
+    return final[1] // 2 + max(eye[1], mouth[1]) // 2
+
+
 def smooth_skin(
-    img: np.ndarray,
+    img: BGRImage,
     landmarks: np.ndarray,
     strength: float = 0.5,
     d: int = 9,
     sigma_color: float = 75.0,
     sigma_space: float = 75.0,
-) -> np.ndarray:
+    tier: str = None,
+    inplace: bool = False,
+    frame_edge: int = None,
+) -> BGRImage:
     """
-    얼굴 영역만 선택적으로 피부 보정 (Bilateral 필터 사용)
+    얼굴 영역만 선택적으로 피부 보정
+    - tier: "quality"(bilateral) / "balanced"(guided) / "fast"(축소 bilateral), 생략 시 SKIN_SMOOTH_TIER
+    - 눈/입 제외 마스크는 tier 와 무관하게 동일
+    - 마스크/블렌딩은 워커별 작업 버퍼에서 계산, inplace=True 이면 img 의 얼굴 ROI 만 제자리 수정
+    - frame_edge: 마스크 블러 크기 기준 길이 (생략 시 img 긴 변)
+      단체 사진의 얼굴 crop 에서는 원본 프레임 긴 변을 넘겨서 얼굴 수와 무관하게 같은 결과
     """
+    tier = tier or SKIN_SMOOTH_TIER
+    engine = SMOOTHING_ENGINES.get(tier)
+    if engine is None:
+        logger.warning(f"[smooth_skin] Unknown tier '{tier}', using 'quality'")
+        engine = _smooth_bilateral
     h, w, _ = img.shape
 
     if landmarks is None or len(landmarks) < len(FACE_OVAL_IDX):
-        print("[smooth_skin] Invalid landmarks, skipping skin smoothing")
+        logger.debug("[smooth_skin] Invalid landmarks, skipping skin smoothing")
         return img
 
     # 1) FACE_OVAL 안정화 (잘못된 landmark로 인한 목까지 확장 방지)
@@ -524,18 +961,41 @@ def smooth_skin(
     try:
         oval = landmarks[FACE_OVAL_IDX].astype(np.int32)
     except (IndexError, ValueError) as e:
-        print(f"[smooth_skin] Error extracting face oval: {e}, skipping skin smoothing")
+        logger.warning(f"[smooth_skin] Error extracting face oval: {e}, skipping skin smoothing")
         return img
 
-    mask_face = np.zeros((h, w), dtype=np.float32)
-    cv2.fillConvexPoly(mask_face, oval, 1.0)
+    ox, oy, ofw, ofh = cv2.boundingRect(oval)
+    pad = int(max(ofw, ofh) * 0.1)
+    x1 = max(0, ox - pad)
+    y1 = max(0, oy - pad)
+    x2 = min(w, ox + ofw + pad)
+    y2 = min(h, oy + ofh + pad)
+
+    frame_edge = frame_edge or max(w, h)
+    (sigma_eye, ksize_eye), (sigma_mouth, ksize_mouth), (sigma_final, ksize_final) = _skin_mask_kernels(frame_edge)
+
+    # 마스크는 전체 프레임 대신 작업 창(얼굴 ROI + 블러 반경)에서만 계산
+    # 창 밖은 얼굴 마스크가 0 이므로 ROI 안의 최종 마스크는 전체 프레임 계산과 같음
+    margin = _skin_window_margin(frame_edge)
+    wx1, wy1 = max(0, x1 - margin), max(0, y1 - margin)
+    wx2, wy2 = min(w, x2 + margin), min(h, y2 + margin)
+    win = (wy2 - wy1, wx2 - wx1)
+    shift = np.array([wx1, wy1], dtype=np.int32)
+
+    # 작업 버퍼 3장을 돌려 씀 (a: 래스터/임시, b: 얼굴 마스크 누적, c: 블러 결과)
+    scratch = get_scratch()
+    buf_a = scratch.get("skin_a", win, np.float32, zero=True)
+    buf_b = scratch.get("skin_b", win, np.float32)
+    buf_c = scratch.get("skin_c", win, np.float32)
+
+    cv2.fillConvexPoly(buf_a, oval - shift, 1.0)
 
     # 2) 피부보정 마스크에서 턱 아래쪽(목 부분) 제거
     chin = int(np.max(oval[:, 1]))
-    mask_face[chin+5:, :] = 0  # 턱 아래 5px부터 제거
-    
+    buf_a[max(0, chin + 5 - wy1):, :] = 0  # 턱 아래 5px부터 제거
+
     # 추가로 erode를 활용해 턱 아래쪽을 더 축소
-    mask_face = cv2.erode(mask_face, np.ones((25, 25), np.uint8), iterations=1)
+    mask_face = cv2.erode(buf_a, np.ones((25, 25), np.uint8), dst=buf_b, iterations=1)
 
     # 4) 보조 얼굴 polygon 마스크 (안정 포인트 기반)
     try:
@@ -543,299 +1003,690 @@ def smooth_skin(
         valid_points = [p for p in stable_face_points if p < len(landmarks)]
         if len(valid_points) >= 3:
             stable_pts = landmarks[valid_points].astype(np.int32)
-            mask_stable = np.zeros((h, w), dtype=np.float32)
-            cv2.fillConvexPoly(mask_stable, stable_pts, 1.0)
+            buf_a.fill(0)
+            cv2.fillConvexPoly(buf_a, stable_pts - shift, 1.0)
             # 기존 마스크와 결합 (둘 다 있어야 적용)
-            mask_face = mask_face * mask_stable
-            print(f"[smooth_skin] 보조 얼굴 polygon 마스크 적용: {len(valid_points)}개 포인트")
+            mask_face *= buf_a
+            logger.debug(f"[smooth_skin] 보조 얼굴 polygon 마스크 적용: {len(valid_points)}개 포인트")
     except Exception as e:
-        print(f"[smooth_skin] 보조 마스크 생성 실패: {e}, 기본 마스크만 사용")
+        logger.warning(f"[smooth_skin] 보조 마스크 생성 실패: {e}, 기본 마스크만 사용")
 
     if mask_face.sum() < 100:
-        print("[smooth_skin] Face mask too small, skipping skin smoothing")
+        logger.debug("[smooth_skin] Face mask too small, skipping skin smoothing")
         return img
 
-    left_eye_pts = landmarks[LEFT_EYE_IDX].astype(np.int32)
-    left_eye_rect = cv2.boundingRect(left_eye_pts)
-    eye_pad = int(max(left_eye_rect[2], left_eye_rect[3]) * 0.5)
-    left_eye_x1 = max(0, left_eye_rect[0] - eye_pad)
-    left_eye_y1 = max(0, left_eye_rect[1] - eye_pad)
-    left_eye_x2 = min(w, left_eye_rect[0] + left_eye_rect[2] + eye_pad)
-    left_eye_y2 = min(h, left_eye_rect[1] + left_eye_rect[3] + eye_pad)
-
-    right_eye_pts = landmarks[RIGHT_EYE_IDX].astype(np.int32)
-    right_eye_rect = cv2.boundingRect(right_eye_pts)
-    eye_pad = int(max(right_eye_rect[2], right_eye_rect[3]) * 0.5)
-    right_eye_x1 = max(0, right_eye_rect[0] - eye_pad)
-    right_eye_y1 = max(0, right_eye_rect[1] - eye_pad)
-    right_eye_x2 = min(w, right_eye_rect[0] + right_eye_rect[2] + eye_pad)
-    right_eye_y2 = min(h, right_eye_rect[1] + right_eye_rect[3] + eye_pad)
-
-    eye_mask = np.zeros((h, w), dtype=np.float32)
-    cv2.rectangle(eye_mask, (left_eye_x1, left_eye_y1), (left_eye_x2, left_eye_y2), 1.0, -1)
-    cv2.rectangle(eye_mask, (right_eye_x1, right_eye_y1), (right_eye_x2, right_eye_y2), 1.0, -1)
-    sigma_eye = max(w, h) * 0.02
-    ksize_eye = int(sigma_eye * 6) | 1
-    if ksize_eye < 3:
-        ksize_eye = 3
-    eye_mask = cv2.GaussianBlur(eye_mask, (ksize_eye, ksize_eye), sigma_eye)
+    buf_a.fill(0)
+    for eye_idx in (LEFT_EYE_IDX, RIGHT_EYE_IDX):
+        ex, ey, ew, eh = cv2.boundingRect(landmarks[eye_idx].astype(np.int32))
+        eye_pad = int(max(ew, eh) * 0.5)
+        ex1, ey1 = max(0, ex - eye_pad), max(0, ey - eye_pad)
+        ex2, ey2 = min(w, ex + ew + eye_pad), min(h, ey + eh + eye_pad)
+        cv2.rectangle(buf_a, (ex1 - wx1, ey1 - wy1), (ex2 - wx1, ey2 - wy1), 1.0, -1)
+    eye_mask = cv2.GaussianBlur(buf_a, (ksize_eye, ksize_eye), sigma_eye, dst=buf_c)
+    # final = face * (1 - eye * 0.7) * (1 - mouth * 0.5)
+    eye_mask *= -0.7
+    eye_mask += 1.0
+    mask_face *= eye_mask
 
     chin_y = int(oval[:, 1].max())
     mouth_y_start = int(chin_y - (chin_y - oval[:, 1].min()) * 0.3)
-    mouth_mask = np.zeros((h, w), dtype=np.float32)
-    mouth_mask[mouth_y_start:chin_y, :] = 1.0
-    sigma_mouth = max(w, h) * 0.015
-    ksize_mouth = int(sigma_mouth * 6) | 1
-    if ksize_mouth < 3:
-        ksize_mouth = 3
-    mouth_mask = cv2.GaussianBlur(mouth_mask, (ksize_mouth, ksize_mouth), sigma_mouth)
-
-    final_mask = mask_face.copy()
-    final_mask = final_mask * (1.0 - eye_mask * 0.7)
-    final_mask = final_mask * (1.0 - mouth_mask * 0.5)
-    sigma_final = max(w, h) * 0.01
-    ksize_final = int(sigma_final * 6) | 1
-    if ksize_final < 3:
-        ksize_final = 3
-    final_mask = cv2.GaussianBlur(final_mask, (ksize_final, ksize_final), sigma_final)
-    final_mask = np.clip(final_mask, 0.0, 1.0)
+    buf_a.fill(0)
+    buf_a[max(0, mouth_y_start - wy1):max(0, chin_y - wy1), :] = 1.0
+    mouth_mask = cv2.GaussianBlur(buf_a, (ksize_mouth, ksize_mouth), sigma_mouth, dst=buf_c)
+    mouth_mask *= -0.5
+    mouth_mask += 1.0
+    mask_face *= mouth_mask
+
+    final_mask = cv2.GaussianBlur(mask_face, (ksize_final, ksize_final), sigma_final, dst=buf_a)
+    np.clip(final_mask, 0.0, 1.0, out=final_mask)
 
     mask_max = final_mask.max()
-    mask_mean = final_mask.mean()
-    mask_area = (final_mask > 0.1).sum()
-    print(f"[smooth_skin] mask stats: max={mask_max:.3f}, mean={mask_mean:.3f}, area={mask_area} pixels")
+    if diagnostics.enabled():
+        mask_mean = final_mask.mean()
+        mask_area = (final_mask > 0.1).sum()
+        logger.debug(f"[smooth_skin] mask stats: max={mask_max:.3f}, mean={mask_mean:.3f}, area={mask_area} pixels")
 
     if mask_max < 0.01:
-        print("[smooth_skin] Warning: mask is too small, skipping skin smoothing")
+        logger.warning("[smooth_skin] Warning: mask is too small, skipping skin smoothing")
         return img
 
-    ox, oy, ofw, ofh = cv2.boundingRect(oval)
-    pad = int(max(ofw, ofh) * 0.1)
-    x1 = max(0, ox - pad)
-    y1 = max(0, oy - pad)
-    x2 = min(w, ox + ofw + pad)
-    y2 = min(h, oy + ofh + pad)
-
-    face_roi = img[y1:y2, x1:x2].copy()
-    final_mask_roi = final_mask[y1:y2, x1:x2].copy()
+    out = img if inplace else img.copy()
+    face_roi = out[y1:y2, x1:x2]
+    final_mask_roi = final_mask[y1 - wy1:y2 - wy1, x1 - wx1:x2 - wx1]
+    before = face_roi.copy() if diagnostics.enabled() else None
 
     try:
-        face_roi_bgr = cv2.cvtColor(face_roi, cv2.COLOR_RGB2BGR)
-        smoothed_roi_bgr = cv2.bilateralFilter(face_roi_bgr, d, sigma_color, sigma_space)
-        smoothed_roi = cv2.cvtColor(smoothed_roi_bgr, cv2.COLOR_BGR2RGB)
+        # 필터는 채널 순서와 무관하므로 색공간 변환 없이 바로 적용
+        smoothed_roi = engine(face_roi, d, sigma_color, sigma_space)
     except Exception as e:
-        print(f"[smooth_skin] Bilateral filter error: {e}, using Gaussian blur instead")
+        logger.warning(f"[smooth_skin] Smoothing filter error ({tier}): {e}, using Gaussian blur instead")
         sigma_blur = max(ofw, ofh) * 0.03
         ksize_blur = int(sigma_blur * 6) | 1
         if ksize_blur < 3:
             ksize_blur = 3
         smoothed_roi = cv2.GaussianBlur(face_roi, (ksize_blur, ksize_blur), sigma_blur)
 
-    face_roi_f = face_roi.astype(np.float32)
-    smoothed_roi_f = smoothed_roi.astype(np.float32)
-    mask3_roi = final_mask_roi[..., None]
-
-    blended_roi = face_roi_f * (1.0 - mask3_roi * strength) + smoothed_roi_f * (mask3_roi * strength)
-    blended_roi = np.clip(blended_roi, 0, 255).astype(np.uint8)
+    # face * (1 - m·s) + smoothed * m·s = face + (smoothed - face) * m·s → ROI 제자리 기록
+    blend = scratch.get("skin_blend", face_roi.shape, np.float32)
+    np.copyto(blend, smoothed_roi)
+    blend -= face_roi
+    blend *= (final_mask_roi * np.float32(strength))[..., None]
+    blend += face_roi
+    np.clip(blend, 0, 255, out=blend)
+    np.copyto(face_roi, blend, casting="unsafe")
 
-    blended = img.copy()
-    blended[y1:y2, x1:x2] = blended_roi
+    if before is not None:
+        diff_roi = np.abs(face_roi.astype(np.int32) - before.astype(np.int32))
+        diff_skin = diff_roi.sum() / float(img.size)
+        diff_max = diff_roi.max()
+        logger.debug(f"[smooth_skin] strength:{strength:.2f}, mask max:{mask_max:.3f}, mean diff:{diff_skin:.2f}, max diff:{diff_max:.2f}")
 
-    diff_skin = np.mean(np.abs(blended.astype(np.int32) - img.astype(np.int32)))
-    diff_max = np.max(np.abs(blended.astype(np.int32) - img.astype(np.int32)))
-    print(f"[smooth_skin] strength:{strength:.2f}, mask max:{mask_max:.3f}, mean diff:{diff_skin:.2f}, max diff:{diff_max:.2f}")
+        if diff_skin < 0.5:
+            logger.debug(f"[smooth_skin] Warning: skin smoothing effect is very small (diff={diff_skin:.2f})")
 
-    if diff_skin < 0.5:
-        print(f"[smooth_skin] Warning: skin smoothing effect is very small (diff={diff_skin:.2f})")
-
-    return blended
+    return out
 
 
 # =========================
 # 6. 화장 레이어 (블러셔, 립 컬러, 하이라이트)
 # =========================
 
-def apply_lip_color(img, landmarks, color_rgb, alpha=1.0):
+# 각 레이어의 마스크는 (mask_roi, rect) 로 만들고, 합성은 composite_layers 에서 한 번에 처리
+
+def lip_mask_roi(h, w, landmarks):
+    """립 마스크 (outer - inner 방식)"""
+    outer = landmarks[OUTER_LIP]
+    inner = landmarks[INNER_LIP]
+
+    mask_outer, rect_outer = make_soft_mask_roi(h, w, outer, feather=25)
+    mask_inner, rect_inner = make_soft_mask_roi(h, w, inner, feather=15)
+    if mask_outer is None:
+        return None, (0, 0, 0, 0)
+
+    # inner 는 outer ROI 좌표계로 옮겨서 빼기
+    rect = _union_rect([rect_outer, rect_inner])
+    lip_mask = _expand_mask(mask_outer, rect_outer, rect)
+    lip_mask -= _expand_mask(mask_inner, rect_inner, rect)
+    return np.clip(lip_mask, 0, 1), rect
+
+
+def blush_mask_roi(h, w, landmarks):
+    """블러셔 마스크 (광대 중심 타원, 볼 아래쪽 위치)"""
+    # 볼 중심 포인트 (안정적 광대 인덱스 사용)
+    Lc = landmarks[116].copy()
+    Rc = landmarks[345].copy()
+
+    # 얼굴 폭 기반 반지름 및 아래로 이동 거리 계산
+    left_pt = landmarks[234]
+    right_pt = landmarks[454]
+    face_width = np.linalg.norm(right_pt - left_pt)
+    rx = face_width * 0.12  # 더 작게 조정 (18% -> 12%)
+    ry = face_width * 0.10  # 더 작게 조정 (14% -> 10%)
+
+    # 볼 위치를 아래로 이동 (얼굴 높이의 8% 정도)
+    face_height = np.max(landmarks[FACE_OVAL_IDX][:, 1]) - np.min(landmarks[FACE_OVAL_IDX][:, 1])
+    offset_y = face_height * 0.08
+
+    Lc[1] += offset_y  # Y 좌표를 아래로 이동
+    Rc[1] += offset_y
+
+    masks = [
+        make_soft_ellipse_roi(h, w, c, (rx, ry), 35)  # 경계 완전 제거
+        for c in [Lc, Rc]
+    ]
+    return max_masks_roi(masks)
+
+
+def highlight_mask_roi(h, w, landmarks):
+    """하이라이트 마스크 (광대상단/코옆/콧대)"""
+    # 콧대(얇은 폴리곤)
+    nose_pts = landmarks[[168, 6, 197, 195]]
+    masks = [make_soft_mask_roi(h, w, nose_pts, feather=20)]
+
+    # 코옆(팔자 옆) 좌우 작은 타원
+    for pid in [49, 279]:
+        masks.append(make_soft_ellipse_roi(h, w, landmarks[pid], (18, 10), 20))
+
+    # 광대 상단 좌우 타원
+    for pid in [117, 346]:
+        masks.append(make_soft_ellipse_roi(h, w, landmarks[pid], (22, 14), 25))
+
+    return max_masks_roi(masks)
+
+
+@metrics.timed("makeup_composite")
+def composite_layers(img, layers, inplace=False):
     """
-    립 컬러 적용 (outer - inner 방식)
+    화장 레이어 일괄 합성
+    - layers: [(mask_roi, rect, color, alpha), ...] (적용 순서대로, color 는 img 와 같은 채널 순서)
+    - 모든 레이어 ROI 의 합집합만 float32 로 한 번 변환 → 순서대로 in-place 누적 → uint8 한 번 기록
+    - 순차 alpha_blend_color 결과와 레이어 사이 반올림 차이(레이어당 최대 1) 이내로 일치
     """
+    out = img if inplace else img.copy()
+    layers = [layer for layer in layers if layer[0] is not None]
+    rect = _union_rect([layer[1] for layer in layers])
+    ux1, uy1, ux2, uy2 = rect
+    if ux2 <= ux1 or uy2 <= uy1:
+        return out
+
+    roi = out[uy1:uy2, ux1:ux2]
+    acc = get_scratch().get("makeup_acc", roi.shape, np.float32)
+    np.copyto(acc, roi)
+    for mask, (x1, y1, x2, y2), color, alpha in layers:
+        sub = acc[y1 - uy1:y2 - uy1, x1 - ux1:x2 - ux1]
+        m = mask * np.float32(alpha)
+        m = m[..., None]
+        color = np.array(color, dtype=np.float32)
+        # sub = sub * (1 - m) + color * m  (in-place)
+        sub -= color
+        sub *= (1.0 - m)
+        sub += color
+
+    np.clip(acc, 0, 255, out=acc)
+    np.copyto(roi, acc, casting="unsafe")
+    return out
+
+
+def _make_layer(mask_fn, name, img, landmarks, color, alpha):
     h, w = img.shape[:2]
-    
     try:
-        outer = landmarks[OUTER_LIP]
-        inner = landmarks[INNER_LIP]
-        
-        mask_outer = make_soft_mask(h, w, outer, feather=25)
-        mask_inner = make_soft_mask(h, w, inner, feather=15)
-        
-        lip_mask = np.clip(mask_outer - mask_inner, 0, 1)
-        return alpha_blend_color(img, lip_mask, color_rgb, alpha=alpha)
+        with metrics.span(name):
+            mask, rect = mask_fn(h, w, landmarks)
+        return (mask, rect, color, alpha)
     except Exception as e:
-        print(f"[apply_lip_color] Error: {e}, returning original")
-        return img
+        logger.warning(f"[{name}] Error: {e}, skipping layer")
+        return (None, (0, 0, 0, 0), color, alpha)
+
+
+def apply_makeup(img, landmarks, inplace=False, blush_alpha=0.35, lip_alpha=0.45, highlight_alpha=0.30):
+    """블러셔 → 립 컬러 → 하이라이트를 한 번에 합성 (alpha 0 인 레이어는 마스크도 만들지 않음)"""
+    layers = [
+        (blush_mask_roi, "apply_blush", BLUSH_BGR, blush_alpha),  # 자연스러운 블러셔 (0.35)
+        (lip_mask_roi, "apply_lip_color", BLUSH_BGR, lip_alpha),  # 자연스러운 립 컬러 (0.45)
+        (highlight_mask_roi, "apply_highlight", HIGHLIGHT_BGR, highlight_alpha),  # 자연스러운 하이라이트 (0.30)
+    ]
+    layers = [_make_layer(fn, name, img, landmarks, color, alpha) for fn, name, color, alpha in layers if alpha > 0]
+    return composite_layers(img, layers, inplace=inplace)
+
+
+def apply_lip_color(img, landmarks, color_rgb, alpha=1.0):
+    """
+    립 컬러 적용 (outer - inner 방식)
+    """
+    return composite_layers(img, [_make_layer(lip_mask_roi, "apply_lip_color", img, landmarks, rgb_to_bgr(color_rgb), alpha)])
 
 
 def apply_blush(img, landmarks, color_rgb, alpha=1.0):
     """
     블러셔 적용 (광대 중심 타원, 볼 아래쪽 위치)
     """
-    h, w = img.shape[:2]
-    
-    try:
-        # 볼 중심 포인트 (안정적 광대 인덱스 사용)
-        Lc = landmarks[116].copy()
-        Rc = landmarks[345].copy()
-        
-        # 얼굴 폭 기반 반지름 및 아래로 이동 거리 계산
-        left_pt = landmarks[234]
-        right_pt = landmarks[454]
-        face_width = np.linalg.norm(right_pt - left_pt)
-        rx = face_width * 0.12  # 더 작게 조정 (18% -> 12%)
-        ry = face_width * 0.10  # 더 작게 조정 (14% -> 10%)
-        
-        # 볼 위치를 아래로 이동 (얼굴 높이의 8% 정도)
-        face_height = np.max(landmarks[FACE_OVAL_IDX][:, 1]) - np.min(landmarks[FACE_OVAL_IDX][:, 1])
-        offset_y = face_height * 0.08
-        
-        Lc[1] += offset_y  # Y 좌표를 아래로 이동
-        Rc[1] += offset_y
-        
-        blush_mask = np.zeros((h, w), dtype=np.float32)
-        
-        for c in [Lc, Rc]:
-            center = (int(c[0]), int(c[1]))
-            axes = (int(rx), int(ry))
-            tmp = np.zeros((h, w), dtype=np.float32)
-            cv2.ellipse(tmp, center, axes, 0, 0, 360, 1.0, -1)
-            tmp = cv2.GaussianBlur(tmp, (0, 0), 35)  # 경계 완전 제거
-            blush_mask = np.maximum(blush_mask, tmp)
-        
-        blush_mask = np.clip(blush_mask, 0, 1)
-        return alpha_blend_color(img, blush_mask, color_rgb, alpha=alpha)
-    except Exception as e:
-        print(f"[apply_blush] Error: {e}, returning original")
-        return img
+    return composite_layers(img, [_make_layer(blush_mask_roi, "apply_blush", img, landmarks, rgb_to_bgr(color_rgb), alpha)])
 
 
 def apply_highlight(img, landmarks, color_rgb, alpha=1.0):
     """
     하이라이트 적용 (광대상단/코옆/콧대)
     """
-    h, w = img.shape[:2]
-    mask = np.zeros((h, w), dtype=np.float32)
-    
-    try:
-        # 콧대(얇은 폴리곤)
-        nose_pts = landmarks[[168, 6, 197, 195]]
-        mask = np.maximum(mask, make_soft_mask(h, w, nose_pts, feather=20))
-        
-        # 코옆(팔자 옆) 좌우 작은 타원
-        for pid in [49, 279]:
-            c = landmarks[pid]
-            tmp = np.zeros((h, w), dtype=np.float32)
-            cv2.ellipse(tmp, (int(c[0]), int(c[1])), (18, 10), 0, 0, 360, 1.0, -1)
-            tmp = cv2.GaussianBlur(tmp, (0, 0), 20)
-            mask = np.maximum(mask, tmp)
-        
-        # 광대 상단 좌우 타원
-        for pid in [117, 346]:
-            c = landmarks[pid]
-            tmp = np.zeros((h, w), dtype=np.float32)
-            cv2.ellipse(tmp, (int(c[0]), int(c[1])), (22, 14), 0, 0, 360, 1.0, -1)
-            tmp = cv2.GaussianBlur(tmp, (0, 0), 25)
-            mask = np.maximum(mask, tmp)
-        
-        mask = np.clip(mask, 0, 1)
-        return alpha_blend_color(img, mask, color_rgb, alpha=alpha)
-    except Exception as e:
-        print(f"[apply_highlight] Error: {e}, returning original")
-        return img
+    return composite_layers(img, [_make_layer(highlight_mask_roi, "apply_highlight", img, landmarks, rgb_to_bgr(color_rgb), alpha)])
 
 
 # =========================
 # 7. 메인 파이프라인
 # =========================
 
-def retouch_image(image_data: bytes, filename: str) -> str:
+# 인코더 설정 (format → (확장자, media type))
+ENCODERS = {
+    "png": (".png", "image/png"),
+    "jpeg": (".jpg", "image/jpeg"),
+    "webp": (".webp", "image/webp"),
+}
+
+
+def encode_image(img: BGRImage, fmt: str = "png", quality: int = 90, compression: int = None) -> bytes:
     """
-    1. FaceMesh 랜드마크 (한글 경로 우회 포함)
-    2. 눈 확대 + 피부 보정 + 화장 레이어 (블러셔, 립 컬러, 하이라이트)
-    3. Base64 data URL 반환
+    BGR 이미지를 지정 포맷으로 인코딩 (색공간 변환 없음)
+    - jpeg/webp: quality (1~100)
+    - png: compression (0~9, None 이면 OpenCV 기본값)
+    """
+    if fmt not in ENCODERS:
+        raise ValueError(f"Unsupported format: {fmt}")
+    ext, _ = ENCODERS[fmt]
+
+    params = []
+    if fmt == "jpeg":
+        params = [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+    elif fmt == "webp":
+        params = [cv2.IMWRITE_WEBP_QUALITY, int(quality)]
+    elif compression is not None:
+        params = [cv2.IMWRITE_PNG_COMPRESSION, int(compression)]
+
+    with metrics.span(f"encode_{fmt}"):
+        ok, buffer = cv2.imencode(ext, img, params)
+    if not ok:
+        raise ValueError(f"Image encoding failed ({fmt})")
+    return buffer.tobytes()
+
+
+def to_data_url(data: bytes, fmt: str = "png") -> str:
+    img_base64 = base64.b64encode(data).decode("utf-8")
+    return f"data:{ENCODERS[fmt][1]};base64,{img_base64}"
+
+
+# JPEG 는 디코더에서 바로 1/2, 1/4, 1/8 로 줄여 읽을 수 있음 (원본 크기 버퍼를 만들지 않음)
+_JPEG_REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+@metrics.timed("decode")
+def decode_image(image_data, max_edge: int = RETOUCH_MAX_WORK_EDGE) -> BGRImage:
+    """
+    업로드 버퍼를 복사 없이 감싸서 cv2.imdecode 로 한 번만 디코딩 → BGR
+    - image_data: bytes / bytearray / memoryview (shared memory 포함)
+    - 헤더로 픽셀 수 제한을 먼저 확인 (초과 시 ValueError)
+    - 긴 변이 max_edge 를 넘으면 작업 해상도로 축소 (JPEG 는 축소 디코딩)
+    """
+    info = retouch_limits.probe_image(image_data)
+    if info is not None and info.pixels > RETOUCH_MAX_PIXELS:
+        raise ValueError(f"image dimensions {info.width}x{info.height} exceed the pixel limit")
+
+    flags = cv2.IMREAD_COLOR
+    if max_edge and info is not None and info.format == "jpeg":
+        long_edge = max(info.width, info.height)
+        for factor, reduced in _JPEG_REDUCED_FLAGS:
+            if long_edge / factor >= max_edge:
+                flags = reduced
+                break
+
+    buf = np.frombuffer(image_data, dtype=np.uint8)
+    img = cv2.imdecode(buf, flags)
+    if img is None:
+        raise ValueError("unsupported or corrupted image data")
+    if max_edge and max(img.shape[:2]) > max_edge:
+        logger.debug(f"[decode_image] downscale {img.shape[1]}x{img.shape[0]} to max edge {max_edge}")
+        img, _ = make_detection_proxy(img, max_edge)
+    return img
+
+
+class RetouchParams(NamedTuple):
+    """
+    요청별 보정 파라미터 (랜드마크 검출 이후 단계에만 영향 → 바꿔도 landmark_cache 재사용)
+    - 기본값은 config 값과 기존 고정값
     """
-    print(f"[retouch_image] Processing image: {filename}")
+    eye_scale: float = RETOUCH_EYE_SCALE
+    slim_strength: float = FACE_SLIM_STRENGTH
+    smooth_strength: float = 0.45
+    smooth_tier: str = SKIN_SMOOTH_TIER
+    blush_alpha: float = 0.35
+    lip_alpha: float = 0.45
+    highlight_alpha: float = 0.30
 
-    # 1) 이미지 로드
+
+DEFAULT_PARAMS = RetouchParams()
+
+
+def landmark_cache_key(image_data, digest: bytes = None) -> str:
+    """
+    retouch_cache.landmark_cache 키: 입력 바이트 + 검출/디코딩 설정 기준 (보정 파라미터는 포함하지 않음)
+    - 캐시는 서버 프로세스에서 조회하고, hit 이면 랜드마크를 보정 작업 인자(faces)로 넘김
+    """
+    params = {
+        "max_work_edge": RETOUCH_MAX_WORK_EDGE,
+        "proxy_edge": LANDMARK_PROXY_MAX_EDGE,
+        "refine_native": LANDMARK_REFINE_NATIVE,
+        "max_faces": RETOUCH_MAX_FACES,
+    }
+    return retouch_cache.make_key(image_data, params, PIPELINE_VERSION, digest=digest)
+
+
+def decode_and_detect(image_data):
+    """
+    작업 해상도 이미지 + 얼굴별 랜드마크 → (이미지, faces)
+    - 디코딩 실패는 ValueError (프로세스 풀 워커에서도 pickle 가능, 라우터에서 400)
+    """
     try:
-        image = Image.open(io.BytesIO(image_data))
-        if image.mode != "RGB":
-            image = image.convert("RGB")
-        img_array = np.array(image)  # RGB
-        print(f"[retouch_image] Image loaded: {img_array.shape}")
+        img_array = decode_image(image_data)
+        logger.debug(f"[retouch_image] Image loaded: {img_array.shape}")
     except Exception as e:
-        print("[retouch_image] Image loading error:", e)
-        raise HTTPException(status_code=500, detail=f"Image loading error: {e}")
+        logger.warning(f"[retouch_image] Image loading error: {e}")
+        raise ValueError(f"Image loading error: {e}") from None
+    return img_array, get_all_landmarks(img_array)
+
+
+def retouch_array(
+    image_data,
+    filename: str,
+    validate_landmarks_after_warp: bool = False,
+    params: RetouchParams = None,
+    failures: list = None,
+) -> BGRImage:
+    """
+    1. FaceMesh 랜드마크 (한글 경로 우회 포함)
+    2. 기하 변형(눈 확대, 턱/광대 축소) + 피부 보정 + 화장 레이어 (블러셔, 립 컬러, 하이라이트)
+    3. 보정된 BGR 배열 반환 (실패 시 원본, failures 에 오류 기록)
+
+    validate_landmarks_after_warp=True 이면 기하 변형 후 FaceMesh 재검출로
+    해석적으로 변형한 랜드마크와의 오차를 확인 (디버그용, 느림)
+    """
+    logger.info(f"[retouch_image] Processing image: {filename}")
+
+    # 1) 이미지 로드 (BGR) + 랜드마크 (FaceMesh 한 번으로 모든 얼굴)
+    img_array, faces = decode_and_detect(image_data)
+
+    if not faces:
+        logger.debug("[retouch_image] Landmarks None → return original")
+        return img_array
 
-    # 2) 랜드마크
-    print("[retouch_image] Step 1: get_landmarks")
-    landmarks = get_landmarks(img_array)
-    if landmarks is None:
-        print("[retouch_image] Landmarks None → return original")
-        _, buffer = cv2.imencode(".png", cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR))
-        img_base64 = base64.b64encode(buffer).decode("utf-8")
-        return f"data:image/png;base64,{img_base64}"
+    logger.debug(f"[retouch_image] Landmarks extracted: {len(faces)} face(s), {len(faces[0])} points")
+    if len(faces) == 1:
+        return render_retouch(img_array, faces[0], params, validate_landmarks_after_warp, failures)
+    return render_retouch_faces(img_array, faces, params, failures)
 
-    print(f"[retouch_image] Landmarks extracted: {len(landmarks)}")
 
+def render_retouch(
+    img_array: BGRImage,
+    landmarks: np.ndarray,
+    params: RetouchParams = None,
+    validate_landmarks_after_warp: bool = False,
+    failures: list = None,
+    frame_edge: int = None,
+) -> BGRImage:
+    """
+    검출된 랜드마크로 보정 단계만 실행 (기하 변형 → 피부 보정 → 화장)
+    - params 생략 시 DEFAULT_PARAMS
+    - 실패 시 원본 반환 + failures(list) 에 오류 기록 (호출자가 결과 캐시 저장 여부 판단)
+    - frame_edge: img 가 얼굴 crop 일 때 원본 프레임 긴 변 (smooth_skin 참고)
+    """
+    p = params or DEFAULT_PARAMS
     try:
         img_proc = img_array.copy()
 
-        # 1단계: 눈 확대
-        print("[retouch_image] Step 1: enlarge_eyes")
-        eye_scale = 1.15  # 눈 확대 (15%)
-        img_proc = enlarge_eyes(img_proc, landmarks, scale=eye_scale)
-        print("[retouch_image] Step 1: enlarge_eyes completed")
-
-        # 2단계: 피부 보정
-        print("[retouch_image] Step 2: smooth_skin")
-        landmarks_final = get_landmarks(img_proc)
-        if landmarks_final is None:
-            landmarks_final = landmarks
-        else:
-            landmarks = landmarks_final
-
-        img_proc = smooth_skin(
-            img_proc,
-            landmarks,
-            strength=0.45,
-            d=15,
-            sigma_color=100.0,
-            sigma_space=100.0,
+        # 1단계: 기하 변형 (눈 확대 + 턱/광대 축소, remap 한 번)
+        logger.debug("[retouch_image] Step 1: warp_face")
+        img_proc, landmarks = warp_face(
+            img_proc, landmarks, eye_scale=p.eye_scale, slim_strength=p.slim_strength, inplace=True
         )
-        print("[retouch_image] Step 2: smooth_skin completed")
+        logger.debug("[retouch_image] Step 1: warp_face completed")
+
+        if validate_landmarks_after_warp:
+            landmarks_check = get_landmarks(img_proc)
+            if landmarks_check is not None:
+                err = np.linalg.norm(landmarks_check - landmarks, axis=1)
+                logger.info(f"[retouch_image] warp landmark error: mean={err.mean():.2f}px, max={err.max():.2f}px")
+
+        # 2단계: 피부 보정 (기하 변형으로 이동한 랜드마크 그대로 사용)
+        logger.debug("[retouch_image] Step 2: smooth_skin")
+
+        if p.smooth_strength > 0:
+            img_proc = smooth_skin(
+                img_proc,
+                landmarks,
+                strength=p.smooth_strength,
+                d=15,
+                sigma_color=100.0,
+                sigma_space=100.0,
+                tier=p.smooth_tier,
+                inplace=True,
+                frame_edge=frame_edge,
+            )
+        logger.debug("[retouch_image] Step 2: smooth_skin completed")
 
         # 3단계: 화장 레이어 (블러셔 → 립 컬러 → 하이라이트)
-        print("[retouch_image] Step 3: makeup")
-        img_proc = apply_blush(img_proc, landmarks, BLUSH_RGB, alpha=0.35)  # 자연스러운 블러셔
-        img_proc = apply_lip_color(img_proc, landmarks, BLUSH_RGB, alpha=0.45)  # 자연스러운 립 컬러
-        img_proc = apply_highlight(img_proc, landmarks, HIGHLIGHT_RGB, alpha=0.30)  # 자연스러운 하이라이트
-        print("[retouch_image] Step 3: makeup completed")
+        logger.debug("[retouch_image] Step 3: makeup")
+        t0 = time.perf_counter()
+        img_proc = apply_makeup(
+            img_proc, landmarks, inplace=True,
+            blush_alpha=p.blush_alpha, lip_alpha=p.lip_alpha, highlight_alpha=p.highlight_alpha,
+        )
+        logger.debug(f"[retouch_image] Step 3: makeup completed ({(time.perf_counter() - t0) * 1000:.1f}ms)")
 
-        diff = np.mean(np.abs(img_proc.astype(np.int32) - img_array.astype(np.int32)))
-        print(f"[retouch_image] Retouch done (mean abs diff: {diff:.2f})")
+        if diagnostics.enabled():
+            diff = np.mean(np.abs(img_proc.astype(np.int32) - img_array.astype(np.int32)))
+            logger.debug(f"[retouch_image] Retouch done (mean abs diff: {diff:.2f})")
 
     except Exception as e:
-        print("[retouch_image] Retouch error:", e)
-        _, buffer = cv2.imencode(".png", cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR))
-        img_base64 = base64.b64encode(buffer).decode("utf-8")
-        return f"data:image/png;base64,{img_base64}"
+        logger.warning(f"[retouch_image] Retouch error: {e}")
+        if failures is not None:
+            failures.append(str(e) or e.__class__.__name__)
+        return img_array
 
-    # 4) 인코딩
-    try:
-        _, buffer = cv2.imencode(".png", cv2.cvtColor(img_proc, cv2.COLOR_RGB2BGR))
-    except Exception:
-        _, buffer = cv2.imencode(".png", cv2.cvtColor(img_proc, cv2.COLOR_RGB2BGR))
-
-    img_base64 = base64.b64encode(buffer).decode("utf-8")
-    data_url = f"data:image/png;base64,{img_base64}"
-    print("[retouch_image] Success")
-    return data_url
+    return img_proc
+
+# ---- 단체 사진: 얼굴별 ROI 병렬 보정 ----
+# 얼굴 ROI 는 랜드마크 bbox + 여백
+# - 화장 마스크 feather(최대 σ=35 → 3σ) 가 잘리지 않을 만큼
+# - 피부 보정 작업 창(얼굴 bbox 10% + 프레임 크기 기준 블러 반경) 이 crop 경계에 걸리지 않을 만큼
+_FACE_ROI_MIN_PAD = 120
+
+_face_executor = None
+_face_executor_lock = threading.Lock()
+
+
+def _get_face_executor() -> ThreadPoolExecutor:
+    """얼굴별 보정용 스레드 풀 (cv2/numpy 연산은 GIL 을 놓으므로 스레드로 충분)"""
+    global _face_executor
+    if _face_executor is None:
+        with _face_executor_lock:
+            if _face_executor is None:
+                _face_executor = ThreadPoolExecutor(max_workers=RETOUCH_FACE_WORKERS, thread_name_prefix="retouch-face")
+    return _face_executor
+
+
+def _face_roi(landmarks: np.ndarray, h: int, w: int):
+    x1, y1 = landmarks.min(axis=0)
+    x2, y2 = landmarks.max(axis=0)
+    size = max(x2 - x1, y2 - y1)
+    pad = max(int(size * 0.3), _FACE_ROI_MIN_PAD, int(size * 0.1) + 1 + _skin_window_margin(max(h, w)))
+    return (max(0, int(x1) - pad), max(0, int(y1) - pad), min(w, int(x2) + pad + 1), min(h, int(y2) + pad + 1))
+
+
+def _overlaps(a, b) -> bool:
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def _merge_face_rois(rois):
+    """
+    겹치는 얼굴 ROI 를 하나로 합침 → [(합친 rect, [얼굴 index, ...]), ...]
+    - 합친 rect 가 또 다른 ROI 와 겹칠 수 있으므로 더 이상 합칠 게 없을 때까지 반복
+    """
+    clusters = [(roi, [i]) for i, roi in enumerate(rois)]
+    merged = True
+    while merged:
+        merged = False
+        for a in range(len(clusters)):
+            for b in range(a + 1, len(clusters)):
+                if _overlaps(clusters[a][0], clusters[b][0]):
+                    rect = _union_rect([clusters[a][0], clusters[b][0]])
+                    clusters[a] = (rect, clusters[a][1] + clusters[b][1])
+                    del clusters[b]
+                    merged = True
+                    break
+            if merged:
+                break
+    return clusters
+
+
+def render_retouch_faces(img_array: BGRImage, faces, params: RetouchParams = None, failures: list = None) -> BGRImage:
+    """
+    여러 얼굴 보정
+    - 얼굴 1명: 기존 render_retouch 그대로
+    - 여러 명: 얼굴 ROI 를 잘라 독립적으로 보정 (겹치는 ROI 는 합쳐서 한 crop 안에서 순서대로 보정)
+      서로 겹치지 않는 crop 들은 스레드 풀에서 병렬 처리 후 원본에 다시 붙임
+      crop 크기와 무관하도록 피부 보정 블러 크기는 원본 프레임 긴 변 기준
+    """
+    if not faces:
+        return img_array
+    if len(faces) == 1:
+        return render_retouch(img_array, faces[0], params, failures=failures)
+
+    h, w = img_array.shape[:2]
+    clusters = _merge_face_rois([_face_roi(lm, h, w) for lm in faces])
+
+    def render_cluster(cluster):
+        (x1, y1, x2, y2), idxs = cluster
+        crop = img_array[y1:y2, x1:x2]
+        offset = np.array([x1, y1], dtype=np.float32)
+        for i in idxs:
+            crop = render_retouch(crop, faces[i] - offset, params, failures=failures, frame_edge=max(h, w))
+        return cluster[0], crop
+
+    if len(clusters) > 1:
+        rendered = list(_get_face_executor().map(render_cluster, clusters))
+    else:
+        rendered = [render_cluster(clusters[0])]
+
+    out = img_array.copy()
+    for (x1, y1, x2, y2), crop in rendered:
+        out[y1:y2, x1:x2] = crop
+    logger.debug(f"[retouch_image] {len(faces)} faces rendered in {len(clusters)} ROI(s)")
+    return out
+
+
+# 파이프라인 결과가 바뀌는 변경 시 올려서 결과 캐시 무효화
+PIPELINE_VERSION = "7"
+
+
+def result_cache_key(
+    image_data: bytes,
+    fmt: str = "png",
+    quality: int = 90,
+    compression: int = None,
+    params: RetouchParams = None,
+    digest: bytes = None,
+) -> str:
+    # 결과 픽셀에 영향을 주는 config 값은 모두 키에 포함 (설정만 바꾸고 재시작해도 이전 결과가 나오지 않도록)
+    key_params = {
+        "fmt": fmt,
+        "quality": quality if fmt != "png" else None,
+        "compression": compression,
+        **(params or DEFAULT_PARAMS)._asdict(),
+        "max_faces": RETOUCH_MAX_FACES,
+        "max_work_edge": RETOUCH_MAX_WORK_EDGE,
+        "proxy_edge": LANDMARK_PROXY_MAX_EDGE,
+        "refine_native": LANDMARK_REFINE_NATIVE,
+        "smooth_work_edge": SKIN_SMOOTH_WORK_EDGE,
+    }
+    return retouch_cache.make_key(image_data, key_params, PIPELINE_VERSION, digest=digest)
+
+
+def retouch_image_bytes(
+    image_data,
+    filename: str,
+    fmt: str = "png",
+    quality: int = 90,
+    compression: int = None,
+    use_cache: bool = True,
+    params: RetouchParams = None,
+) -> bytes:
+    """
+    보정 후 지정 포맷의 바이너리로 반환 (params 생략 시 기본 파라미터)
+    - use_cache: 결과 캐시 사용 여부 (랜드마크 캐시는 retouch_pool 에서만 사용 → use_cache=False 면 항상 전체 파이프라인)
+    """
+    cache = retouch_cache.result_cache if use_cache else None
+    key = None
+    if cache is not None:
+        key = result_cache_key(image_data, fmt, quality, compression, params)
+        data = cache.get(key)
+        if data is not None:
+            logger.info(f"[retouch_image] Cache hit: {filename}")
+            return data
+
+    data, ok, _ = retouch_image_result(image_data, filename, fmt, quality, compression, params)
+    if key is not None and ok:
+        cache.put(key, data)
+    return data
+
+
+def retouch_image_result(
+    image_data,
+    filename: str,
+    fmt: str = "png",
+    quality: int = 90,
+    compression: int = None,
+    params: RetouchParams = None,
+    faces=None,
+):
+    """
+    보정 + 인코딩 → (바이트, ok, faces) (결과/랜드마크 캐시 미사용, 보정 작업 풀에서 호출)
+    - faces: 이미 검출한 얼굴별 랜드마크 (서버 프로세스의 landmark_cache, progressive 프리뷰) → 주면 FaceMesh 생략
+    - ok=False: 보정 단계가 실패해서 원본이 섞인 결과 → 호출자는 결과 캐시에 저장하지 않음
+    - 반환 faces: 사용한 랜드마크 (호출자가 landmark_cache 에 저장)
+    """
+    logger.info(f"[retouch_image] Processing image: {filename}")
+    failures = []
+    if faces is None:
+        img_array, faces = decode_and_detect(image_data)
+    else:
+        img_array = decode_image(image_data)
+        faces = [np.array(lm, dtype=np.float32) for lm in faces]  # 캐시 배열을 건드리지 않도록 복사
+        logger.debug(f"[retouch_image] {len(faces)} face(s) given → skip FaceMesh")
+    img_proc = render_retouch_faces(img_array, faces, params, failures)
+    data = encode_image(img_proc, fmt, quality=quality, compression=compression)
+    if failures:
+        logger.warning(f"[retouch_image] Fallback to original for {filename}: {failures[0]}")
+    else:
+        logger.info(f"[retouch_image] Success ({fmt}, {len(data)} bytes)")
+    return data, not failures, faces
+
+
+def retouch_image(image_data: bytes, filename: str, validate_landmarks_after_warp: bool = False) -> str:
+    """보정 후 PNG Base64 data URL 반환 (기존 프론트엔드 호환)"""
+    if validate_landmarks_after_warp:
+        img_proc = retouch_array(image_data, filename, validate_landmarks_after_warp)
+        return to_data_url(encode_image(img_proc, "png"), "png")
+    return to_data_url(retouch_image_bytes(image_data, filename, "png"), "png")
+
+
+# =========================
+# 8. 프리뷰 → 원본 해상도 (progressive)
+# =========================
+
+def retouch_preview(
+    image_data,
+    filename: str,
+    max_edge: int = RETOUCH_PREVIEW_MAX_EDGE,
+    fmt: str = "jpeg",
+    quality: int = 80,
+):
+    """
+    축소 해상도 프리뷰 보정
+    - 랜드마크는 원본 좌표로 한 번만 검출해서 반환 → 원본 해상도 렌더링에 그대로 재사용
+    - 반환: (프리뷰 인코딩 바이트, 얼굴별 원본 좌표 랜드마크 list)
+    """
+    img_array, faces = decode_and_detect(image_data)
+
+    small, scale = make_detection_proxy(img_array, max_edge)
+    preview = render_retouch_faces(small, [lm * np.float32(scale) for lm in faces])
+    data = encode_image(preview, fmt, quality=quality)
+    logger.info(f"[retouch_preview] {filename}: preview {preview.shape[1]}x{preview.shape[0]} ({len(data)} bytes)")
+    return data, [lm.tolist() for lm in faces]
+
+
+def retouch_image_bytes_with_landmarks(
+    image_data,
+    filename: str,
+    faces,
+    fmt: str = "png",
+    quality: int = 90,
+    compression: int = None,
+) -> bytes:
+    """이미 검출한 얼굴별 랜드마크로 원본 해상도 보정 (FaceMesh 재실행 없음)"""
+    data, _, _ = retouch_image_result(image_data, filename, fmt, quality, compression, faces=faces or [])
+    return data
+
+
+# =========================
+# 9. 실시간 프리뷰 (카메라 프레임)
+# =========================
+
+def render_live_frame(frame: BGRImage, face_mesh, eye_scale: float = RETOUCH_EYE_SCALE) -> BGRImage:
+    """
+    tracking 모드 FaceMesh 로 검출 → 가벼운 단계(눈 확대 + 화장 레이어)만 적용
+    - 피부 보정/얼굴형 축소는 실시간 프레임 예산에 비해 비싸므로 생략
+    - frame 은 제자리에서 수정됨
+    """
+    faces = _run_face_mesh(_to_rgb(frame), face_mesh)
+    if not faces:
+        return frame
+    h, w = frame.shape[:2]
+    landmarks = faces[0] * np.array([w, h], dtype=np.float32)
+    frame, landmarks = warp_face(frame, landmarks, eye_scale=eye_scale, slim_strength=0.0, inplace=True)
+    return apply_makeup(frame, landmarks, inplace=True)